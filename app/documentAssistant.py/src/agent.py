@@ -1,18 +1,40 @@
-from typing import Optional, Literal
-from langgraph.graph import StateGraph, END, START
-from langchain_openai import ChatOpenAI
-from schemas import AgentState, UserIntent, AnswerResponse
+import threading
+from typing import Dict, Optional
+from langgraph.graph import StateGraph, END
+from schemas import AgentState
 
-from assistant import triage_agent_node, qa_agent_node, summarisation_agent_node, calculation_agent_node
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.graph.state import CompiledStateGraph
 
-def agent_workflow():
+from assistant import (
+    triage_agent_node, qa_agent_node, summarisation_agent_node, calculation_agent_node,
+    atriage_agent_node, aqa_agent_node, asummarisation_agent_node, acalculation_agent_node,
+)
+from checkpointer import get_checkpointer
+from memory import memory_manager_node, amemory_manager_node
+from instrumentation import instrument_node
+
+def build_workflow(instrument: bool = True) -> StateGraph:
+    """
+    Define the agent graph's nodes and edges, without compiling it.
+
+    Args:
+        instrument: Record per-node latency, LLM calls, tokens and tool timings
+            (see instrumentation.py)
+    """
     workflow = StateGraph(AgentState)
 
-    # Add all agent nodes
-    workflow.add_node("triage_agent", triage_agent_node)
-    workflow.add_node("qa_agent", qa_agent_node)
-    workflow.add_node("summarisation_agent", summarisation_agent_node)
-    workflow.add_node("calculation_agent", calculation_agent_node)
+    def node(name, func, afunc):
+        return instrument_node(name, func, afunc) if instrument else RunnableLambda(func, afunc=afunc)
+
+    # Add all agent nodes - each has a sync and an async implementation,
+    # used by graph.invoke and graph.ainvoke respectively
+    workflow.add_node("triage_agent", node("triage_agent", triage_agent_node, atriage_agent_node))
+    workflow.add_node("qa_agent", node("qa_agent", qa_agent_node, aqa_agent_node))
+    workflow.add_node("summarisation_agent", node("summarisation_agent", summarisation_agent_node, asummarisation_agent_node))
+    workflow.add_node("calculation_agent", node("calculation_agent", calculation_agent_node, acalculation_agent_node))
+    workflow.add_node("memory_manager", node("memory_manager", memory_manager_node, amemory_manager_node))
 
     # Conditional routing from triage agent
     workflow.add_conditional_edges(
@@ -26,24 +48,45 @@ def agent_workflow():
         }
     )
 
-    # All specialized agents end the workflow
-    workflow.add_edge("qa_agent", END)
-    workflow.add_edge("summarisation_agent", END)
-    workflow.add_edge("calculation_agent", END)
+    # After answering, older turns are folded into the summary, then the workflow ends
+    workflow.add_edge("qa_agent", "memory_manager")
+    workflow.add_edge("summarisation_agent", "memory_manager")
+    workflow.add_edge("calculation_agent", "memory_manager")
+    workflow.add_edge("memory_manager", END)
 
     # Set entry point
     workflow.set_entry_point("triage_agent")
+    return workflow
+
+
+# Graphs compiled with the shared checkpointer, one per instrument setting
+_compiled: Dict[bool, CompiledStateGraph] = {}
+_compiled_lock = threading.Lock()
+
+
+def agent_workflow(checkpointer: Optional[BaseCheckpointSaver] = None, instrument: bool = True):
+    """
+    Return the compiled agent graph.
 
-    # Compile the graph
-    graph = workflow.compile()
+    With the default checkpointer the graph is compiled on the first call
+    and the same instance is returned afterwards, so workers pay for it
+    once per process. An explicit checkpointer gets a newly compiled graph.
+    Render the graph with visualize.py.
 
-    # Draw PNG
-    try:
-        png_data = graph.get_graph().draw_mermaid_png()
-        with open("graph.png", "wb") as f:
-            f.write(png_data)
-        print("Graph saved to graph.png")
-    except Exception as e:
-        print(f"Could not save graph visualization: {e}")
+    Args:
+        checkpointer: Where conversation state is persisted per thread_id
+            (defaults to the shared SQLite checkpointer)
+        instrument: Record per-node latency, LLM calls, tokens and tool timings
+            (see instrumentation.py)
+    """
+    if checkpointer is not None:
+        return build_workflow(instrument).compile(checkpointer=checkpointer)
 
-    return graph
\ No newline at end of file
+    graph = _compiled.get(instrument)
+    if graph is None:
+        with _compiled_lock:
+            graph = _compiled.get(instrument)
+            if graph is None:
+                # Compile the graph with durable per-thread state
+                graph = _compiled[instrument] = build_workflow(instrument).compile(checkpointer=get_checkpointer())
+    return graph
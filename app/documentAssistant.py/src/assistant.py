@@ -1,285 +1,152 @@
-from schemas import AgentState, UserIntent, AnswerResponse
-from prompts import get_intent_classification_prompt, get_chat_prompt_template
-from tools import retrieve_documents, search_specific_document, calculate
-from datetime import datetime
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+import time
+from typing import Optional
+
+from schemas import AgentState, UserIntent
+from prompts import get_intent_classification_prompt
+from tools import retrieve_documents, search_specific_document, calculate, calculate_batch, query_facts
+from tool_loop import AgentSpec, ToolLoop
+from runnable_registry import get_structured_llm
+from intent_router import router
+from memory import ConversationMemory
+
+
+def _route(intent: UserIntent) -> str:
+    return (
+        "qa_agent" if intent.intent_type == "qa" else
+        "summarisation_agent" if intent.intent_type == "summarisation" else
+        "calculation_agent" if intent.intent_type == "calculation" else
+        "qa_agent"
+    )
 
 
-def triage_agent_node(state: AgentState, config) -> AgentState:
-    """Agent to classify user intent"""
-    llm = config["configurable"]["llm"].with_structured_output(UserIntent)
+def _fast_intent(state: AgentState, config) -> Optional[UserIntent]:
+    """
+    Try the local keyword router first. Disable it with
+    config["configurable"]["fast_intent_router"] = False, or tune its
+    confidence threshold with "fast_intent_threshold".
+    """
+    configurable = config["configurable"]
+    if not configurable.get("fast_intent_router", True):
+        return None
+    return router.classify(
+        state.user_input,
+        configurable.get("fast_intent_threshold"),
+        has_history=bool(state.messages)
+    )
 
-    prompt = get_intent_classification_prompt().format(
+
+def triage_prompt(state: AgentState, config) -> str:
+    """The triage LLM's prompt for the state's user input and history."""
+    return get_intent_classification_prompt().format(
         user_input=state.user_input,
-        conversation_history=state.messages
+        conversation_history=ConversationMemory.from_config(config).render(state)
     )
 
-    intent: UserIntent = llm.invoke(prompt)
+
+def triage_agent_node(state: AgentState, config) -> AgentState:
+    """Agent to classify user intent"""
+    # An intent classified ahead of time (e.g. by batch_runner.py) skips triage
+    intent = config["configurable"].get("intent") or _fast_intent(state, config)
+
+    # Only ask the LLM when the local router is unsure
+    if intent is None:
+        llm = get_structured_llm(config["configurable"]["llm"], UserIntent)
+        prompt = triage_prompt(state, config)
+
+        start = time.perf_counter()
+        intent: UserIntent = llm.invoke(prompt)
+        router.record_llm_call(time.perf_counter() - start)
 
     return {
         "intent": intent,
-        "next_step": (
-            "qa_agent" if intent.intent_type == "qa" else
-            "summarisation_agent" if intent.intent_type == "summarisation" else
-            "calculation_agent" if intent.intent_type == "calculation" else
-            "qa_agent"
-        ),
+        "next_step": _route(intent),
         "actions_taken": ["classify_intent"]
     }
 
 
+# ----- Specialist Agents -----
+#
+# Each specialist is a ToolLoop configured by an AgentSpec; the loop itself
+# (LLM call, tool dispatch, message bookkeeping) lives in tool_loop.py.
+
+QA_AGENT = ToolLoop(AgentSpec(
+    name="qa_agent",
+    prompt_type="qa",
+    tools=(retrieve_documents, search_specific_document),
+    confidence=0.85,
+    failure_message="I couldn't complete the task within the allowed iterations.",
+))
+
+SUMMARISATION_AGENT = ToolLoop(AgentSpec(
+    name="summarisation_agent",
+    prompt_type="summarization",
+    tools=(retrieve_documents, search_specific_document),
+    confidence=0.85,
+    failure_message="I couldn't complete the summarization within the allowed iterations.",
+))
+
+CALCULATION_AGENT = ToolLoop(AgentSpec(
+    name="calculation_agent",
+    prompt_type="calculation",
+    tools=(query_facts, retrieve_documents, search_specific_document, calculate, calculate_batch),
+    confidence=0.9,
+    failure_message="I couldn't complete the calculation within the allowed iterations.",
+))
+
+
 def qa_agent_node(state: AgentState, config):
     """QA agent with tool calling capability"""
-    llm = config["configurable"]["llm"]
-    tools = [retrieve_documents, search_specific_document]
-    llm_with_tools = llm.bind_tools(tools)
-
-    # Get the system prompt
-    system_prompt = get_chat_prompt_template("qa")
-
-    # Create the initial message
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": state.user_input}
-    ]
-
-    tools_used = []
-    retrieved_docs = []
-
-    # Tool calling loop - allow LLM to use tools iteratively
-    max_iterations = 5
-    for i in range(max_iterations):
-        response = llm_with_tools.invoke(messages)
-
-        # Check if the LLM wants to use tools
-        if hasattr(response, 'tool_calls') and response.tool_calls:
-            # Execute each tool call
-            for tool_call in response.tool_calls:
-                tool_name = tool_call['name']
-                tool_args = tool_call['args']
-
-                # Execute the appropriate tool
-                if tool_name == "retrieve_documents":
-                    tool_result = retrieve_documents.invoke(tool_args)
-                    retrieved_docs.extend(tool_result)
-                elif tool_name == "search_specific_document":
-                    tool_result = search_specific_document.invoke(tool_args)
-                    retrieved_docs.append(tool_result)
-                else:
-                    tool_result = {"error": f"Unknown tool: {tool_name}"}
-
-                tools_used.append(tool_name)
-
-                # Add tool response to messages
-                messages.append({
-                    "role": "assistant",
-                    "content": "",
-                    "tool_calls": [tool_call]
-                })
-                messages.append({
-                    "role": "tool",
-                    "content": str(tool_result),
-                    "tool_call_id": tool_call.get('id', 'unknown')
-                })
-        else:
-            # No more tool calls - we have the final answer
-            final_answer = response.content if hasattr(response, 'content') else str(response)
-
-            # Extract sources from retrieved documents
-            sources = list(set([doc.get('id', doc.get('document_id', 'unknown'))
-                                for doc in retrieved_docs]))
-
-            # Create structured response
-            answer_response = AnswerResponse(
-                question=state.user_input,
-                answer=final_answer,
-                sources=sources,
-                confidence=0.85,
-                timestamp=datetime.now(),
-                retrieved_documents=retrieved_docs
-            )
-
-            return {
-                "messages": state.messages + [state.user_input, final_answer],
-                "current_response": answer_response,
-                "tools_used": state.tools_used + tools_used,
-                "actions_taken": ["qa_agent"]
-            }
-
-    # If we hit max iterations, return what we have
-    return {
-        "current_response": AnswerResponse(
-            question=state.user_input,
-            answer="I couldn't complete the task within the allowed iterations.",
-            sources=[],
-            confidence=0.0,
-            timestamp=datetime.now()
-        ),
-        "tools_used": state.tools_used + tools_used,
-        "actions_taken": ["qa_agent"]
-    }
+    return QA_AGENT.run(state, config)
 
 
 def summarisation_agent_node(state: AgentState, config):
     """Summarization agent with tool calling capability"""
-    llm = config["configurable"]["llm"]
-    tools = [retrieve_documents, search_specific_document]
-    llm_with_tools = llm.bind_tools(tools)
-
-    system_prompt = get_chat_prompt_template("summarization")
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": state.user_input}
-    ]
-
-    tools_used = []
-    retrieved_docs = []
-
-    # Tool calling loop
-    max_iterations = 5
-    for i in range(max_iterations):
-        response = llm_with_tools.invoke(messages)
-
-        if hasattr(response, 'tool_calls') and response.tool_calls:
-            for tool_call in response.tool_calls:
-                tool_name = tool_call['name']
-                tool_args = tool_call['args']
-
-                if tool_name == "retrieve_documents":
-                    tool_result = retrieve_documents.invoke(tool_args)
-                    retrieved_docs.extend(tool_result)
-                elif tool_name == "search_specific_document":
-                    tool_result = search_specific_document.invoke(tool_args)
-                    retrieved_docs.append(tool_result)
-                else:
-                    tool_result = {"error": f"Unknown tool: {tool_name}"}
-
-                tools_used.append(tool_name)
-
-                messages.append({
-                    "role": "assistant",
-                    "content": "",
-                    "tool_calls": [tool_call]
-                })
-                messages.append({
-                    "role": "tool",
-                    "content": str(tool_result),
-                    "tool_call_id": tool_call.get('id', 'unknown')
-                })
-        else:
-            final_summary = response.content if hasattr(response, 'content') else str(response)
-
-            sources = list(set([doc.get('id', doc.get('document_id', 'unknown'))
-                                for doc in retrieved_docs]))
-
-            summary_response = AnswerResponse(
-                question=state.user_input,
-                answer=final_summary,
-                sources=sources,
-                confidence=0.85,
-                timestamp=datetime.now(),
-                retrieved_documents=retrieved_docs
-            )
-
-            return {
-                "messages": state.messages + [state.user_input, final_summary],
-                "current_response": summary_response,
-                "tools_used": state.tools_used + tools_used,
-                "actions_taken": ["summarisation_agent"]
-            }
-
-    return {
-        "current_response": AnswerResponse(
-            question=state.user_input,
-            answer="I couldn't complete the summarization within the allowed iterations.",
-            sources=[],
-            confidence=0.0,
-            timestamp=datetime.now()
-        ),
-        "tools_used": state.tools_used + tools_used,
-        "actions_taken": ["summarisation_agent"]
-    }
+    return SUMMARISATION_AGENT.run(state, config)
 
 
 def calculation_agent_node(state: AgentState, config):
     """Calculation agent with tool calling capability"""
-    llm = config["configurable"]["llm"]
-    tools = [retrieve_documents, search_specific_document, calculate]
-    llm_with_tools = llm.bind_tools(tools)
-
-    system_prompt = get_chat_prompt_template("calculation")
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": state.user_input}
-    ]
-
-    tools_used = []
-    retrieved_docs = []
-
-    max_iterations = 5
-    for i in range(max_iterations):
-        response = llm_with_tools.invoke(messages)
-
-        if hasattr(response, 'tool_calls') and response.tool_calls:
-            for tool_call in response.tool_calls:
-                tool_name = tool_call['name']
-                tool_args = tool_call['args']
-
-                if tool_name == "retrieve_documents":
-                    tool_result = retrieve_documents.invoke(tool_args)
-                    retrieved_docs.extend(tool_result)
-                elif tool_name == "search_specific_document":
-                    tool_result = search_specific_document.invoke(tool_args)
-                    retrieved_docs.append(tool_result)
-                elif tool_name == "calculate":
-                    tool_result = calculate.invoke(tool_args)
-                else:
-                    tool_result = {"error": f"Unknown tool: {tool_name}"}
-
-                tools_used.append(tool_name)
-
-                messages.append({
-                    "role": "assistant",
-                    "content": "",
-                    "tool_calls": [tool_call]
-                })
-                messages.append({
-                    "role": "tool",
-                    "content": str(tool_result),
-                    "tool_call_id": tool_call.get('id', 'unknown')
-                })
-        else:
-            final_answer = response.content if hasattr(response, 'content') else str(response)
-
-            sources = list(set([doc.get('id', doc.get('document_id', 'unknown'))
-                                for doc in retrieved_docs]))
-
-            calc_response = AnswerResponse(
-                question=state.user_input,
-                answer=final_answer,
-                sources=sources,
-                confidence=0.9,
-                timestamp=datetime.now(),
-                retrieved_documents=retrieved_docs
-            )
-
-            return {
-                "messages": state.messages + [state.user_input, final_answer],
-                "current_response": calc_response,
-                "tools_used": state.tools_used + tools_used,
-                "actions_taken": ["calculation_agent"]
-            }
+    return CALCULATION_AGENT.run(state, config)
+
+
+# ----- Async Nodes -----
+#
+# Async twins of the nodes above. They await the LLM with ainvoke and run
+# tool calls without blocking, so a single event loop can drive many
+# conversations at once. agent_workflow() registers each pair on one node,
+# and LangGraph picks the sync or async version for invoke or ainvoke.
+
+async def atriage_agent_node(state: AgentState, config) -> AgentState:
+    """Async agent to classify user intent"""
+    # An intent classified ahead of time (e.g. by batch_runner.py) skips triage
+    intent = config["configurable"].get("intent") or _fast_intent(state, config)
+
+    # Only ask the LLM when the local router is unsure
+    if intent is None:
+        llm = get_structured_llm(config["configurable"]["llm"], UserIntent)
+        prompt = triage_prompt(state, config)
+
+        start = time.perf_counter()
+        intent: UserIntent = await llm.ainvoke(prompt)
+        router.record_llm_call(time.perf_counter() - start)
 
     return {
-        "current_response": AnswerResponse(
-            question=state.user_input,
-            answer="I couldn't complete the calculation within the allowed iterations.",
-            sources=[],
-            confidence=0.0,
-            timestamp=datetime.now()
-        ),
-        "tools_used": state.tools_used + tools_used,
-        "actions_taken": ["calculation_agent"]
+        "intent": intent,
+        "next_step": _route(intent),
+        "actions_taken": ["classify_intent"]
     }
+
+
+async def aqa_agent_node(state: AgentState, config):
+    """Async QA agent with tool calling capability"""
+    return await QA_AGENT.arun(state, config)
+
+
+async def asummarisation_agent_node(state: AgentState, config):
+    """Async summarization agent with tool calling capability"""
+    return await SUMMARISATION_AGENT.arun(state, config)
+
+
+async def acalculation_agent_node(state: AgentState, config):
+    """Async calculation agent with tool calling capability"""
+    return await CALCULATION_AGENT.arun(state, config)
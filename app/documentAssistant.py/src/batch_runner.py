@@ -0,0 +1,315 @@
+"""
+Run many questions through agent_workflow() in one job.
+
+Reads questions from JSONL, one object per line with a "question" (or
+"user_input") and an optional "id" (the line number otherwise), and appends
+one result per question to the output JSONL as soon as it finishes.
+
+Usage:
+    python batch_runner.py questions.jsonl -o results.jsonl
+    python batch_runner.py questions.jsonl -o results.jsonl --concurrency 32 --triage-batch 64
+    python batch_runner.py questions.jsonl -o results.jsonl --fake      # offline, with the fake LLM
+
+Rerunning the same command after a crash or Ctrl-C resumes the job: questions
+that already have a successful result in the output are skipped, and failed
+ones are tried again (the last result per id is the one that counts).
+
+Questions are triaged a chunk at a time before they enter the graph: the
+fast intent router takes the clear ones and the rest go to the triage LLM
+in a single batch call, instead of one triage call per graph run. The
+graph is then run with at most --concurrency questions in flight.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from dotenv import load_dotenv
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent import agent_workflow
+from assistant import triage_prompt
+from checkpointer import get_checkpointer
+from document_store import get_document_store
+from instrumentation import percentile
+from intent_router import router
+from json_logger import log
+from response_cache import CachedWorkflow
+from runnable_registry import get_structured_llm
+from schemas import AgentState, UserIntent
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TRIAGE_BATCH = 32
+DEFAULT_PROGRESS_SECONDS = 10.0
+
+
+# ----- Input and Output -----
+
+def read_questions(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield {"id", "question"} for each usable line of a questions file."""
+    with open(path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"[BATCH] skipping line {lineno}: {e}")
+                continue
+            question = record.get("question") or record.get("user_input")
+            if not question:
+                print(f"[BATCH] skipping line {lineno}: no 'question'")
+                continue
+            yield {"id": str(record.get("id", lineno)), "question": question}
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    IDs with a successful result in an earlier run's output.
+
+    A line cut short by a crash is removed, so appending starts on a fresh line.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[:data.rfind(b"\n") + 1]
+
+    done = set()
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("error"):
+            done.discard(record.get("id"))
+        else:
+            done.add(record.get("id"))
+    return done
+
+
+class ResultWriter:
+    """
+    Appends results as they finish and tracks the job's progress.
+
+    Every line is flushed when written, so a crash loses at most the
+    questions still in flight.
+    """
+
+    def __init__(self, path: str, total: int, progress_seconds: float = DEFAULT_PROGRESS_SECONDS):
+        self.total = total
+        self.progress_seconds = progress_seconds
+        self.written = 0
+        self.errors = 0
+        self.latencies: List[float] = []
+        self.started = time.perf_counter()
+        self._last_report = self.started
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+        self.written += 1
+        self.errors += bool(record["error"])
+        self.latencies.append(record["seconds"])
+
+        now = time.perf_counter()
+        if now - self._last_report >= self.progress_seconds:
+            self._last_report = now
+            print(f"[BATCH] {self.written}/{self.total} done, {self.throughput():.1f} questions/s, "
+                  f"{self.errors} errors")
+
+    def throughput(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.written / elapsed if elapsed else 0.0
+
+    def close(self) -> None:
+        self._file.close()
+
+
+# ----- Batched Triage -----
+
+async def triage_batch(llm, questions: List[str], config,
+                       max_concurrency: Optional[int] = None) -> List[Optional[UserIntent]]:
+    """
+    Intents for a chunk of single-turn questions.
+
+    The fast router classifies what it can; the remaining questions are
+    classified with one abatch() call on the structured triage LLM. An
+    entry stays None if its LLM call failed, and the triage node will then
+    classify that question itself.
+    """
+    intents: List[Optional[UserIntent]] = [router.classify(question) for question in questions]
+    pending = [i for i, intent in enumerate(intents) if intent is None]
+    if not pending:
+        return intents
+
+    structured = get_structured_llm(llm, UserIntent)
+    prompts = [triage_prompt(AgentState(user_input=questions[i]), config) for i in pending]
+    start = time.perf_counter()
+    results = await structured.abatch(prompts, config={"max_concurrency": max_concurrency}, return_exceptions=True)
+    seconds = time.perf_counter() - start
+
+    for i, result in zip(pending, results):
+        if isinstance(result, UserIntent):
+            intents[i] = result
+            # Each question's share of the batch call
+            router.record_llm_call(seconds / len(pending))
+    return intents
+
+
+# ----- Runner -----
+
+def thread_namespace(input_path: str, run_id: str) -> str:
+    """
+    Prefix for a job's thread IDs, from the input file and the run, so jobs
+    that keep checkpoints in the same database never share a thread.
+    """
+    digest = hashlib.blake2b(os.path.abspath(input_path).encode("utf-8"), digest_size=4).hexdigest()
+    return f"batch-{digest}-{run_id}"
+
+
+async def run_question(workflow, checkpointer, llm, item: Dict[str, Any], intent: Optional[UserIntent],
+                       keep_checkpoints: bool, namespace: str = "batch") -> Dict[str, Any]:
+    thread_id = f"{namespace}-{item['id']}"
+    config = {"configurable": {"thread_id": thread_id, "llm": llm, "intent": intent}}
+    record = {"id": item["id"], "question": item["question"]}
+
+    start = time.perf_counter()
+    try:
+        result = await workflow.ainvoke({"user_input": item["question"], "session_id": thread_id}, config)
+        response = result.get("current_response")
+        record.update({
+            "answer": response.answer if response else None,
+            "sources": response.sources if response else [],
+            "intent": result["intent"].intent_type if result.get("intent") else None,
+            "actions_taken": result.get("actions_taken", []),
+            "tools_used": result.get("tools_used", []),
+            "error": None,
+        })
+    except Exception as e:
+        record.update({"answer": None, "error": f"{type(e).__name__}: {e}"})
+    finally:
+        if keep_checkpoints:
+            record["thread_id"] = thread_id
+        else:
+            # Single-turn threads are not resumed, so don't let them pile up in memory
+            await checkpointer.adelete_thread(thread_id)
+    record["seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+async def run_batch(items: List[Dict[str, Any]], writer: ResultWriter, llm,
+                    concurrency: int = DEFAULT_CONCURRENCY, triage_size: int = DEFAULT_TRIAGE_BATCH,
+                    keep_checkpoints: bool = False, namespace: str = "batch") -> None:
+    """
+    Triage items a chunk at a time and run them through the graph with at
+    most `concurrency` in flight, writing each result as it finishes.
+    Thread IDs are "{namespace}-{item id}".
+    """
+    checkpointer = get_checkpointer() if keep_checkpoints else InMemorySaver()
+    workflow = CachedWorkflow(agent_workflow(checkpointer))
+    triage_config = {"configurable": {"llm": llm}}
+
+    # Bounded, so triage stays only a little ahead of the graph runs
+    jobs: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=max(concurrency, triage_size))
+
+    async def produce() -> None:
+        try:
+            for start in range(0, len(items), triage_size):
+                chunk = items[start:start + triage_size]
+                intents = await triage_batch(llm, [item["question"] for item in chunk], triage_config, concurrency)
+                for item, intent in zip(chunk, intents):
+                    await jobs.put((item, intent))
+        finally:
+            for _ in range(concurrency):
+                await jobs.put(None)
+
+    async def work() -> None:
+        while (job := await jobs.get()) is not None:
+            item, intent = job
+            writer.write(await run_question(workflow, checkpointer, llm, item, intent, keep_checkpoints, namespace))
+
+    await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Questions JSONL")
+    parser.add_argument("-o", "--output", required=True, help="Results JSONL (appended to; reruns resume)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Questions in flight")
+    parser.add_argument("--triage-batch", type=int, default=DEFAULT_TRIAGE_BATCH,
+                        help="Questions triaged per batch LLM call")
+    parser.add_argument("--model", default="gpt-5-mini")
+    parser.add_argument("--fake", action="store_true", help="Use the deterministic local LLM (no API key)")
+    parser.add_argument("--keep-checkpoints", action="store_true",
+                        help="Persist each question's thread to the SQLite checkpointer "
+                             "(its thread_id is added to the result)")
+    parser.add_argument("--progress", type=float, default=DEFAULT_PROGRESS_SECONDS,
+                        help="Seconds between progress lines")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.fake:
+        from fake_llm import FakeChatModel
+        llm = FakeChatModel()
+    else:
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(model=args.model)
+
+    items = list(read_questions(args.input))
+    done = completed_ids(args.output)
+    pending = [item for item in items if item["id"] not in done]
+    print(f"[BATCH] {len(items)} questions, {len(items) - len(pending)} already answered, {len(pending)} to run")
+    if not pending:
+        return
+
+    # Build the retrieval index once, before any agent node needs it
+    get_document_store()
+
+    run_id = uuid.uuid4().hex[:8]
+    namespace = thread_namespace(args.input, run_id)
+    if args.keep_checkpoints:
+        print(f"[BATCH] checkpoints kept under thread IDs {namespace}-<id>")
+
+    writer = ResultWriter(args.output, len(pending), args.progress)
+    log("Batch run started", input=args.input, output=args.output, questions=len(pending),
+        skipped=len(items) - len(pending), concurrency=args.concurrency, triage_batch=args.triage_batch,
+        run_id=run_id)
+    try:
+        asyncio.run(run_batch(pending, writer, llm, args.concurrency, args.triage_batch, args.keep_checkpoints,
+                              namespace))
+    except KeyboardInterrupt:
+        print("\n[BATCH] interrupted; rerun the same command to resume")
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - writer.started
+    stats = router.stats()
+    summary = {
+        "answered": writer.written - writer.errors,
+        "errors": writer.errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(writer.throughput(), 3),
+        "p50_seconds": round(percentile(writer.latencies, 50), 4) if writer.latencies else None,
+        "p95_seconds": round(percentile(writer.latencies, 95), 4) if writer.latencies else None,
+        "fast_path_triage": stats["fast_path_hits"],
+        "llm_triage": stats["llm_fallbacks"],
+    }
+    print(f"\n{writer.written}/{len(pending)} questions in {elapsed:.1f}s "
+          f"({summary['throughput']:.1f} questions/s), {writer.errors} errors")
+    if writer.latencies:
+        print(f"Latency p50 {summary['p50_seconds']:.2f}s, p95 {summary['p95_seconds']:.2f}s")
+    print(f"Triage: {stats['fast_path_hits']} by the fast router, {stats['llm_fallbacks']} in batched LLM calls")
+    log("Batch run finished", output=args.output, **summary)
+
+
+if __name__ == "__main__":
+    main()
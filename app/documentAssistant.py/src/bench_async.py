@@ -0,0 +1,87 @@
+"""
+Throughput benchmark for the async graph path, using a fake local LLM.
+
+Runs the same single-turn sessions through workflow.invoke one after another
+and through workflow.ainvoke concurrently on one event loop. Checkpoints go
+to the default SQLite saver (in a temporary file), so blocking checkpoint
+I/O on the event loop shows up in the async number.
+
+Usage:
+    python bench_async.py                          # 200 sessions, 50 ms per LLM call
+    python bench_async.py --sessions 500 --latency 0.1
+    python bench_async.py --checkpointer memory    # the graph alone, without checkpoint I/O
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent import agent_workflow
+from checkpointer import SQLiteCheckpointSaver
+from fake_llm import FakeChatModel
+from schemas import AgentState
+
+QUERIES = [
+    "Can you summarise doc_1?",
+    "What is machine learning?",
+    "Calculate the total revenue in doc_5",
+]
+
+
+def config_for(llm, session: str) -> dict:
+    return {"configurable": {"thread_id": f"bench-{session}", "llm": llm}}
+
+
+def run_sync(workflow, llm, sessions: int) -> float:
+    start = time.perf_counter()
+    for i in range(sessions):
+        workflow.invoke(AgentState(user_input=QUERIES[i % len(QUERIES)]), config_for(llm, f"sync-{i}"))
+    return time.perf_counter() - start
+
+
+async def run_async(workflow, llm, sessions: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        workflow.ainvoke(AgentState(user_input=QUERIES[i % len(QUERIES)]), config_for(llm, f"async-{i}"))
+        for i in range(sessions)
+    ))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--sync-sessions", type=int, default=20,
+                        help="Sessions for the sequential baseline (it is slow by design)")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake LLM call")
+    parser.add_argument("--checkpointer", choices=["sqlite", "memory"], default="sqlite",
+                        help="The default SQLite saver, or LangGraph's InMemorySaver")
+    args = parser.parse_args()
+
+    llm = FakeChatModel(latency=args.latency)
+    with tempfile.TemporaryDirectory(prefix="bench-async-") as scratch, \
+            contextlib.redirect_stdout(io.StringIO()):
+        if args.checkpointer == "sqlite":
+            checkpointer = SQLiteCheckpointSaver(os.path.join(scratch, "checkpoints.sqlite"))
+        else:
+            checkpointer = InMemorySaver()
+        workflow = agent_workflow(checkpointer)
+        sync_seconds = run_sync(workflow, llm, args.sync_sessions)
+        async_seconds = asyncio.run(run_async(workflow, llm, args.sessions))
+        if args.checkpointer == "sqlite":
+            checkpointer.close()
+
+    print(f"LLM latency: {args.latency * 1000:.0f} ms per call, {args.checkpointer} checkpointer")
+    print(f"sync  (sequential): {args.sync_sessions / sync_seconds:8.1f} sessions/s "
+          f"({args.sync_sessions} sessions in {sync_seconds:.2f}s)")
+    print(f"async (concurrent): {args.sessions / async_seconds:8.1f} sessions/s "
+          f"({args.sessions} sessions in {async_seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+End-to-end benchmark of agent_workflow() on the fake local LLM.
+
+Runs single-turn sessions for each answer path (qa, summarisation,
+calculation) at several concurrency levels and corpus sizes, and reports
+throughput, latency percentiles and peak Python memory. No API key or
+network access is needed.
+
+Usage:
+    python bench_graph.py                                   # full matrix, printed as a table
+    python bench_graph.py --paths qa --concurrency 1 16 --sizes 5 10000
+    python bench_graph.py --save baseline.json              # record a baseline
+    python bench_graph.py --compare baseline.json           # exit 1 on regressions
+
+Timings come from one pass and peak memory from a second pass under
+tracemalloc, which would otherwise slow the timed run down. Response and
+tool result caching are off unless --cache is given, so every session does
+the full work.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+import json_logger
+from agent import agent_workflow
+from bench_retrieval import synthetic_corpus
+from corpus import MOCK_DOCUMENTS
+from document_store import InMemoryDocumentStore, set_document_store
+from fake_llm import FakeChatModel
+from instrumentation import percentile
+from response_cache import MemoryCacheBackend, ResponseCache
+from tool_cache import tool_cache, DEFAULT_MAX_ENTRIES
+
+# Questions per path; sessions cycle through them
+QUERIES = {
+    "qa": [
+        "What is machine learning?",
+        "Which Python libraries are used for visualization?",
+        "What are the best practices in data visualization?",
+        "What was the year-over-year growth in the financial report?",
+    ],
+    "summarisation": [f"Can you summarise doc_{i}?" for i in range(1, 6)],
+    "calculation": [
+        "Calculate the total revenue in doc_5",
+        "What is the total of the quarterly revenue in doc_5?",
+    ],
+}
+
+# Node that must answer each path; sessions routed elsewhere are counted as misrouted
+ANSWER_NODE = {"qa": "qa_agent", "summarisation": "summarisation_agent", "calculation": "calculation_agent"}
+
+# Throughput drop or p95 increase (as a fraction) reported as a regression
+DEFAULT_TOLERANCE = 0.10
+
+
+def build_corpus(size: int) -> InMemoryDocumentStore:
+    """The sample documents plus synthetic filler up to size documents."""
+    filler = synthetic_corpus(max(size - len(MOCK_DOCUMENTS), 0))
+    for doc in filler:
+        doc["id"] = doc["id"].replace("doc_", "synthetic_")
+    return InMemoryDocumentStore(list(MOCK_DOCUMENTS) + filler)
+
+
+async def run_sessions(workflow, llm, path: str, sessions: int, concurrency: int,
+                       cache: Optional[ResponseCache]) -> Dict[str, Any]:
+    limit = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    misrouted = 0
+
+    async def one(i: int) -> None:
+        nonlocal misrouted
+        config = {"configurable": {"thread_id": f"bench-{path}-{i}", "llm": llm, "response_cache": cache or False}}
+        state = {"user_input": QUERIES[path][i % len(QUERIES[path])], "session_id": f"bench-{i}"}
+        async with limit:
+            start = time.perf_counter()
+            result = await workflow.ainvoke(state, config)
+            latencies.append(time.perf_counter() - start)
+        if ANSWER_NODE[path] not in result.get("actions_taken", []):
+            misrouted += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput": round(sessions / elapsed, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "misrouted": misrouted,
+    }
+
+
+def run_scenario(llm, path: str, size: int, concurrency: int, sessions: int,
+                 cache: bool, measure_memory: bool) -> Dict[str, Any]:
+    def fresh_run() -> Dict[str, Any]:
+        tool_cache.clear()
+        # Fresh in-memory checkpoints and response cache, so scenarios don't share state or memory
+        workflow = agent_workflow(InMemorySaver())
+        response_cache = ResponseCache(MemoryCacheBackend()) if cache else None
+        return asyncio.run(run_sessions(workflow, llm, path, sessions, concurrency, response_cache))
+
+    result = {"path": path, "corpus_size": size, "concurrency": concurrency, "sessions": sessions}
+    result.update(fresh_run())
+
+    if measure_memory:
+        tracemalloc.start()
+        try:
+            fresh_run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result["peak_mb"] = round(peak / 1_000_000, 3)
+    return result
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Lines describing each scenario's change against the baseline; the ones
+    beyond the tolerance start with "REGRESSION".
+    """
+    key = lambda r: (r["path"], r["corpus_size"], r["concurrency"])
+    previous = {key(r): r for r in baseline.get("results", [])}
+    lines = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        throughput = result["throughput"] / old["throughput"] - 1
+        p95 = result["p95_ms"] / old["p95_ms"] - 1 if old["p95_ms"] else 0.0
+        regressed = throughput < -tolerance or p95 > tolerance
+        lines.append(f"{'REGRESSION' if regressed else 'ok':<10} {result['path']:<14} "
+                     f"docs={result['corpus_size']:<7} c={result['concurrency']:<4} "
+                     f"throughput {throughput:+.1%}  p95 {p95:+.1%}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", nargs="+", default=list(QUERIES), choices=list(QUERIES))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[5, 1000, 10000], help="Corpus sizes")
+    parser.add_argument("--sessions", type=int, default=64, help="Sessions per scenario")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds per fake LLM call")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- fraction of latency per call")
+    parser.add_argument("--cache", action="store_true", help="Keep response and tool result caching on")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    # Keep benchmark records out of the application log
+    log_dir = tempfile.mkdtemp(prefix="bench-graph-")
+    json_logger.configure(path=os.path.join(log_dir, "logs.jsonl"))
+
+    if not args.cache:
+        tool_cache.max_entries = 0
+
+    # Warm up imports, graph compilation and the intent router before timing anything
+    with contextlib.redirect_stdout(io.StringIO()):
+        set_document_store(build_corpus(min(args.sizes)))
+        for path in args.paths:
+            run_scenario(FakeChatModel(), path, min(args.sizes), 4, 8, args.cache, measure_memory=False)
+
+    print(f"{'path':<14} {'docs':>7} {'conc':>5} {'sess/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'peak MB':>8}")
+    results = []
+    for size in args.sizes:
+        set_document_store(build_corpus(size))
+        for path in args.paths:
+            for concurrency in args.concurrency:
+                llm = FakeChatModel(latency=args.latency, jitter=args.jitter)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = run_scenario(llm, path, size, concurrency, args.sessions,
+                                          args.cache, not args.no_memory)
+                results.append(result)
+                peak = f"{result['peak_mb']:8.1f}" if "peak_mb" in result else f"{'-':>8}"
+                print(f"{path:<14} {size:>7} {concurrency:>5} {result['throughput']:>9.1f} "
+                      f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f} {peak}"
+                      + (f"  ({result['misrouted']} misrouted)" if result["misrouted"] else ""))
+
+    tool_cache.max_entries = DEFAULT_MAX_ENTRIES
+    json_logger.shutdown()
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "settings": {"sessions": args.sessions, "latency": args.latency, "jitter": args.jitter,
+                             "cache": args.cache},
+                "results": results,
+            }, f, indent=2)
+        print(f"\nSaved {len(results)} results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        lines = compare(results, baseline, args.tolerance)
+        print(f"\nAgainst {args.compare} (tolerance {args.tolerance:.0%}):")
+        print("\n".join(lines) if lines else "no matching scenarios")
+        if any(line.startswith("REGRESSION") for line in lines):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
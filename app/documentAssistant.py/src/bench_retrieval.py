@@ -0,0 +1,107 @@
+"""
+Query latency benchmark for the document store.
+
+Usage:
+    python bench_retrieval.py                       # 10k, 100k and 1M documents
+    python bench_retrieval.py --sizes 10000 100000  # custom corpus sizes
+    python bench_retrieval.py --mmap                # query a memory-mapped index file
+"""
+import argparse
+import itertools
+import random
+import os
+import statistics
+import tempfile
+import time
+from typing import List, Dict, Any
+
+from document_store import InMemoryDocumentStore
+from disk_index import write_index, MmapDocumentStore
+
+
+def synthetic_corpus(size: int, vocab_size: int = 50_000, doc_length: int = 80,
+                     seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generate documents whose words follow a Zipf-like distribution,
+    so a few terms are very common and most are rare (as in real text).
+    """
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(vocab_size)))
+
+    docs = []
+    for i in range(size):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=doc_length)
+        docs.append({
+            "id": f"doc_{i}",
+            "content": " ".join(words),
+            "title": f"Synthetic document {i}",
+            "source": "synthetic",
+        })
+    return docs
+
+
+def synthetic_queries(count: int, vocab_size: int = 50_000, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    return [" ".join(f"term{rng.randrange(vocab_size // 10)}" for _ in range(rng.randint(1, 4)))
+            for _ in range(count)]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(size: int, queries: int, max_results: int, use_mmap: bool = False) -> Dict[str, float]:
+    docs = synthetic_corpus(size)
+
+    # "build" is index construction in memory, or just opening the file with --mmap
+    if use_mmap:
+        path = os.path.join(tempfile.mkdtemp(), "bench.idx")
+        write_index(docs, path)
+        del docs
+        start = time.perf_counter()
+        store = MmapDocumentStore(path)
+    else:
+        start = time.perf_counter()
+        store = InMemoryDocumentStore(docs)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    for query in synthetic_queries(queries):
+        start = time.perf_counter()
+        store.search(query, max_results)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    if use_mmap:
+        store.close()
+        os.remove(path)
+
+    return {
+        "documents": size,
+        "build_s": build_seconds,
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-results", type=int, default=5)
+    parser.add_argument("--mmap", action="store_true", help="Benchmark the on-disk index instead")
+    args = parser.parse_args()
+
+    print(f"{'docs':>10} {'build (s)':>10} {'mean (ms)':>10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+    for size in args.sizes:
+        r = run(size, args.queries, args.max_results, args.mmap)
+        print(f"{r['documents']:>10} {r['build_s']:>10.2f} {r['mean_ms']:>10.3f} "
+              f"{r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Microbenchmark: per-turn cost of preparing the structured-output and
+tool-bound runnables, rebuilt every turn versus served by the registry.
+
+Usage:
+    python bench_runnables.py
+    python bench_runnables.py --turns 2000 --openai   # use a ChatOpenAI instance (no API calls are made)
+"""
+import argparse
+import os
+import time
+
+from fake_llm import FakeChatModel
+from runnable_registry import RunnableRegistry
+from schemas import UserIntent
+from tools import retrieve_documents, search_specific_document, calculate
+
+TOOL_SETS = [
+    (retrieve_documents, search_specific_document),
+    (retrieve_documents, search_specific_document),
+    (retrieve_documents, search_specific_document, calculate),
+]
+
+
+def per_turn_uncached(llm, turns: int) -> float:
+    start = time.perf_counter()
+    for i in range(turns):
+        llm.with_structured_output(UserIntent)
+        llm.bind_tools(list(TOOL_SETS[i % len(TOOL_SETS)]))
+    return (time.perf_counter() - start) / turns
+
+
+def per_turn_cached(llm, turns: int) -> float:
+    registry = RunnableRegistry()
+    start = time.perf_counter()
+    for i in range(turns):
+        registry.structured_output(llm, UserIntent)
+        registry.bind_tools(llm, TOOL_SETS[i % len(TOOL_SETS)])
+    return (time.perf_counter() - start) / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--openai", action="store_true", help="Benchmark ChatOpenAI instead of the fake model")
+    args = parser.parse_args()
+
+    if args.openai:
+        from langchain_openai import ChatOpenAI
+        llm = ChatOpenAI(model="gpt-5-mini", api_key=os.getenv("OPENAI_API_KEY", "sk-benchmark"))
+    else:
+        llm = FakeChatModel()
+
+    uncached = per_turn_uncached(llm, args.turns)
+    cached = per_turn_cached(llm, args.turns)
+
+    print(f"{type(llm).__name__}, {args.turns} turns")
+    print(f"rebuilt every turn: {uncached * 1e6:9.1f} us/turn")
+    print(f"registry (cached):  {cached * 1e6:9.1f} us/turn")
+    print(f"speed-up:           {uncached / cached:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Startup benchmark: import, graph compilation and first-request latency.
+
+Each run starts a fresh Python interpreter, so module imports and the
+first agent_workflow() call are measured cold. The requests use the fake
+local LLM, so no API key is needed. Per run it records:
+
+    import_s          import main (the entry point and everything it pulls in)
+    warm_up_s         warmup.warm_up() (only with --warm)
+    compile_s         first agent_workflow() call
+    memoized_s        second agent_workflow() call (served from the memo)
+    first_request_s   first invoke(), including lazy setup such as the retrieval index
+    second_request_s  a second invoke() on a new thread
+
+Usage:
+    python bench_startup.py
+    python bench_startup.py --runs 10 --warm
+    python bench_startup.py --profile 25              # slowest imports under `import main`
+    python bench_startup.py --check                   # exit 1 if over the cold-start budget
+    python bench_startup.py --check --budget import_s=0.8
+
+--check fails when a phase's median exceeds its budget, or when `import
+main` loads a module that is meant to be imported lazily (DEFERRED_MODULES).
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+
+PHASES = ["import_s", "warm_up_s", "compile_s", "memoized_s", "first_request_s", "second_request_s"]
+
+# Median seconds allowed per phase, with headroom over a typical laptop / CI
+# runner; tighten them with --budget as the numbers improve
+DEFAULT_BUDGET = {
+    "import_s": 1.5,
+    "compile_s": 0.1,
+    "first_request_s": 0.25,
+}
+
+# Heavy modules that must not be loaded by `import main`; they are imported
+# when first needed (the LLM factory, vectorized batch calculations)
+DEFERRED_MODULES = ["langchain_openai", "openai", "numpy"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Scratch directory handed to each child for its checkpoints and logs
+SCRATCH_DIR_ENV = "BENCH_STARTUP_DIR"
+
+
+def measure(warm: bool) -> dict:
+    """Run every phase once in this (fresh) interpreter."""
+    timings = {}
+    start = time.perf_counter()
+    import main
+    timings["import_s"] = time.perf_counter() - start
+    timings["loaded_deferred"] = [name for name in DEFERRED_MODULES if name in sys.modules]
+
+    import agent
+    import json_logger
+    from fake_llm import FakeChatModel
+
+    # Keep benchmark records out of the application log
+    json_logger.configure(path=os.path.join(os.environ[SCRATCH_DIR_ENV], "logs.jsonl"))
+    llm = FakeChatModel()
+
+    if warm:
+        from warmup import warm_up
+        start = time.perf_counter()
+        warm_up(llm)
+        timings["warm_up_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    workflow = agent.agent_workflow()
+    timings["compile_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    agent.agent_workflow()
+    timings["memoized_s"] = time.perf_counter() - start
+
+    for phase, thread in (("first_request_s", "startup-1"), ("second_request_s", "startup-2")):
+        config = {"configurable": {"thread_id": thread, "llm": llm}}
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            workflow.invoke({"user_input": "Can you summarise doc_1?", "session_id": thread}, config)
+            timings[phase] = time.perf_counter() - start
+
+    json_logger.shutdown()
+    return timings
+
+
+def _child_env(scratch: str) -> Dict[str, str]:
+    env = {**os.environ, SCRATCH_DIR_ENV: scratch, "CHECKPOINT_DB": os.path.join(scratch, "checkpoints.sqlite")}
+    # The warm-up is measured as its own phase, not as part of the import
+    env.pop("WARM_START", None)
+    return env
+
+
+def run_child(warm: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as scratch:
+        command = [sys.executable, os.path.abspath(__file__), "--child"] + (["--warm"] if warm else [])
+        out = subprocess.run(command, cwd=HERE, env=_child_env(scratch),
+                             capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def import_profile(module: str = "main") -> List[Tuple[float, float, str]]:
+    """
+    (cumulative seconds, self seconds, indented module name) for every
+    module loaded by importing `module` in a fresh interpreter, from
+    python -X importtime.
+    """
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as scratch:
+        stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=HERE,
+                                env=_child_env(scratch), capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us) / 1e6, int(self_us) / 1e6, name.rstrip()))
+    return rows
+
+
+def over_budget(runs: List[dict], budget: Dict[str, float]) -> List[str]:
+    """Lines describing every budget violation (empty when within budget)."""
+    problems = []
+    for phase, limit in budget.items():
+        values = [run[phase] for run in runs if phase in run]
+        if values and statistics.median(values) > limit:
+            problems.append(f"{phase} median {statistics.median(values) * 1000:.1f} ms "
+                            f"exceeds budget {limit * 1000:.1f} ms")
+    loaded = sorted({name for run in runs for name in run["loaded_deferred"]})
+    if loaded:
+        problems.append(f"`import main` loaded deferred modules: {', '.join(loaded)}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure")
+    parser.add_argument("--warm", action="store_true", help="Run warmup.warm_up() before the first request")
+    parser.add_argument("--profile", type=int, metavar="N", help="Print the N slowest imports of main and exit")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a phase is over budget")
+    parser.add_argument("--budget", nargs="+", default=[], metavar="PHASE=SECONDS",
+                        help="Override budgets, e.g. import_s=0.8")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.warm)))
+        return
+
+    if args.profile:
+        rows = import_profile()
+        print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+        for cumulative, self_time, name in sorted(rows, reverse=True)[:args.profile]:
+            print(f"{cumulative * 1000:>13.1f} {self_time * 1000:>8.1f}  {name}")
+        return
+
+    budget = dict(DEFAULT_BUDGET)
+    for item in args.budget:
+        phase, _, seconds = item.partition("=")
+        if phase not in PHASES:
+            parser.error(f"unknown phase '{phase}'; use one of {', '.join(PHASES)}")
+        budget[phase] = float(seconds)
+
+    runs = [run_child(args.warm) for _ in range(args.runs)]
+    print(f"{'phase':<18} {'median ms':>10} {'max ms':>10} {'budget ms':>10}")
+    for phase in PHASES:
+        values = [run[phase] for run in runs if phase in run]
+        if not values:
+            continue
+        limit = f"{budget[phase] * 1000:>10.1f}" if phase in budget else f"{'-':>10}"
+        print(f"{phase:<18} {statistics.median(values) * 1000:>10.1f} {max(values) * 1000:>10.1f} {limit}")
+
+    if args.check:
+        problems = over_budget(runs, budget)
+        print("\n" + ("\n".join(f"OVER BUDGET: {p}" for p in problems) if problems else "Within the cold-start budget"))
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Time-to-first-token benchmark for the streaming graph path, using a fake local LLM.
+
+Runs the same single-turn sessions through workflow.invoke (the answer is
+available only when the whole graph finishes) and through stream_answer
+(the answer arrives token by token), and reports time to first token and
+total latency separately.
+
+Usage:
+    python bench_stream.py                                 # 20 sessions, 50 ms per call, 5 ms per token
+    python bench_stream.py --sessions 50 --latency 0.2 --token-latency 0.02
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import time
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent import agent_workflow
+from fake_llm import FakeChatModel
+from streaming import stream_answer
+
+QUERIES = [
+    "Can you summarise doc_1?",
+    "What is machine learning?",
+    "Calculate the total revenue in doc_5",
+]
+
+
+def config_for(llm, session: str) -> dict:
+    return {"configurable": {"thread_id": f"bench-{session}", "llm": llm}}
+
+
+def run_invoke(workflow, llm, sessions: int):
+    totals = []
+    for i in range(sessions):
+        start = time.perf_counter()
+        workflow.invoke({"user_input": QUERIES[i % len(QUERIES)]}, config_for(llm, f"invoke-{i}"))
+        totals.append(time.perf_counter() - start)
+    # Nothing reaches the user before the graph returns
+    return totals, totals
+
+
+def run_stream(workflow, llm, sessions: int):
+    ttfts, totals = [], []
+    for i in range(sessions):
+        for event in stream_answer(workflow, {"user_input": QUERIES[i % len(QUERIES)]},
+                                   config_for(llm, f"stream-{i}")):
+            if event["event"] == "done":
+                ttfts.append(event["ttft_seconds"])
+                totals.append(event["total_seconds"])
+    return ttfts, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before each fake LLM response")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Seconds between streamed tokens")
+    args = parser.parse_args()
+
+    llm = FakeChatModel(latency=args.latency, token_latency=args.token_latency)
+    with contextlib.redirect_stdout(io.StringIO()):
+        workflow = agent_workflow(InMemorySaver())
+        invoke_ttft, invoke_total = run_invoke(workflow, llm, args.sessions)
+        stream_ttft, stream_total = run_stream(workflow, llm, args.sessions)
+
+    print(f"LLM latency: {args.latency * 1000:.0f} ms per call, {args.token_latency * 1000:.0f} ms per token")
+    print(f"{'mode':<8} {'ttft p50':>10} {'ttft p95':>10} {'total p50':>10} {'total p95':>10}")
+    for name, ttft, total in (("invoke", invoke_ttft, invoke_total), ("stream", stream_ttft, stream_total)):
+        print(f"{name:<8} {statistics.median(ttft) * 1000:8.1f}ms {percentile(ttft, 95) * 1000:8.1f}ms "
+              f"{statistics.median(total) * 1000:8.1f}ms {percentile(total, 95) * 1000:8.1f}ms")
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import ast
+import functools
+import math
+import operator
+import sys
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Union
+
+# ----- Safe Arithmetic -----
+#
+# Expressions are parsed with ast, checked against a whitelist of node
+# types, operators and functions, and compiled once into a tree of Python
+# closures (cached per expression string). Nothing is passed to eval(), and
+# the limits below keep a hostile expression such as 9**9**9 from tying up
+# a worker: there are no loops, so the node count bounds the evaluation
+# steps, and the sizes of powers and products are checked before they are
+# computed. Results must also fit in a float, which is what callers get back.
+
+MAX_EXPRESSION_CHARS = 2_000
+MAX_NODES = 500                # AST nodes per expression, i.e. evaluation steps per row
+MAX_EXPONENT = 1_000           # |b| in a ** b
+MAX_INT_BITS = 4_096           # size of any integer intermediate
+MAX_BATCH_EXPRESSIONS = 1_000
+MAX_BATCH_ROWS = 1_000_000     # values per variable in a batch
+COMPILE_CACHE_SIZE = 1_024
+
+Number = Union[int, float]
+
+
+class CalculationError(ValueError):
+    """Raised for expressions that are malformed, not allowed or over a limit."""
+
+
+# ----- Operators and functions -----
+
+_BINARY: Dict[type, Callable[[Any, Any], Any]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+
+_UNARY: Dict[type, Callable[[Any], Any]] = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+_CONSTANTS: Dict[str, float] = {"pi": math.pi, "e": math.e}
+
+
+def _round(x, digits: int = 0):
+    return round(x, int(digits))
+
+
+def _log(x, base=None):
+    return math.log(x) if base is None else math.log(x, base)
+
+
+_SCALAR_FUNCTIONS: Dict[str, Callable] = {
+    "abs": abs, "round": _round, "min": min, "max": max,
+    "sqrt": math.sqrt, "log": _log, "exp": math.exp,
+    "floor": math.floor, "ceil": math.ceil,
+}
+
+@functools.lru_cache(maxsize=None)
+def _numpy():
+    """
+    NumPy, imported on the first batch with variables rather than with this
+    module (it is a large import); None when it isn't installed, in which
+    case batches are evaluated one row at a time.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+@functools.lru_cache(maxsize=None)
+def _vector_functions() -> Dict[str, Callable]:
+    np = _numpy()
+    return {
+        "abs": np.abs, "round": lambda x, digits=0: np.round(x, int(digits)),
+        "min": lambda *xs: functools.reduce(np.minimum, xs),
+        "max": lambda *xs: functools.reduce(np.maximum, xs),
+        "sqrt": np.sqrt, "exp": np.exp, "floor": np.floor, "ceil": np.ceil,
+        "log": lambda x, base=None: np.log(x) if base is None else np.log(x) / np.log(base),
+    }
+
+
+def _check(value):
+    """Reject integers over MAX_INT_BITS, non-finite floats and complex results."""
+    if isinstance(value, complex):
+        raise CalculationError("result is not a real number")
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise CalculationError(f"intermediate result exceeds {MAX_INT_BITS} bits")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise CalculationError("result is not a finite number")
+    return value
+
+
+def _power(base, exponent):
+    # Arrays only exist once a batch has imported numpy
+    np = sys.modules.get("numpy")
+    if np is not None and isinstance(exponent, np.ndarray):
+        if exponent.size and np.abs(exponent).max() > MAX_EXPONENT:
+            raise CalculationError(f"exponent larger than {MAX_EXPONENT}")
+        return np.power(base, exponent)
+    if abs(exponent) > MAX_EXPONENT:
+        raise CalculationError(f"exponent larger than {MAX_EXPONENT}")
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0:
+        if base.bit_length() * exponent > MAX_INT_BITS:
+            raise CalculationError(f"power exceeds {MAX_INT_BITS} bits")
+    return base ** exponent
+
+
+def _multiply(left, right):
+    if isinstance(left, int) and isinstance(right, int):
+        if left.bit_length() + right.bit_length() > MAX_INT_BITS + 1:
+            raise CalculationError(f"product exceeds {MAX_INT_BITS} bits")
+    return left * right
+
+
+def _to_float(value) -> float:
+    """The final result as a float, for integers too large for one as well."""
+    try:
+        return float(value)
+    except OverflowError:
+        raise CalculationError("result is too large")
+    except (ValueError, TypeError) as e:
+        raise CalculationError(str(e))
+
+
+# ----- Compilation -----
+
+class CompiledExpression:
+    """
+    A validated expression, callable with values for its variables.
+
+    Args:
+        source: The expression text
+        evaluate: Closure tree taking (variables, functions)
+        names: Variables the expression uses
+    """
+
+    def __init__(self, source: str, evaluate: Callable, names: frozenset):
+        self.source = source
+        self.names = names
+        self._evaluate = evaluate
+
+    def __call__(self, variables: Optional[Mapping[str, Any]] = None,
+                 functions: Mapping[str, Callable] = _SCALAR_FUNCTIONS):
+        variables = variables or {}
+        missing = self.names - variables.keys()
+        if missing:
+            raise CalculationError(f"no value for {', '.join(sorted(missing))}")
+        try:
+            return self._evaluate(variables, functions)
+        except CalculationError:
+            raise
+        except ZeroDivisionError:
+            raise CalculationError("division by zero")
+        except OverflowError:
+            raise CalculationError("result is too large")
+        except (ValueError, TypeError) as e:
+            raise CalculationError(str(e))
+
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.source!r})"
+
+
+class _Compiler:
+    def __init__(self, source: str):
+        self.source = source
+        self.nodes = 0
+        self.names = set()
+
+    def compile(self, node: ast.AST) -> Callable:
+        self.nodes += 1
+        if self.nodes > MAX_NODES:
+            raise CalculationError(f"expression has more than {MAX_NODES} operations")
+
+        if isinstance(node, ast.Constant):
+            value = node.value
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise CalculationError(f"unsupported constant {value!r}")
+            return lambda v, f: value
+
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            left, right = self.compile(node.left), self.compile(node.right)
+            if isinstance(node.op, ast.Pow):
+                return lambda v, f: _check(_power(left(v, f), right(v, f)))
+            if isinstance(node.op, ast.Mult):
+                return lambda v, f: _check(_multiply(left(v, f), right(v, f)))
+            op = _BINARY[type(node.op)]
+            return lambda v, f: _check(op(left(v, f), right(v, f)))
+
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+            operand, op = self.compile(node.operand), _UNARY[type(node.op)]
+            return lambda v, f: op(operand(v, f))
+
+        if isinstance(node, ast.Name):
+            name = node.id
+            if name in _CONSTANTS:
+                constant = _CONSTANTS[name]
+                return lambda v, f: constant
+            self.names.add(name)
+            return lambda v, f: v[name]
+
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                and node.func.id in _SCALAR_FUNCTIONS and not node.keywords):
+            name = node.func.id
+            args = [self.compile(arg) for arg in node.args]
+            return lambda v, f: _check(f[name](*(arg(v, f) for arg in args)))
+
+        snippet = ast.get_source_segment(self.source, node) or type(node).__name__
+        raise CalculationError(f"'{snippet[:40]}' is not allowed; use numbers, + - * / // % **, "
+                               f"parentheses and {', '.join(sorted(_SCALAR_FUNCTIONS))}")
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_expression(expression: str) -> CompiledExpression:
+    """
+    Parse and validate an expression once; repeated expressions come from the cache.
+    """
+    if len(expression) > MAX_EXPRESSION_CHARS:
+        raise CalculationError(f"expression longer than {MAX_EXPRESSION_CHARS} characters")
+    source = expression.strip()
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        raise CalculationError(f"invalid expression: {e.msg}")
+    except (RecursionError, MemoryError):
+        raise CalculationError("expression is nested too deeply")
+    compiler = _Compiler(source)
+    evaluate = compiler.compile(tree.body)
+    return CompiledExpression(expression, evaluate, frozenset(compiler.names))
+
+
+def evaluate(expression: str, variables: Optional[Mapping[str, Number]] = None) -> float:
+    """
+    Evaluate one arithmetic expression.
+
+    Raises:
+        CalculationError: If the expression is invalid, not allowed or over a limit
+    """
+    return _to_float(compile_expression(expression)(variables))
+
+
+# ----- Batches -----
+
+def _columns(variables: Mapping[str, Sequence[Number]]) -> int:
+    lengths = {len(values) for values in variables.values()}
+    if len(lengths) > 1:
+        raise CalculationError("all variables need the same number of values")
+    rows = lengths.pop() if lengths else 0
+    if rows > MAX_BATCH_ROWS:
+        raise CalculationError(f"more than {MAX_BATCH_ROWS} values per variable")
+    return rows
+
+
+def _evaluate_rows(compiled: CompiledExpression, variables: Mapping[str, Sequence[Number]],
+                   arrays: Optional[Dict[str, Any]], rows: int) -> Union[float, List[float]]:
+    if not compiled.names:
+        return _to_float(compiled())
+    if arrays is not None:
+        # One pass over whole columns instead of one closure walk per row
+        np = _numpy()
+        with np.errstate(all="ignore"):
+            result = compiled(arrays, _vector_functions())
+        result = np.broadcast_to(np.asarray(result, dtype=np.float64), (rows,))
+        if not np.isfinite(result).all():
+            raise CalculationError("result is not a finite number for every row")
+        return result.tolist()
+    return [_to_float(compiled({name: values[i] for name, values in variables.items()})) for i in range(rows)]
+
+
+def evaluate_batch(expressions: Sequence[str],
+                   variables: Optional[Mapping[str, Sequence[Number]]] = None) -> List[Union[float, List[float], str]]:
+    """
+    Evaluate several expressions in one call.
+
+    Expressions without variables give one number each. Expressions that
+    use variables are evaluated for every row of values (vectorized with
+    NumPy when it is installed) and give a list. A failing expression gives
+    an error string without affecting the others.
+    """
+    if len(expressions) > MAX_BATCH_EXPRESSIONS:
+        raise CalculationError(f"more than {MAX_BATCH_EXPRESSIONS} expressions")
+    variables = variables or {}
+    rows = _columns(variables)
+    arrays = None
+    np = _numpy() if variables else None
+    if np is not None:
+        arrays = {name: np.asarray(values, dtype=np.float64) for name, values in variables.items()}
+
+    results: List[Union[float, List[float], str]] = []
+    for expression in expressions:
+        try:
+            results.append(_evaluate_rows(compile_expression(expression), variables, arrays, rows))
+        except CalculationError as e:
+            results.append(f"Error in calculation: {e}")
+    return results
@@ -0,0 +1,388 @@
+import asyncio
+import functools
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from schemas import AgentState, AnswerResponse
+
+# ----- SQLite Checkpointer -----
+#
+# Durable checkpoints for multi-turn sessions, in one local SQLite file.
+#
+# Layout follows LangGraph's own savers: a checkpoint row holds only channel
+# versions and metadata, and each channel value is a separate blob keyed by
+# (channel, version). A step writes blobs for the channels it changed, and
+# resuming a thread loads one checkpoint row plus the current blob of each
+# channel, so neither grows with the number of earlier checkpoints.
+#
+# Values are msgpack-encoded. Documents inside AnswerResponse.retrieved_documents
+# go into a content-addressed documents table and are replaced by
+# {"$doc_ref": hash}, so a document cited on every turn is stored once
+# instead of once per checkpoint. document_refs records which threads use
+# each document, so deleting the last of them deletes the document too.
+
+# Path of the checkpoint database used by agent_workflow()
+CHECKPOINT_DB_ENV = "CHECKPOINT_DB"
+DEFAULT_CHECKPOINT_DB = "checkpoints.sqlite"
+
+DOC_REF = "$doc_ref"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS documents (
+    ref TEXT PRIMARY KEY,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS document_refs (
+    thread_id TEXT NOT NULL,
+    ref TEXT NOT NULL,
+    PRIMARY KEY (thread_id, ref)
+);
+CREATE INDEX IF NOT EXISTS document_refs_ref ON document_refs (ref);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpoint saver backed by SQLite.
+
+    Safe to share between threads; every statement runs under one lock on a
+    single connection. The async methods run the same code on a dedicated
+    thread, so SQLite I/O doesn't block the event loop.
+    """
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT_DB):
+        super().__init__(serde=JsonPlusSerializer(allowed_msgpack_modules=[
+            ("schemas", "AnswerResponse"),
+            ("schemas", "UserIntent"),
+            ("schemas", "AgentState"),
+        ]))
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # Statements are serialized by the lock anyway, so async callers share
+        # one thread instead of queueing pool threads on the lock
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpointer")
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # With WAL, NORMAL skips the fsync on every commit; a power cut can
+            # lose the latest checkpoints but can't corrupt the database
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        with self._lock:
+            self._conn.close()
+
+    # ----- Document references -----
+
+    def _store_documents(self, docs: List[Any], thread_id: str) -> List[Any]:
+        refs = []
+        for doc in docs:
+            if not isinstance(doc, dict):
+                refs.append(doc)
+                continue
+            type_, value = self.serde.dumps_typed(doc)
+            ref = hashlib.blake2b(value, digest_size=16).hexdigest()
+            self._conn.execute(
+                "INSERT OR IGNORE INTO documents (ref, type, value) VALUES (?, ?, ?)",
+                (ref, type_, value)
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO document_refs (thread_id, ref) VALUES (?, ?)", (thread_id, ref)
+            )
+            refs.append({DOC_REF: ref})
+        return refs
+
+    def _load_documents(self, refs: List[Any]) -> List[Any]:
+        docs = []
+        for ref in refs:
+            if isinstance(ref, dict) and DOC_REF in ref:
+                row = self._conn.execute(
+                    "SELECT type, value FROM documents WHERE ref = ?", (ref[DOC_REF],)
+                ).fetchone()
+                docs.append(self.serde.loads_typed((row[0], row[1])) if row else {})
+            else:
+                docs.append(ref)
+        return docs
+
+    def _map_responses(self, value: Any, transform) -> Any:
+        # Channel values are AnswerResponses (current_response, retrieved_documents)
+        # or, for graph inputs, a whole AgentState
+        if isinstance(value, AnswerResponse) and value.retrieved_documents:
+            return value.model_copy(update={"retrieved_documents": transform(value.retrieved_documents)})
+        if isinstance(value, AgentState):
+            updates = {
+                field: self._map_responses(getattr(value, field), transform)
+                for field in ("current_response", "retrieved_documents")
+                if getattr(value, field) is not None
+            }
+            return value.model_copy(update=updates) if updates else value
+        return value
+
+    def _dump(self, value: Any, thread_id: str) -> Tuple[str, bytes]:
+        return self.serde.dumps_typed(self._map_responses(value, lambda docs: self._store_documents(docs, thread_id)))
+
+    def _load(self, type_: str, value: bytes) -> Any:
+        return self._map_responses(self.serde.loads_typed((type_, value)), self._load_documents)
+
+    # ----- Reads -----
+
+    def _tuple(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, checkpoint_blob, metadata_type, metadata_blob = row
+        checkpoint: Checkpoint = self.serde.loads_typed((type_, checkpoint_blob))
+
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            blob = self._conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?"
+                " AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version))
+            ).fetchone()
+            if blob is not None and blob[0] != "empty":
+                channel_values[channel] = self._load(blob[0], blob[1])
+
+        writes = self._conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes"
+            " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=({"configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": parent_id,
+            }} if parent_id else None),
+            pending_writes=[(task_id, channel, self._load(type_, value))
+                            for task_id, idx, channel, type_, value, task_path in writes],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = ("SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+                   " FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?")
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(columns + " AND checkpoint_id = ?",
+                                         (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = self._conn.execute(columns + " ORDER BY checkpoint_id DESC LIMIT 1",
+                                         (thread_id, checkpoint_ns)).fetchone()
+            return self._tuple(thread_id, checkpoint_ns, row) if row else None
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint,"
+                 " metadata_type, metadata FROM checkpoints WHERE 1 = 1")
+        params: List[Any] = []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            with self._lock:
+                tup = self._tuple(row[0], row[1], row[2:])
+            if filter and not all(tup.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield tup
+
+    # ----- Writes -----
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint = checkpoint.copy()
+        values: Dict[str, Any] = checkpoint.pop("channel_values")  # type: ignore[misc]
+
+        with self._lock, self._conn:
+            # Only the channels changed by this step get new blobs
+            for channel, version in new_versions.items():
+                type_, value = self._dump(values[channel], thread_id) if channel in values else ("empty", b"")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, value)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, channel, str(version), type_, value)
+                )
+            type_, checkpoint_blob = self.serde.dumps_typed(checkpoint)
+            metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id,"
+                " parent_checkpoint_id, type, checkpoint, metadata_type, metadata)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, checkpoint_blob, metadata_type, metadata_blob)
+            )
+
+        return {"configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with self._lock, self._conn:
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                type_, blob = self._dump(value, thread_id)
+                # Special writes (negative idx) replace; regular writes are kept once
+                verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+                self._conn.execute(
+                    f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx,"
+                    " channel, type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, blob, task_path)
+                )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock, self._conn:
+            for table in ("checkpoints", "blobs", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            refs = [ref for (ref,) in self._conn.execute(
+                "SELECT ref FROM document_refs WHERE thread_id = ?", (thread_id,))]
+            self._conn.execute("DELETE FROM document_refs WHERE thread_id = ?", (thread_id,))
+            # Documents no other thread refers to
+            self._conn.executemany(
+                "DELETE FROM documents WHERE ref = ?"
+                " AND NOT EXISTS (SELECT 1 FROM document_refs WHERE document_refs.ref = documents.ref)",
+                [(ref,) for ref in refs]
+            )
+
+    def get_next_version(self, current: Optional[str], channel: None = None) -> str:
+        # Same sortable "<counter>.<random>" format as LangGraph's InMemorySaver
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ----- Async -----
+
+    async def _run(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self._run(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items = await self._run(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        return await self._run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        await self._run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self._run(self.delete_thread, thread_id)
+
+
+# ----- Shared Checkpointer -----
+
+_checkpointer: Optional[SQLiteCheckpointSaver] = None
+_checkpointer_lock = threading.Lock()
+
+
+def get_checkpointer() -> SQLiteCheckpointSaver:
+    """
+    Return the process-wide checkpointer, opening CHECKPOINT_DB
+    (default checkpoints.sqlite) on first use.
+    """
+    global _checkpointer
+    if _checkpointer is None:
+        with _checkpointer_lock:
+            if _checkpointer is None:
+                _checkpointer = SQLiteCheckpointSaver(os.getenv(CHECKPOINT_DB_ENV, DEFAULT_CHECKPOINT_DB))
+    return _checkpointer
@@ -0,0 +1,161 @@
+import json
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from memory import estimate_tokens
+
+# ----- Tool Result Compaction -----
+#
+# Tool results go back to the model as compact JSON instead of Python reprs,
+# with the fields it doesn't need removed. A document or passage already
+# shown in full earlier in the same loop is replaced by a short reference,
+# and the results of one iteration are trimmed to a token budget by
+# shortening their longest strings. Anything that was shortened counts as
+# not shown, so it is sent again when a later call returns it.
+
+DEFAULT_TOOL_TOKEN_BUDGET = 1500
+
+# Fields the model sees for each kind of result
+DOCUMENT_FIELDS = ("id", "title", "content")
+PASSAGE_FIELDS = ("text",)
+
+# Strings shorter than this are never shortened
+MIN_STRING_CHARS = 80
+ELLIPSIS = "…"
+
+
+def to_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _shrink(value: Any, ratio: float) -> Any:
+    # Shorten every long string by the same ratio, leaving the structure intact
+    if isinstance(value, str) and len(value) > MIN_STRING_CHARS:
+        return value[:max(MIN_STRING_CHARS, int(len(value) * ratio))] + ELLIPSIS
+    if isinstance(value, dict):
+        return {k: _shrink(v, ratio) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_shrink(v, ratio) for v in value]
+    return value
+
+
+def fit_to_budget(payload: Any, token_budget: int) -> str:
+    """
+    Compact JSON for payload, with long strings shortened until it fits.
+    """
+    return _fit(payload, token_budget)[0]
+
+
+def _fit(payload: Any, token_budget: int) -> Tuple[str, Optional[Any]]:
+    # fit_to_budget, also returning the payload that was encoded (None when
+    # the JSON text itself had to be cut)
+    text = to_json(payload)
+    for _ in range(6):
+        tokens = estimate_tokens(text)
+        if tokens <= token_budget:
+            return text, payload
+        payload = _shrink(payload, 0.9 * token_budget / tokens)
+        text = to_json(payload)
+    if estimate_tokens(text) <= token_budget:
+        return text, payload
+    # Mostly short strings or structure: cut the text itself
+    return text[:token_budget * 4] + ELLIPSIS, None
+
+
+class ToolResultCompactor:
+    """
+    Compacts the tool results of one agent loop.
+
+    Args:
+        token_budget: Tokens allowed for all tool results of one iteration
+    """
+
+    def __init__(self, token_budget: int = DEFAULT_TOOL_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.seen_documents: Set[str] = set()
+        self.seen_passages: Set[Tuple[str, int]] = set()
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def _documents(self, docs: List[Any]) -> Tuple[List[Any], List[Optional[str]]]:
+        compacted, keys = [], []
+        for doc in docs:
+            if not isinstance(doc, dict) or "id" not in doc:
+                compacted.append(doc)
+                keys.append(None)
+            elif doc["id"] in self.seen_documents:
+                compacted.append({"id": doc["id"], "note": "already shown above"})
+                keys.append(None)
+            else:
+                compacted.append({k: doc[k] for k in DOCUMENT_FIELDS if k in doc})
+                keys.append(doc["id"])
+        return compacted, keys
+
+    def _passages(self, result: Dict[str, Any]) -> Tuple[Dict[str, Any], List[Tuple[str, int]]]:
+        doc_id = result.get("document_id")
+        passages, keys = [], []
+        for passage in result.get("passages", []):
+            key = (doc_id, passage.get("start"))
+            # A document shown in full already contains every passage of it
+            if doc_id in self.seen_documents or key in self.seen_passages:
+                continue
+            passages.append({k: passage[k] for k in PASSAGE_FIELDS if k in passage})
+            keys.append(key)
+        compacted = {k: v for k, v in result.items() if k != "passages"}
+        if "passages" in result:
+            compacted["passages"] = passages
+            if len(passages) < len(result["passages"]):
+                compacted["note"] = "some passages already shown above"
+        return compacted, keys
+
+    def prepare(self, result: Any) -> Tuple[Any, list]:
+        """
+        Drop unneeded fields and documents already in context.
+
+        Returns the payload and, aligned with its documents or passages, the
+        keys to remember once they have been sent in full (None for items
+        that are not remembered).
+        """
+        if isinstance(result, list):
+            return self._documents(result)
+        if isinstance(result, dict) and "document_id" in result:
+            return self._passages(result)
+        return result, []
+
+    def _remember(self, prepared: Any, sent: Optional[Any], keys: list) -> None:
+        # Only items that reached the model unshortened count as shown
+        if sent is None or not keys:
+            return
+        if isinstance(prepared, list):
+            for key, before, after in zip(keys, prepared, sent):
+                if key is not None and before == after:
+                    self.seen_documents.add(key)
+        else:
+            for key, before, after in zip(keys, prepared["passages"], sent["passages"]):
+                if before == after:
+                    self.seen_passages.add(key)
+
+    def compact(self, results: List[Any]) -> List[str]:
+        """
+        Message contents for one iteration's tool results, within the budget.
+        """
+        share = max(self.token_budget // max(len(results), 1), 1)
+        contents = []
+        for result in results:
+            self.tokens_before += estimate_tokens(str(result))
+            prepared, keys = self.prepare(result)
+            content, sent = _fit(prepared, share)
+            self._remember(prepared, sent, keys)
+            self.tokens_after += estimate_tokens(content)
+            contents.append(content)
+        return contents
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tool_tokens_before": self.tokens_before,
+            "tool_tokens_after": self.tokens_after,
+            "tool_tokens_saved": self.tokens_saved,
+        }
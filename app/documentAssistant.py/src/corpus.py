@@ -0,0 +1,37 @@
+from typing import List, Dict, Any
+
+# ----- Sample Corpus -----
+
+# Mock documents used when no on-disk corpus has been configured
+MOCK_DOCUMENTS: List[Dict[str, Any]] = [
+    {
+        "id": "doc_1",
+        "content": "Data visualization is the graphical representation of information and data. By using visual elements like charts, graphs, and maps, data visualization tools provide an accessible way to see and understand trends, outliers, and patterns in data. In the world of Big Data, data visualization tools and technologies are essential to analyze massive amounts of information and make data-driven decisions.",
+        "title": "Introduction to Data Visualization",
+        "source": "data_viz_guide.pdf"
+    },
+    {
+        "id": "doc_2",
+        "content": "Effective data visualization helps in understanding complex datasets by presenting information in a visual context. Key principles include choosing the right chart type, using appropriate colors, maintaining simplicity, and ensuring accessibility. Common visualization types include bar charts, line graphs, scatter plots, heat maps, and tree maps.",
+        "title": "Best Practices in Data Visualization",
+        "source": "viz_best_practices.pdf"
+    },
+    {
+        "id": "doc_3",
+        "content": "Machine learning is a subset of artificial intelligence that enables systems to learn and improve from experience without being explicitly programmed. It focuses on developing computer programs that can access data and use it to learn for themselves.",
+        "title": "Introduction to Machine Learning",
+        "source": "ml_basics.pdf"
+    },
+    {
+        "id": "doc_4",
+        "content": "Python data visualization libraries include Matplotlib for basic plotting, Seaborn for statistical visualizations, Plotly for interactive charts, and Bokeh for web-based visualizations. Each library has its strengths and use cases depending on the project requirements.",
+        "title": "Python Visualization Libraries",
+        "source": "python_viz.pdf"
+    },
+    {
+        "id": "doc_5",
+        "content": "The quarterly revenue for Q1 was $1,250,000, Q2 was $1,450,000, Q3 was $1,680,000, and Q4 was $1,920,000. Total annual revenue reached $6,300,000 representing a 15% year-over-year growth.",
+        "title": "2024 Financial Report",
+        "source": "finance_2024.pdf"
+    }
+]
@@ -0,0 +1,266 @@
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Optional, Tuple, AbstractSet
+
+from document_store import DocumentStore, CorpusStats, tokenize, document_text, bm25_idf
+
+# ----- File Format -----
+#
+# A single little-endian file:
+#
+#   header      magic, version, counts, average length and section offsets
+#   term table  one fixed-size entry per term, sorted by term bytes:
+#               (string offset, string length, postings offset, df)
+#   id table    one fixed-size entry per document, sorted by lowercase ID:
+#               (string offset, string length, document number)
+#   doc table   one fixed-size entry per document number:
+#               (data offset, data length, indexed length)
+#   postings    per term, df doc numbers followed by df term frequencies (uint32)
+#   strings     term and ID bytes referenced by the tables above
+#   doc data    JSON-encoded documents
+#
+# Readers memory-map the file and binary-search the tables in place, so
+# opening an index costs the same regardless of corpus size and only the
+# pages a query touches are read from disk.
+
+MAGIC = b"DAIX"
+VERSION = 1
+
+HEADER = struct.Struct("<4sIIId7Q")
+TERM_ENTRY = struct.Struct("<QIQI")
+ID_ENTRY = struct.Struct("<QII")
+DOC_ENTRY = struct.Struct("<QII")
+
+if sys.byteorder != "little":
+    raise ImportError("disk_index requires a little-endian platform")
+
+
+def write_index(documents: Iterable[Dict[str, Any]], path: str) -> int:
+    """
+    Write documents and their inverted index to a single file.
+
+    The file is written next to its destination and renamed into place,
+    so readers never observe a partially written index.
+
+    Args:
+        documents: Documents with at least an "id" and "content"
+        path: Destination file
+
+    Returns:
+        The number of documents written
+    """
+    doc_blobs: List[bytes] = []
+    doc_ids: List[str] = []
+    doc_lengths: List[int] = []
+    postings: Dict[str, Tuple[array, array]] = {}
+
+    for doc_num, doc in enumerate(documents):
+        doc_blobs.append(json.dumps(doc, separators=(",", ":")).encode("utf-8"))
+        doc_ids.append(doc["id"].lower())
+
+        terms = Counter(tokenize(document_text(doc)))
+        doc_lengths.append(sum(terms.values()))
+        for term, tf in terms.items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("I"), array("I"))
+            entry[0].append(doc_num)
+            entry[1].append(tf)
+
+    n_docs = len(doc_blobs)
+    avg_length = sum(doc_lengths) / n_docs if n_docs else 0.0
+    terms_sorted = sorted(postings, key=lambda t: t.encode("utf-8"))
+    ids_sorted = sorted(range(n_docs), key=lambda i: doc_ids[i].encode("utf-8"))
+
+    # Lay out the sections back to back after the header
+    term_table_off = HEADER.size
+    id_table_off = term_table_off + TERM_ENTRY.size * len(terms_sorted)
+    doc_table_off = id_table_off + ID_ENTRY.size * n_docs
+    postings_off = doc_table_off + DOC_ENTRY.size * n_docs
+    postings_size = sum(8 * len(postings[t][0]) for t in terms_sorted)
+    strings_off = postings_off + postings_size
+    strings = bytearray()
+
+    term_table = bytearray()
+    postings_data = bytearray()
+    for term in terms_sorted:
+        encoded = term.encode("utf-8")
+        doc_nums, tfs = postings[term]
+        term_table += TERM_ENTRY.pack(strings_off + len(strings), len(encoded),
+                                      postings_off + len(postings_data), len(doc_nums))
+        strings += encoded
+        postings_data += doc_nums.tobytes()
+        postings_data += tfs.tobytes()
+
+    id_table = bytearray()
+    for doc_num in ids_sorted:
+        encoded = doc_ids[doc_num].encode("utf-8")
+        id_table += ID_ENTRY.pack(strings_off + len(strings), len(encoded), doc_num)
+        strings += encoded
+
+    doc_data_off = strings_off + len(strings)
+    doc_table = bytearray()
+    cursor = doc_data_off
+    for blob, length in zip(doc_blobs, doc_lengths):
+        doc_table += DOC_ENTRY.pack(cursor, len(blob), length)
+        cursor += len(blob)
+
+    header = HEADER.pack(MAGIC, VERSION, n_docs, len(terms_sorted), avg_length,
+                         term_table_off, id_table_off, doc_table_off,
+                         postings_off, strings_off, doc_data_off, cursor)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(term_table)
+        f.write(id_table)
+        f.write(doc_table)
+        f.write(postings_data)
+        f.write(strings)
+        for blob in doc_blobs:
+            f.write(blob)
+    os.replace(tmp_path, path)
+
+    return n_docs
+
+
+class MmapDocumentStore(DocumentStore):
+    """
+    Read-only document store over a memory-mapped index file.
+
+    Nothing is decoded up front: terms and IDs are binary-searched in the
+    mapped tables, postings are read as zero-copy uint32 views, and only
+    the documents that make the top-k are JSON-decoded.
+    """
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            self._file.close()
+            raise ValueError(f"{path} is not a document index")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        (magic, version, self._n_docs, self._n_terms, self._avg_length,
+         self._term_table, self._id_table, self._doc_table,
+         self._postings, self._strings, self._doc_data, _) = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} document index")
+
+    def close(self) -> None:
+        self._view.release()
+        self._mmap.close()
+        self._file.close()
+
+    # ----- Table lookups -----
+
+    def _string(self, offset: int, length: int) -> bytes:
+        return self._mmap[offset:offset + length]
+
+    def _search_table(self, table_off: int, entry: struct.Struct, count: int, key: bytes) -> Optional[tuple]:
+        """Binary-search a sorted fixed-size table whose entries start with a string reference."""
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            fields = entry.unpack_from(self._mmap, table_off + mid * entry.size)
+            candidate = self._string(fields[0], fields[1])
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return fields
+        return None
+
+    def _term_postings(self, term: str) -> Optional[Tuple[memoryview, memoryview]]:
+        fields = self._search_table(self._term_table, TERM_ENTRY, self._n_terms, term.encode("utf-8"))
+        if fields is None:
+            return None
+        _, _, offset, df = fields
+        postings = self._view[offset:offset + 8 * df].cast("I")
+        return postings[:df], postings[df:]
+
+    def _doc_entry(self, doc_num: int) -> Tuple[int, int, int]:
+        return DOC_ENTRY.unpack_from(self._mmap, self._doc_table + doc_num * DOC_ENTRY.size)
+
+    def _load(self, doc_num: int) -> Dict[str, Any]:
+        offset, length, _ = self._doc_entry(doc_num)
+        return json.loads(self._mmap[offset:offset + length])
+
+    # ----- DocumentStore API -----
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc_num = self.doc_number(doc_id)
+        return self._load(doc_num) if doc_num is not None else None
+
+    def search(self, query: str, max_results: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        return [(score, self._load(doc_num)) for score, doc_num in self.score(query, max_results)]
+
+    def score(self, query: str, max_results: int = 5, stats: Optional[CorpusStats] = None,
+              deleted: AbstractSet[int] = frozenset()) -> List[Tuple[float, int]]:
+        """
+        Rank document numbers by BM25 without decoding any documents.
+
+        Args:
+            query: Free-text query
+            max_results: How many document numbers to return
+            stats: Corpus-wide statistics when this file is one segment of many
+            deleted: Document numbers to leave out of the ranking
+        """
+        if max_results <= 0 or self._n_docs == 0:
+            return []
+
+        n = stats.n_docs if stats else self._n_docs
+        avg = (stats.avg_length if stats else self._avg_length) or 1.0
+        k1, b = self.k1, self.b
+        scores: Dict[int, float] = {}
+        doc_table, entry_size = self._doc_table, DOC_ENTRY.size
+
+        for term in set(tokenize(query)):
+            postings = self._term_postings(term)
+            if postings is None:
+                continue
+            doc_nums, tfs = postings
+            idf = bm25_idf(n, stats.df.get(term, len(doc_nums)) if stats else len(doc_nums))
+            for doc_num, tf in zip(doc_nums, tfs):
+                if doc_num in deleted:
+                    continue
+                _, _, length = DOC_ENTRY.unpack_from(self._mmap, doc_table + doc_num * entry_size)
+                norm = k1 * (1 - b + b * length / avg)
+                scores[doc_num] = scores.get(doc_num, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        top = heapq.nlargest(max_results, scores.items(), key=lambda item: item[1])
+        return [(score, doc_num) for doc_num, score in top]
+
+    def doc_number(self, doc_id: str) -> Optional[int]:
+        fields = self._search_table(self._id_table, ID_ENTRY, self._n_docs, doc_id.lower().encode("utf-8"))
+        return fields[2] if fields is not None else None
+
+    def document(self, doc_num: int) -> Dict[str, Any]:
+        return self._load(doc_num)
+
+    def documents(self) -> Iterable[Dict[str, Any]]:
+        for doc_num in range(self._n_docs):
+            yield self._load(doc_num)
+
+    def document_frequency(self, term: str) -> int:
+        postings = self._term_postings(term)
+        return len(postings[0]) if postings is not None else 0
+
+    def total_length(self) -> float:
+        return self._avg_length * self._n_docs
+
+    def __len__(self) -> int:
+        return self._n_docs
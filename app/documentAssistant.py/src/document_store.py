@@ -0,0 +1,253 @@
+import heapq
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from typing import List, Dict, Any, Iterable, Optional, Tuple, NamedTuple, AbstractSet, Callable
+
+# ----- Tokenization -----
+
+# Word characters plus underscore so document IDs such as "doc_3" stay one token
+TOKEN_PATTERN = re.compile(r"[a-z0-9_]+")
+
+# Very common words that would otherwise match almost every document
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in",
+    "is", "it", "of", "on", "or", "that", "the", "this", "to", "was", "what",
+    "which", "with", "about", "can", "you", "me", "how", "does", "do",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms, dropping stopwords.
+    """
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def document_text(doc: Dict[str, Any]) -> str:
+    """
+    The text that gets indexed for a document (content, title and ID).
+    """
+    return f"{doc.get('content', '')} {doc.get('title', '')} {doc.get('id', '')}"
+
+
+def bm25_idf(n_docs: int, df: int) -> float:
+    """
+    BM25 inverse document frequency (the always-positive Lucene variant).
+    """
+    return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+class CorpusStats(NamedTuple):
+    """
+    Collection statistics shared by every segment of a multi-segment index,
+    so BM25 scores stay comparable across segments.
+    """
+    n_docs: int
+    avg_length: float
+    df: Dict[str, int]
+
+
+# ----- Document Stores -----
+
+class DocumentStore:
+    """
+    Interface for the corpus behind the retrieval tools.
+
+    Implementations must be safe to share between threads, because every
+    agent node reads from the same store instance.
+    """
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Return the document with this ID, or None."""
+        raise NotImplementedError
+
+    def search(self, query: str, max_results: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        """Return up to max_results (score, document) pairs, best first."""
+        raise NotImplementedError
+
+    def documents(self) -> Iterable[Dict[str, Any]]:
+        """Iterate over every live document."""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def version(self) -> int:
+        """
+        Corpus version, bumped whenever documents are added, updated or
+        deleted. Read-only stores stay at version 0.
+        """
+        return 0
+
+
+class InMemoryDocumentStore(DocumentStore):
+    """
+    Document store backed by an inverted index with BM25 scoring.
+
+    The index is built once in the constructor. Each term maps to a postings
+    list of (document number, term frequency) held in two compact arrays, so
+    a query only touches the documents that contain at least one query term.
+    """
+
+    def __init__(self, documents: Iterable[Dict[str, Any]] = (), k1: float = 1.2, b: float = 0.75,
+                 text_fn: Callable[[Dict[str, Any]], str] = document_text):
+        self.k1 = k1
+        self.b = b
+        self._text_fn = text_fn
+
+        self._docs: List[Dict[str, Any]] = []
+        self._id_to_num: Dict[str, int] = {}
+        self._doc_lengths = array("I")
+        self._total_length = 0
+        self._postings: Dict[str, Tuple[array, array]] = {}
+
+        for doc in documents:
+            self.add(doc)
+
+    def add(self, doc: Dict[str, Any]) -> int:
+        """
+        Index one more document and return its document number.
+        """
+        doc_num = len(self._docs)
+        self._docs.append(doc)
+        self._id_to_num[doc["id"].lower()] = doc_num
+
+        terms = Counter(tokenize(self._text_fn(doc)))
+        length = sum(terms.values())
+        self._doc_lengths.append(length)
+        self._total_length += length
+
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("I"))
+            postings[0].append(doc_num)
+            postings[1].append(tf)
+
+        return doc_num
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        doc_num = self._id_to_num.get(doc_id.lower())
+        return self._docs[doc_num] if doc_num is not None else None
+
+    def doc_number(self, doc_id: str) -> Optional[int]:
+        return self._id_to_num.get(doc_id.lower())
+
+    def document(self, doc_num: int) -> Dict[str, Any]:
+        return self._docs[doc_num]
+
+    def documents(self) -> Iterable[Dict[str, Any]]:
+        return iter(self._docs)
+
+    def document_frequency(self, term: str) -> int:
+        postings = self._postings.get(term)
+        return len(postings[0]) if postings is not None else 0
+
+    def total_length(self) -> int:
+        return self._total_length
+
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency (always positive)."""
+        df = self.document_frequency(term)
+        return bm25_idf(len(self._docs), df) if df else 0.0
+
+    def search(self, query: str, max_results: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        return [(score, self._docs[doc_num]) for score, doc_num in self.score(query, max_results)]
+
+    def score(self, query: str, max_results: int = 5, stats: Optional[CorpusStats] = None,
+              deleted: AbstractSet[int] = frozenset()) -> List[Tuple[float, int]]:
+        """
+        Rank document numbers by BM25.
+
+        Args:
+            query: Free-text query
+            max_results: How many document numbers to return
+            stats: Corpus-wide statistics when this index is one segment of many
+            deleted: Document numbers to leave out of the ranking
+        """
+        if max_results <= 0 or not self._docs:
+            return []
+
+        n = stats.n_docs if stats else len(self._docs)
+        avg_length = (stats.avg_length if stats else self._total_length / len(self._docs)) or 1.0
+        k1, b = self.k1, self.b
+        lengths = self._doc_lengths
+        scores: Dict[int, float] = {}
+
+        # Accumulate BM25 contributions term-at-a-time
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            doc_nums, tfs = postings
+            idf = bm25_idf(n, stats.df.get(term, len(doc_nums)) if stats else len(doc_nums))
+            for doc_num, tf in zip(doc_nums, tfs):
+                if doc_num in deleted:
+                    continue
+                norm = k1 * (1 - b + b * lengths[doc_num] / avg_length)
+                scores[doc_num] = scores.get(doc_num, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        # Heap-based top-k instead of sorting every match
+        top = heapq.nlargest(max_results, scores.items(), key=lambda item: item[1])
+        return [(score, doc_num) for doc_num, score in top]
+
+    @property
+    def version(self) -> int:
+        # Documents are only ever appended, so the count doubles as the version
+        return len(self._docs)
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+# ----- Shared Store -----
+
+# Environment variable pointing at an index file or segment directory written by ingest.py
+INDEX_PATH_ENV = "DOC_INDEX_PATH"
+
+_store: Optional[DocumentStore] = None
+_store_lock = threading.Lock()
+
+
+def get_document_store() -> DocumentStore:
+    """
+    Return the process-wide document store, building it on first use.
+
+    All agent nodes share this instance, so the index is built once per
+    process rather than once per tool call.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = _default_store()
+    return _store
+
+
+def _default_store() -> DocumentStore:
+    # An ingested corpus is memory-mapped; otherwise fall back to the samples.
+    # A directory holds an updatable segmented index, a file a read-only one.
+    index_path = os.getenv(INDEX_PATH_ENV)
+    if index_path and os.path.isdir(index_path):
+        from segments import SegmentedDocumentStore
+        return SegmentedDocumentStore(index_path)
+    if index_path:
+        from disk_index import MmapDocumentStore
+        return MmapDocumentStore(index_path)
+
+    from corpus import MOCK_DOCUMENTS
+    return InMemoryDocumentStore(MOCK_DOCUMENTS)
+
+
+def set_document_store(store: DocumentStore) -> None:
+    """
+    Replace the process-wide document store (e.g. with a larger corpus).
+    """
+    global _store
+    with _store_lock:
+        _store = store
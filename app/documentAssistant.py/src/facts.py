@@ -0,0 +1,432 @@
+import json
+import os
+import re
+import threading
+from array import array
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from document_store import DocumentStore
+from segments import segment_cache
+
+# ----- Numeric Facts -----
+#
+# Documents are scanned once for figures such as "Q2 was $1,450,000" or
+# "a 15% year-over-year growth". Each figure becomes a fact row:
+#
+#   (document, metric, period, year, value, unit)
+#
+# The metric is the nearest metric phrase ("quarterly revenue") in the same
+# sentence, carried forward to later figures in a list ("Q1 was ..., Q2 was
+# ...") and to a next sentence that starts from a period ("Q3 was ...").
+# The period and year are the ones right after the figure ("$3.4 million in
+# 2023"), else the latest ones before it in the sentence, the year falling
+# back to one in the title. Rows are
+# stored column by column, so a query scans a few small arrays rather than
+# the documents, and common aggregates are computed in the same call.
+
+# Words that name what a figure measures
+METRIC_TERMS = frozenset({
+    "revenue", "revenues", "sales", "income", "profit", "profits", "earnings", "ebitda",
+    "margin", "cost", "costs", "expenses", "spending", "budget", "growth", "price",
+    "users", "customers", "employees", "headcount", "orders", "cash", "debt", "assets",
+    "dividend", "dividends", "eps", "turnover", "visitors", "subscribers", "units",
+})
+
+# Words skipped when collecting the qualifiers in front of a metric term
+_FILLER = frozenset({"the", "a", "an", "of", "for", "in", "our", "its", "their", "was", "were",
+                     "is", "are", "and", "to", "by", "at", "on", "with", "reached", "totaled"})
+
+# Words that ask for the total of a metric rather than name a different one
+_TOTAL_WORDS = frozenset({"total", "annual", "combined", "overall"})
+
+_CURRENCIES = {"$": "USD", "€": "EUR", "£": "GBP"}
+_MAGNITUDES = {"thousand": 1e3, "k": 1e3, "million": 1e6, "m": 1e6, "mn": 1e6,
+               "billion": 1e9, "bn": 1e9, "b": 1e9, "trillion": 1e12}
+_MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+           "august", "september", "october", "november", "december"]
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_SEGMENT_END = re.compile(r"[,;:()]")
+_NUMBER = re.compile(
+    r"(?<![\w.])(?P<currency>[$€£])?\s?"
+    r"(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)"
+    r"(?:\s?(?P<magnitude>thousand|million|billion|trillion|bn|mn|[kmb])\b)?"
+    r"\s?(?P<percent>%|percent\b)?",
+    re.I,
+)
+_PERIOD = re.compile(r"\b(q[1-4]|h[12]|fy\s?\d{2,4}|annual|yearly|full[- ]year|"
+                     + "|".join(_MONTHS) + r")\b", re.I)
+_YEAR = re.compile(r"\b(19\d{2}|20\d{2})\b")
+_WORD = re.compile(r"[a-z][a-z0-9-]*", re.I)
+
+# Words after a figure searched for its period and year
+TRAILING_WORDS = 4
+
+# Period sort order within a year
+_PERIOD_ORDER = {**{f"q{i}": i * 3 for i in range(1, 5)}, "h1": 6, "h2": 12,
+                 **{m: i + 1 for i, m in enumerate(_MONTHS)}, "annual": 13}
+
+
+class Fact(NamedTuple):
+    document_id: str
+    metric: str
+    period: str
+    year: int
+    value: float
+    unit: str
+
+
+def _qualifier(word: str) -> bool:
+    word = word.lower()
+    return word not in _FILLER and not _PERIOD.fullmatch(word)
+
+
+def _metric_phrase(words: Sequence[str], index: int) -> str:
+    """The metric term at words[index] with up to two qualifiers in front of it."""
+    start = index
+    while start > 0 and index - start < 2 and _qualifier(words[start - 1]):
+        start -= 1
+    return " ".join(words[start:index + 1]).lower()
+
+
+def _last_metric(text: str) -> Optional[str]:
+    # Qualifiers don't reach across punctuation: "12,000 units, H2 sales"
+    for segment in reversed(_SEGMENT_END.split(text)):
+        words = _WORD.findall(segment)
+        for i in range(len(words) - 1, -1, -1):
+            if words[i].lower() in METRIC_TERMS:
+                return _metric_phrase(words, i)
+    return None
+
+
+def _following_metric(text: str) -> Optional[str]:
+    # "15% year-over-year growth": a metric right after the figure
+    words = _WORD.findall(text)[:3]
+    for i, word in enumerate(words):
+        if word.lower() in METRIC_TERMS:
+            return " ".join(words[:i + 1]).lower()
+    return None
+
+
+def _trailing(text: str) -> str:
+    # Words right after a figure that still qualify it: "in Q2 2024" in
+    # "$3m in Q2 2024, up from ...", but not across punctuation
+    return " ".join(_SEGMENT_END.split(text, maxsplit=1)[0].split()[:TRAILING_WORDS])
+
+
+def _normalize_period(period: str) -> str:
+    period = period.lower().replace(" ", "")
+    if period in ("yearly", "full-year", "fullyear"):
+        return "annual"
+    return period
+
+
+def extract_facts(doc: Dict[str, Any]) -> List[Fact]:
+    """
+    Numeric facts in one document's content.
+    """
+    doc_id = doc["id"]
+    title_year = _YEAR.search(doc.get("title", ""))
+    default_year = int(title_year.group(1)) if title_year else 0
+    facts = []
+    previous = None  # metric of the last sentence, for "Q2 was $3m." follow-ups
+
+    for text in _SENTENCE_END.split(doc.get("content", "")):
+        metric = None
+        clause_start = 0
+        for match in _NUMBER.finditer(text):
+            raw = match.group("number")
+            currency, magnitude, percent = match.group("currency"), match.group("magnitude"), match.group("percent")
+            value = float(raw.replace(",", ""))
+
+            # Years, list numbering and IDs are not figures
+            is_year = not (currency or percent or magnitude) and _YEAR.fullmatch(raw)
+            if is_year or not (currency or percent or magnitude or "," in raw or value >= 10):
+                continue
+            # A bare k/m/b only counts as a magnitude after a currency symbol ("$3.4m")
+            if magnitude and len(magnitude) == 1 and not currency:
+                magnitude = None
+
+            before = text[clause_start:match.start()]
+            metric = ((_following_metric(text[match.end():]) if percent else None) or _last_metric(before)
+                      or metric or (previous if _PERIOD.search(before) else None))
+            # A period or year right after the figure applies to it, otherwise
+            # the latest one mentioned before it in the sentence
+            after = _trailing(text[match.end():])
+            periods = _PERIOD.findall(after)[:1] or _PERIOD.findall(text, 0, match.start())[-1:]
+            years = _YEAR.findall(after)[:1] or _YEAR.findall(text, 0, match.start())[-1:]
+
+            facts.append(Fact(
+                document_id=doc_id,
+                metric=metric or "value",
+                period=_normalize_period(periods[0]) if periods else "",
+                year=int(years[0]) if years else default_year,
+                value=value * _MAGNITUDES.get((magnitude or "").lower(), 1.0),
+                unit="%" if percent else _CURRENCIES.get(currency or "", ""),
+            ))
+            clause_start = match.end()
+        previous = metric or previous
+    return facts
+
+
+# ----- Fact Table -----
+
+class _Column:
+    """Dictionary-encoded string column."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes = array("I")
+        self._lookup: Dict[str, int] = {}
+
+    def append(self, value: str) -> None:
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def matching(self, predicate) -> set:
+        """Codes of the distinct values the predicate accepts."""
+        return {code for code, value in enumerate(self.values) if predicate(value)}
+
+
+class FactTable:
+    """
+    Columnar table of numeric facts extracted from a corpus.
+    """
+
+    def __init__(self, facts: Iterable[Fact] = ()):
+        self.document_ids = _Column()
+        self.metrics = _Column()
+        self.periods = _Column()
+        self.units = _Column()
+        self.years = array("H")
+        self.values = array("d")
+        # Documents scanned, to tell whether a saved table matches its index
+        self.documents = 0
+        for fact in facts:
+            self.add(fact)
+
+    @classmethod
+    def build(cls, docs: Iterable[Dict[str, Any]]) -> "FactTable":
+        table = cls()
+        for doc in docs:
+            table.documents += 1
+            for fact in extract_facts(doc):
+                table.add(fact)
+        return table
+
+    def add(self, fact: Fact) -> None:
+        self.document_ids.append(fact.document_id)
+        self.metrics.append(fact.metric)
+        self.periods.append(fact.period)
+        self.units.append(fact.unit)
+        self.years.append(fact.year)
+        self.values.append(fact.value)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def row(self, i: int) -> Fact:
+        return Fact(
+            self.document_ids.values[self.document_ids.codes[i]],
+            self.metrics.values[self.metrics.codes[i]],
+            self.periods.values[self.periods.codes[i]],
+            self.years[i],
+            self.values[i],
+            self.units.values[self.units.codes[i]],
+        )
+
+    def query(self, metric: Optional[str] = None, period: Optional[str] = None,
+              document_id: Optional[str] = None, year: Optional[int] = None,
+              unit: Optional[str] = None) -> List[Fact]:
+        """
+        Facts matching every given filter. metric matches any fact whose
+        metric contains all its words ("revenue" matches "quarterly revenue");
+        "total", "annual" and the like are ignored, see asks_for_total().
+        """
+        rows = range(len(self))
+        filters: List[Tuple[array, set]] = []
+        if metric:
+            words = [w for w in metric.lower().split() if w not in _TOTAL_WORDS]
+            filters.append((self.metrics.codes, self.metrics.matching(lambda m: all(w in m for w in words))))
+        if period:
+            filters.append((self.periods.codes, self.periods.matching(lambda p: p == _normalize_period(period))))
+        if document_id:
+            filters.append((self.document_ids.codes, self.document_ids.matching(lambda d: d.lower() == document_id.lower())))
+        if unit:
+            filters.append((self.units.codes, self.units.matching(lambda u: u.lower() == unit.lower())))
+        for codes, accepted in filters:
+            rows = [i for i in rows if codes[i] in accepted]
+        if year:
+            rows = [i for i in rows if self.years[i] == year]
+        return [self.row(i) for i in rows]
+
+    # ----- Persistence -----
+
+    def save(self, path: str) -> None:
+        """Write the columns next to an index file as {path}.facts.json."""
+        # Replaced in one step, since a serving process may load it meanwhile
+        with open(f"{path}.facts.json.tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                "documents": self.documents,
+                "rows": len(self),
+                "document_ids": [self.document_ids.values, list(self.document_ids.codes)],
+                "metrics": [self.metrics.values, list(self.metrics.codes)],
+                "periods": [self.periods.values, list(self.periods.codes)],
+                "units": [self.units.values, list(self.units.codes)],
+                "years": list(self.years),
+                "values": list(self.values),
+            }, f)
+        os.replace(f"{path}.facts.json.tmp", f"{path}.facts.json")
+
+    @classmethod
+    def load(cls, path: str) -> "FactTable":
+        with open(f"{path}.facts.json", encoding="utf-8") as f:
+            data = json.load(f)
+        table = cls()
+        for name in ("document_ids", "metrics", "periods", "units"):
+            column = getattr(table, name)
+            values, codes = data[name]
+            column.values = values
+            column._lookup = {value: code for code, value in enumerate(values)}
+            column.codes = array("I", codes)
+        table.years = array("H", data["years"])
+        table.values = array("d", data["values"])
+        table.documents = data["documents"]
+        return table
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(f"{path}.facts.json")
+
+
+class CombinedFactTable:
+    """
+    The fact tables of several segments queried as one, leaving out the
+    facts of documents deleted from each segment.
+
+    Args:
+        parts: (table, deleted document IDs) per segment
+    """
+
+    def __init__(self, parts: Sequence[Tuple[FactTable, FrozenSet[str]]]):
+        self.parts = list(parts)
+
+    def __len__(self) -> int:
+        return sum(1 for table, deleted in self.parts for i in range(len(table))
+                   if table.document_ids.values[table.document_ids.codes[i]] not in deleted)
+
+    def query(self, metric: Optional[str] = None, period: Optional[str] = None,
+              document_id: Optional[str] = None, year: Optional[int] = None,
+              unit: Optional[str] = None) -> List[Fact]:
+        """Facts matching every given filter, as in FactTable.query()."""
+        return [fact for table, deleted in self.parts
+                for fact in table.query(metric, period, document_id, year, unit)
+                if fact.document_id not in deleted]
+
+
+# ----- Aggregation -----
+
+AGGREGATES = ("list", "sum", "mean", "min", "max", "count", "growth")
+
+
+def period_key(fact: Fact) -> Tuple[int, int]:
+    return fact.year, _PERIOD_ORDER.get(fact.period, 0)
+
+
+def aggregate(facts: Sequence[Fact], how: str) -> Dict[str, Any]:
+    """
+    Combine matching facts. "growth" is the percentage change from the
+    earliest to the latest period, with the change between each pair of
+    consecutive periods.
+    """
+    if how not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate '{how}'; use one of {', '.join(AGGREGATES)}")
+    if how == "list" or not facts:
+        return {"aggregate": how, "result": None}
+    units = {fact.unit for fact in facts}
+    if len(units) > 1 and how != "count":
+        raise ValueError(f"Facts have different units ({', '.join(sorted(units))}); filter by unit")
+    unit = units.pop()
+
+    values = [fact.value for fact in facts]
+    if how == "count":
+        return {"aggregate": how, "result": len(values)}
+    if how == "sum":
+        return {"aggregate": how, "result": sum(values), "unit": unit}
+    if how == "mean":
+        return {"aggregate": how, "result": sum(values) / len(values), "unit": unit}
+    if how == "min":
+        return {"aggregate": how, "result": min(values), "unit": unit}
+    if how == "max":
+        return {"aggregate": how, "result": max(values), "unit": unit}
+
+    if len(facts) < 2:
+        raise ValueError("growth needs figures for at least two periods")
+    ordered = sorted(facts, key=period_key)
+    changes = [
+        {"from": f"{a.period} {a.year}".strip(), "to": f"{b.period} {b.year}".strip(),
+         "percent": round((b.value - a.value) / a.value * 100, 2) if a.value else None}
+        for a, b in zip(ordered, ordered[1:])
+    ]
+    first, last = ordered[0].value, ordered[-1].value
+    return {
+        "aggregate": how,
+        "result": round((last - first) / first * 100, 2) if first else None,
+        "unit": "%",
+        "steps": changes,
+    }
+
+
+def is_total(fact: Fact) -> bool:
+    """A figure that already totals others ("total annual revenue")."""
+    return fact.period == "annual" or fact.metric.split()[0] in _TOTAL_WORDS
+
+
+def asks_for_total(metric: str) -> bool:
+    """Whether a metric query names the total figure ("total revenue")."""
+    return any(word in _TOTAL_WORDS for word in metric.lower().split())
+
+
+# ----- Shared Fact Table -----
+
+_facts: Optional[Tuple[int, int, Union[FactTable, CombinedFactTable]]] = None
+# Tables of segment files by path; a segment file never changes
+_segment_facts: Dict[str, FactTable] = {}
+_facts_lock = threading.Lock()
+
+
+def _saved_table(path: str, documents: int) -> Optional[FactTable]:
+    # The sidecar written by ingest.py, if it matches the index
+    if not (os.path.isfile(path) and FactTable.exists(path)):
+        return None
+    table = FactTable.load(path)
+    return table if table.documents == documents else None
+
+
+def get_fact_table(store: DocumentStore) -> Union[FactTable, CombinedFactTable]:
+    """
+    Fact table for the given store: the sidecar written by ingest.py when
+    present, otherwise extracted in memory. Refreshed when the store's
+    corpus version changes; for a segment directory that re-reads only
+    segments it hasn't seen and the documents not yet flushed.
+    """
+    global _facts
+    key = (id(store), store.version)
+    if _facts is not None and _facts[:2] == key:
+        return _facts[2]
+
+    with _facts_lock:
+        if _facts is None or _facts[:2] != key:
+            if hasattr(store, "snapshot"):
+                table = segment_cache(store, _segment_facts, lambda index: _saved_table(index.path, len(index)),
+                                      FactTable.build, CombinedFactTable)
+            else:
+                path = getattr(store, "path", None)
+                table = _saved_table(path, len(store)) if path else None
+                if table is None:
+                    table = FactTable.build(store.documents())
+            _facts = (key[0], key[1], table)
+        return _facts[2]
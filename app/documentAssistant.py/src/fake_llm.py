@@ -0,0 +1,208 @@
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+from typing import List, Dict, Any, Iterator, AsyncIterator, Optional, Sequence
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import PrivateAttr
+
+from facts import METRIC_TERMS
+from memory import estimate_tokens
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic local chat model for offline benchmarks.
+
+    It follows a fixed script instead of reasoning:
+    - asked for a UserIntent, it classifies the input by keywords
+    - with query_facts bound (calculation agent), it first asks the fact
+      table for the metric in the question and answers from the aggregate
+    - otherwise it calls retrieve_documents for the user's question,
+      then calculate on the numbers it found (calculation agent only),
+      then answers from the tool output
+
+    Each call sleeps for `latency` seconds to stand in for a network round-trip,
+    varied by up to +/- `jitter` (a fraction, drawn from an RNG seeded with
+    `seed` so runs are repeatable). When streamed, answers arrive word by
+    word, `token_latency` seconds apart.
+    Token usage is reported from estimate_tokens, like a real provider would.
+    """
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    jitter: float = 0.0
+    seed: int = 0
+
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def _delay(self) -> float:
+        if not self.jitter:
+            return self.latency
+        if self._rng is None:
+            self._rng = random.Random(self.seed)
+        return self.latency * (1 + self._rng.uniform(-self.jitter, self.jitter))
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    # ----- Script -----
+
+    def _respond(self, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]]) -> AIMessage:
+        tool_names = [t["function"]["name"] for t in tools or []]
+        user_input = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+
+        if "UserIntent" in tool_names:
+            return self._tool_call("UserIntent", classify(user_input))
+
+        called = {call["id"]: call["name"] for m in messages if isinstance(m, AIMessage) for call in m.tool_calls}
+        results = [m for m in messages if isinstance(m, ToolMessage)]
+        fact_results = [m for m in results if called.get(m.tool_call_id) == "query_facts"]
+        tool_results = [m for m in results if called.get(m.tool_call_id) != "query_facts"]
+
+        if "query_facts" in tool_names and not fact_results and not tool_results:
+            request = fact_request(user_input)
+            if request is not None:
+                return self._tool_call("query_facts", request)
+        if fact_results and not tool_results:
+            result = re.search(r'"result":\s*(-?[\d.]+)', str(fact_results[-1].content))
+            if result:
+                return AIMessage(content=f"Based on the documents: {result.group(1)}")
+
+        if not tool_results and "retrieve_documents" in tool_names:
+            query = extract_query(user_input)
+            return self._tool_call("retrieve_documents", {"query": query})
+
+        numbers = re.findall(r"\$([\d,]+)", " ".join(str(m.content) for m in tool_results))
+        already_calculated = any(call["name"] == "calculate" for m in messages
+                                 if isinstance(m, AIMessage) for call in m.tool_calls)
+        if "calculate" in tool_names and numbers and not already_calculated:
+            expression = " + ".join(n.replace(",", "") for n in numbers[:4])
+            return self._tool_call("calculate", {"expression": expression})
+
+        context = str(tool_results[-1].content)[:200] if tool_results else "no documents"
+        return AIMessage(content=f"Based on the documents: {context}")
+
+    @staticmethod
+    def _chunks(message: AIMessage) -> List[AIMessageChunk]:
+        if message.tool_calls:
+            return [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ])]
+        return [AIMessageChunk(content=word) for word in re.findall(r"\S+\s*", message.content)]
+
+    @staticmethod
+    def _usage(messages: List[BaseMessage], message: AIMessage) -> Dict[str, int]:
+        prompt = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion = estimate_tokens(message.content or json.dumps([c["args"] for c in message.tool_calls]))
+        return {"input_tokens": prompt, "output_tokens": completion, "total_tokens": prompt + completion}
+
+    @staticmethod
+    def _tool_call(name: str, args: Dict[str, Any]) -> AIMessage:
+        return AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:8]}"}])
+
+    def _stream_chunks(self, messages: List[BaseMessage], tools) -> List[AIMessageChunk]:
+        message = self._respond(messages, tools)
+        chunks = self._chunks(message)
+        # Providers report usage once, on the final chunk
+        chunks[-1].usage_metadata = self._usage(messages, message)
+        return chunks
+
+    # ----- BaseChatModel hooks -----
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                  tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self._delay())
+        message = self._respond(messages, tools)
+        message.usage_metadata = self._usage(messages, message)
+        if self.token_latency:
+            # Generating the tokens takes as long as streaming them would
+            time.sleep(self.token_latency * (len(self._chunks(message)) - 1))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                         tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self._delay())
+        message = self._respond(messages, tools)
+        message.usage_metadata = self._usage(messages, message)
+        if self.token_latency:
+            await asyncio.sleep(self.token_latency * (len(self._chunks(message)) - 1))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                tools: Optional[List[Dict[str, Any]]] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if self.latency:
+            time.sleep(self._delay())
+        for i, chunk in enumerate(self._stream_chunks(messages, tools)):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+    async def _astream(self, messages: List[BaseMessage], stop=None, run_manager=None,
+                       tools: Optional[List[Dict[str, Any]]] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency:
+            await asyncio.sleep(self._delay())
+        for i, chunk in enumerate(self._stream_chunks(messages, tools)):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content, chunk=generation)
+            yield generation
+
+
+def classify(prompt: str) -> Dict[str, Any]:
+    # The triage prompt embeds the user's message between these headings
+    match = re.search(r"User Input:(.*?)Conversation History:", prompt, re.S)
+    text = (match.group(1) if match else prompt).lower()
+    if any(word in text for word in ("summarise", "summarize", "summary")):
+        intent = "summarisation"
+    elif any(word in text for word in ("calculate", "total", "sum", "average", "how much")):
+        intent = "calculation"
+    else:
+        intent = "qa"
+    return {"intent_type": intent, "confidence": 0.9, "reasoning": "keyword match"}
+
+
+def fact_request(user_input: str) -> Optional[Dict[str, Any]]:
+    """query_facts arguments for a question naming a known metric, else None."""
+    text = user_input.lower()
+    words = re.findall(r"[a-z]+", text)
+    metric = next((word for word in words if word in METRIC_TERMS), None)
+    if metric is None:
+        return None
+    if "growth" in words and metric != "growth":
+        aggregate = "growth"
+    elif any(word in words for word in ("average", "mean")):
+        aggregate = "mean"
+    elif any(word in words for word in ("total", "sum", "combined")):
+        aggregate = "sum"
+    else:
+        aggregate = "list"
+    request = {"metric": metric, "aggregate": aggregate}
+    doc_id = re.search(r"doc_\d+", text)
+    if doc_id:
+        request["document_id"] = doc_id.group(0)
+    return request
+
+
+def extract_query(user_input: str) -> str:
+    doc_id = re.search(r"doc_\d+", user_input.lower())
+    return doc_id.group(0) if doc_id else user_input
@@ -0,0 +1,197 @@
+"""
+Ingest documents into an on-disk index for the document assistant.
+
+Usage:
+    python ingest.py docs/ -o corpus.idx         # .txt, .md and .pdf files under docs/
+    python ingest.py documents.jsonl -o corpus.idx
+    python ingest.py docs/ -o corpus.idx --embeddings   # also write dense vectors (needs numpy)
+    python ingest.py docs/ -o corpus.idx --no-facts     # skip the numeric fact table
+    python ingest.py new_docs/ -o corpus/ --update      # add/replace in a segment directory
+    python ingest.py -o corpus/ --delete doc_3 doc_7    # delete from a segment directory
+
+JSONL input needs one document per line with at least "id" and "content".
+Point the assistant at the result with DOC_INDEX_PATH=corpus.idx (or corpus/).
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from typing import Dict, Any, Iterable, Iterator, List
+
+from disk_index import write_index
+from segments import SegmentedDocumentStore
+
+TEXT_EXTENSIONS = {".txt", ".md"}
+
+# IDs given to files that don't bring their own
+NUMBERED_ID = re.compile(r"doc_(\d+)")
+
+
+def read_pdf(path: str) -> str:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise ImportError("PDF ingestion requires pypdf: pip install pypdf")
+    return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+
+
+def iter_files(root: str) -> Iterator[str]:
+    if os.path.isfile(root):
+        yield root
+        return
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            yield os.path.join(dirpath, name)
+
+
+def iter_documents(inputs: List[str], existing: Iterable[Dict[str, Any]] = ()) -> Iterator[Dict[str, Any]]:
+    """
+    Yield documents from JSONL files and from text/PDF files on disk.
+
+    Files without an ID are numbered doc_1, doc_2, ... in the order found.
+    With `existing` documents (the live ones in a segment directory), a file
+    keeps the ID of the document ingested from the same source, so ingesting
+    it again replaces that document, and new files are numbered after the
+    highest existing doc_N.
+    """
+    known_ids = {}
+    next_id = 1
+    for doc in existing:
+        known_ids[doc.get("source")] = doc["id"]
+        match = NUMBERED_ID.fullmatch(str(doc["id"]))
+        if match:
+            next_id = max(next_id, int(match.group(1)) + 1)
+
+    for root in inputs:
+        for path in iter_files(root):
+            ext = os.path.splitext(path)[1].lower()
+
+            if ext == ".jsonl":
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            yield json.loads(line)
+                continue
+
+            if ext in TEXT_EXTENSIONS:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    content = f.read()
+            elif ext == ".pdf":
+                content = read_pdf(path)
+            else:
+                continue
+
+            # Relative to the input directory, so files with the same name in
+            # different subdirectories stay apart
+            source = os.path.relpath(path, root).replace(os.sep, "/") if os.path.isdir(root) else os.path.basename(path)
+            doc_id = known_ids.get(source)
+            if doc_id is None:
+                doc_id = known_ids[source] = f"doc_{next_id}"
+                next_id += 1
+            yield {
+                "id": doc_id,
+                "content": content,
+                "title": os.path.splitext(os.path.basename(path))[0].replace("_", " ").title(),
+                "source": source,
+            }
+
+
+def write_segment_sidecars(store: SegmentedDocumentStore, facts: bool = False, embeddings: bool = False,
+                           nlist: int = 0) -> int:
+    """
+    Write the derived files that are missing for the store's segments,
+    so serving processes load them instead of building them on a query.
+    Returns the number of segments that got new files.
+    """
+    from facts import FactTable
+    if embeddings:
+        from vector_index import DenseIndex, get_embedder
+
+    written = 0
+    for index, _ in store.snapshot()[0]:
+        wrote = False
+        if facts and not FactTable.exists(index.path):
+            FactTable.build(index.documents()).save(index.path)
+            wrote = True
+        if embeddings and not DenseIndex.exists(index.path):
+            DenseIndex.build(index.documents(), get_embedder(), nlist=nlist).save(index.path)
+            wrote = True
+        written += wrote
+        if not os.path.exists(index.path):
+            # Merged away by another process meanwhile
+            for path in glob.glob(glob.escape(index.path) + ".*"):
+                os.remove(path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", help="Files or directories to ingest")
+    parser.add_argument("-o", "--output", required=True, help="Index file to write, or segment directory with --update/--delete")
+    parser.add_argument("--update", action="store_true", help="Add or replace documents in a segment directory")
+    parser.add_argument("--delete", nargs="+", default=[], metavar="DOC_ID", help="Document IDs to delete from a segment directory")
+    parser.add_argument("--embeddings", action="store_true", help="Also write a memory-mappable embedding matrix")
+    parser.add_argument("--no-facts", action="store_true", help="Don't extract the numeric fact table")
+    parser.add_argument("--nlist", type=int, default=0, help="IVF lists for approximate dense search (0 = exact)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    if args.update or args.delete:
+        store = SegmentedDocumentStore(args.output, merge_interval=None)
+        added = 0
+        # Read up front, since adding documents changes the store being iterated
+        existing = [{"id": d["id"], "source": d.get("source")} for d in store.documents()] if args.inputs else []
+        for doc in iter_documents(args.inputs, existing):
+            store.add_document(doc)
+            added += 1
+        deleted = sum(store.delete_document(doc_id) for doc_id in args.delete)
+        store.commit()
+        while store.maybe_merge():
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"Added {added} and deleted {deleted} documents in {args.output} "
+              f"({len(store)} live) in {elapsed:.1f}s")
+
+        if not args.no_facts or args.embeddings:
+            start = time.perf_counter()
+            written = write_segment_sidecars(store, facts=not args.no_facts, embeddings=args.embeddings,
+                                             nlist=args.nlist)
+            kinds = " and ".join(kind for kind, wanted in (("numeric facts", not args.no_facts),
+                                                          ("embeddings", args.embeddings)) if wanted)
+            print(f"Wrote {kinds} for {written} new segments in {time.perf_counter() - start:.1f}s")
+        return
+
+    count = write_index(iter_documents(args.inputs), args.output)
+    elapsed = time.perf_counter() - start
+
+    size_mb = os.path.getsize(args.output) / 1_000_000
+    print(f"Indexed {count} documents into {args.output} ({size_mb:.1f} MB) in {elapsed:.1f}s")
+
+    if not args.no_facts:
+        from disk_index import MmapDocumentStore
+        from facts import FactTable
+
+        start = time.perf_counter()
+        store = MmapDocumentStore(args.output)
+        table = FactTable.build(store.documents())
+        table.save(args.output)
+        store.close()
+        print(f"Extracted {len(table)} numeric facts into {args.output}.facts.json "
+              f"in {time.perf_counter() - start:.1f}s")
+
+    if args.embeddings:
+        from disk_index import MmapDocumentStore
+        from vector_index import DenseIndex, get_embedder
+
+        start = time.perf_counter()
+        store = MmapDocumentStore(args.output)
+        DenseIndex.build(store.documents(), get_embedder(), nlist=args.nlist).save(args.output)
+        store.close()
+        print(f"Wrote embeddings to {args.output}.vectors.npy in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+import contextvars
+import functools
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tracers.context import register_configure_hook
+
+from json_logger import log
+
+# ----- Node Instrumentation -----
+#
+# agent_workflow() registers every node through instrument_node(), which
+# times the node and makes a NodeRun the active callback handler while it
+# runs. LangChain attaches the active handler to every LLM and tool call
+# made inside the node (through a configure hook, so no config has to be
+# passed around), which gives per-node LLM call counts, token usage and
+# per-tool timings without touching the node bodies. Tool-loop iterations
+# are read from the iteration_timings the node returns.
+#
+# Each finished node is logged as a "Node finished" record and added to the
+# shared NodeMetrics, which reports p50/p95/p99 latencies per node and tool.
+
+# Latest samples kept per node / tool for percentiles
+SAMPLE_SIZE = 10_000
+
+_active_run: contextvars.ContextVar[Optional["NodeRun"]] = contextvars.ContextVar("node_run", default=None)
+register_configure_hook(_active_run, inheritable=True)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _usage(response: LLMResult) -> Tuple[int, int]:
+    """(prompt, completion) tokens reported for one LLM call."""
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if not (prompt or completion):
+        # Older integrations report usage in llm_output instead
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return prompt, completion
+
+
+class NodeRun(BaseCallbackHandler):
+    """
+    Counters for one execution of one node, fed by the callbacks of the
+    LLM and tool calls made inside it.
+    """
+
+    # Update the counters on the calling thread instead of an executor
+    run_inline = True
+
+    def __init__(self, node: str):
+        self.node = node
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tools: Dict[str, Dict[str, Any]] = {}
+        self._tool_starts: Dict[UUID, Tuple[str, float]] = {}
+        # Sync tool calls report from the tool executor's threads
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self.llm_calls += 1
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self.llm_calls += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        prompt, completion = _usage(response)
+        with self._lock:
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "unknown"
+        with self._lock:
+            self._tool_starts[run_id] = (name, time.perf_counter())
+
+    def _tool_done(self, run_id: UUID, error: bool) -> None:
+        with self._lock:
+            started = self._tool_starts.pop(run_id, None)
+            if started is None:
+                return
+            name, start = started
+            entry = self.tools.setdefault(name, {"calls": 0, "errors": 0, "seconds": []})
+            entry["calls"] += 1
+            entry["errors"] += error
+            entry["seconds"].append(round(time.perf_counter() - start, 6))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._tool_done(run_id, error=False)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._tool_done(run_id, error=True)
+
+
+class NodeMetrics:
+    """
+    Aggregates finished node runs into per-node and per-tool summaries.
+
+    Args:
+        sample_size: Latest latencies kept per node and tool for percentiles
+    """
+
+    def __init__(self, sample_size: int = SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._node_seconds: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.sample_size))
+            self._tool_seconds: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.sample_size))
+            self._tool_calls: Dict[str, int] = defaultdict(int)
+            self._totals: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, run: NodeRun, seconds: float, iterations: int, error: bool = False) -> None:
+        with self._lock:
+            self._node_seconds[run.node].append(seconds)
+            totals = self._totals[run.node]
+            totals["runs"] += 1
+            totals["errors"] += error
+            totals["llm_calls"] += run.llm_calls
+            totals["prompt_tokens"] += run.prompt_tokens
+            totals["completion_tokens"] += run.completion_tokens
+            totals["iterations"] += iterations
+            for name, tool in run.tools.items():
+                self._tool_seconds[name].extend(tool["seconds"])
+                self._tool_calls[name] += tool["calls"]
+
+    @staticmethod
+    def _latencies(samples: Deque[float]) -> Dict[str, float]:
+        values = list(samples)
+        return {
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+        }
+
+    def report(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Latency percentiles and per-run averages for each node, and latency
+        percentiles for each tool.
+        """
+        with self._lock:
+            nodes = {}
+            for node, samples in self._node_seconds.items():
+                totals = self._totals[node]
+                runs = totals["runs"]
+                nodes[node] = {
+                    "runs": runs,
+                    "errors": totals["errors"],
+                    **self._latencies(samples),
+                    "llm_calls_per_run": round(totals["llm_calls"] / runs, 3),
+                    "prompt_tokens_per_run": round(totals["prompt_tokens"] / runs, 1),
+                    "completion_tokens_per_run": round(totals["completion_tokens"] / runs, 1),
+                    "iterations_per_run": round(totals["iterations"] / runs, 3),
+                }
+            tools = {name: {"calls": self._tool_calls[name], **self._latencies(samples)}
+                     for name, samples in self._tool_seconds.items() if samples}
+            return {"nodes": nodes, "tools": tools}
+
+    def format_report(self) -> str:
+        report = self.report()
+        lines = [f"{'node':<22} {'runs':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+                 f"{'llm/run':>8} {'in tok':>8} {'out tok':>8} {'iters':>6}"]
+        for node, r in report["nodes"].items():
+            lines.append(f"{node:<22} {r['runs']:>6} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+                         f"{r['llm_calls_per_run']:>8.2f} {r['prompt_tokens_per_run']:>8.0f} "
+                         f"{r['completion_tokens_per_run']:>8.0f} {r['iterations_per_run']:>6.2f}")
+        for tool, r in report["tools"].items():
+            lines.append(f"{'tool:' + tool:<22} {r['calls']:>6} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}")
+        return "\n".join(lines)
+
+
+# Shared by every instrumented graph in the process
+node_metrics = NodeMetrics()
+
+
+def _finish(run: NodeRun, start: float, state, result: Any, error: bool, metrics: NodeMetrics) -> None:
+    seconds = time.perf_counter() - start
+    timings = result.get("iteration_timings") if isinstance(result, dict) else None
+    iterations = len(timings or [])
+    metrics.record(run, seconds, iterations, error)
+    log("Node finished", node=run.node, session_id=getattr(state, "session_id", None),
+        seconds=round(seconds, 6), llm_calls=run.llm_calls, prompt_tokens=run.prompt_tokens,
+        completion_tokens=run.completion_tokens, iterations=iterations, error=error,
+        tools=run.tools)
+
+
+def instrument_node(name: str, func: Callable, afunc: Optional[Callable] = None,
+                    metrics: Optional[NodeMetrics] = None) -> RunnableLambda:
+    """
+    Wrap a node's sync and async implementations so every run is measured.
+
+    Args:
+        name: Node name used in reports and log records
+        func: Sync node function taking (state, config)
+        afunc: Async twin used by ainvoke / astream
+        metrics: Where runs are aggregated (defaults to the shared node_metrics)
+    """
+    metrics = metrics or node_metrics
+
+    @functools.wraps(func)
+    def run(state, config):
+        node_run = NodeRun(name)
+        token = _active_run.set(node_run)
+        start = time.perf_counter()
+        result, error = None, True
+        try:
+            result = func(state, config)
+            error = False
+            return result
+        finally:
+            _active_run.reset(token)
+            _finish(node_run, start, state, result, error, metrics)
+
+    if afunc is None:
+        return RunnableLambda(run)
+
+    @functools.wraps(afunc)
+    async def arun(state, config):
+        node_run = NodeRun(name)
+        token = _active_run.set(node_run)
+        start = time.perf_counter()
+        result, error = None, True
+        try:
+            result = await afunc(state, config)
+            error = False
+            return result
+        finally:
+            _active_run.reset(token)
+            _finish(node_run, start, state, result, error, metrics)
+
+    return RunnableLambda(run, afunc=arun)
@@ -0,0 +1,141 @@
+import math
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from schemas import UserIntent
+
+# ----- Keyword Features -----
+#
+# A tiny linear model: each intent's score is a bias plus the weights of the
+# features found in the input, and a softmax over the scores gives the
+# confidence. Inputs that clearly ask for a summary, a calculation or a plain
+# question are routed locally; anything ambiguous (e.g. "what was the total
+# revenue?" scores for both qa and calculation) falls back to the LLM. The qa
+# agent has no calculator, so an input with any calculation feature is never
+# routed to qa locally.
+
+FEATURES: Dict[str, List[Tuple[re.Pattern, float]]] = {
+    "summarisation": [
+        (re.compile(r"\bsummar(y|ies|ise|ize|ised|ized|isation|ization)\b"), 4.0),
+        (re.compile(r"\b(overview|gist|tl;?dr|key points|main points|recap)\b"), 3.5),
+        (re.compile(r"\b(briefly|in short|condense)\b"), 1.0),
+    ],
+    "calculation": [
+        (re.compile(r"\b(calculate|compute|calculation)\b"), 3.0),
+        (re.compile(r"\b(total|sum|average|mean|median|growth|percentage|percent|ratio|difference)\b"), 2.0),
+        (re.compile(r"\b(how much|how many|add up|multiply|divide|subtract)\b"), 2.0),
+        (re.compile(r"\d\s*[-+*/^%]\s*\d"), 3.0),
+        (re.compile(r"\d\s*(%|percent\b)"), 3.0),
+        (re.compile(r"\d\s*(plus|minus|times|divided by|multiplied by)\s*\d"), 3.0),
+        (re.compile(r"\bof\s+\$?\d"), 1.5),
+    ],
+    "qa": [
+        (re.compile(r"^\s*(what|who|when|where|why|how|which|is|are|does)\b"), 2.0),
+        (re.compile(r"\b(explain|define|describe|tell me about|meaning of)\b"), 2.0),
+        (re.compile(r"\?\s*$"), 0.5),
+    ],
+}
+
+# Follow-ups like "what about doc_1?" depend on the previous turn's intent,
+# which only the LLM (given the conversation history) can resolve
+FOLLOW_UP = re.compile(r"^\s*(what|how) about\b|^\s*(and|also|same)\b")
+
+# Bias toward qa, which is also the LLM triage's fallback route
+BIAS = {"summarisation": 0.0, "calculation": 0.0, "qa": 0.5}
+
+DEFAULT_THRESHOLD = 0.85
+
+
+def _matches(intent: str, text: str) -> bool:
+    return any(pattern.search(text) for pattern, _ in FEATURES[intent])
+
+
+def score_intents(user_input: str) -> Dict[str, float]:
+    """
+    Softmax probabilities for each intent from keyword features.
+    """
+    text = user_input.lower()
+    scores = {
+        intent: BIAS[intent] + sum(weight for pattern, weight in features if pattern.search(text))
+        for intent, features in FEATURES.items()
+    }
+    top = max(scores.values())
+    exps = {intent: math.exp(score - top) for intent, score in scores.items()}
+    total = sum(exps.values())
+    return {intent: value / total for intent, value in exps.items()}
+
+
+class FastIntentRouter:
+    """
+    Local classifier that runs ahead of the triage LLM call.
+
+    classify() returns a UserIntent when the top intent's probability clears
+    the threshold and None otherwise. The router tracks its hit rate and
+    estimates the time saved from the measured latency of LLM fallbacks.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._fallbacks = 0
+        self._local_seconds = 0.0
+        self._llm_seconds = 0.0
+
+    def classify(self, user_input: Optional[str], threshold: Optional[float] = None,
+                 has_history: bool = False) -> Optional[UserIntent]:
+        threshold = self.threshold if threshold is None else threshold
+        start = time.perf_counter()
+        text = user_input or ""
+        probabilities = score_intents(text)
+        intent, confidence = max(probabilities.items(), key=lambda item: item[1])
+        if has_history and FOLLOW_UP.search(text.lower()):
+            confidence = 0.0
+        elif intent == "qa" and _matches("calculation", text.lower()):
+            confidence = 0.0
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._local_seconds += elapsed
+            if confidence < threshold:
+                self._fallbacks += 1
+                return None
+            self._hits += 1
+
+        return UserIntent(
+            intent_type=intent,
+            confidence=round(confidence, 3),
+            reasoning=f"Fast-path keyword router ({intent} p={confidence:.2f})"
+        )
+
+    def record_llm_call(self, seconds: float) -> None:
+        """Record how long a fallback triage LLM call took."""
+        with self._lock:
+            self._llm_seconds += seconds
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self._hits + self._fallbacks
+            avg_llm = self._llm_seconds / self._fallbacks if self._fallbacks else 0.0
+            avg_local = self._local_seconds / total if total else 0.0
+            return {
+                "requests": total,
+                "fast_path_hits": self._hits,
+                "llm_fallbacks": self._fallbacks,
+                "hit_rate": self._hits / total if total else 0.0,
+                "avg_llm_triage_seconds": avg_llm,
+                "avg_local_seconds": avg_local,
+                # Each hit skipped one LLM call of average fallback latency
+                "estimated_seconds_saved": self._hits * max(avg_llm - avg_local, 0.0),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hits = self._fallbacks = 0
+            self._local_seconds = self._llm_seconds = 0.0
+
+
+# Process-wide router used by the triage nodes
+router = FastIntentRouter()
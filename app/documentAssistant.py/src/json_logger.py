@@ -1,30 +1,294 @@
+import atexit
 import json
 import datetime
 import os
-from typing import Any, Dict
+import queue
+import struct
+import threading
+import time
+from hashlib import blake2b
+from typing import Any, Dict, List, Optional, Tuple
 
 
 # Path to the JSONL log file
 LOG_FILE = "logs.jsonl"
 
+# Writer settings; each can be overridden with the environment variable of the same name
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))         # seconds between writes
+LOG_FLUSH_SIZE = int(os.getenv("LOG_FLUSH_SIZE", "256"))                   # records per write
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))     # rotate above this size (0 = never)
+LOG_ROTATE_SECONDS = float(os.getenv("LOG_ROTATE_SECONDS", "0"))           # rotate after this age (0 = never)
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))                 # rotated files to keep
+LOG_INDEX = os.getenv("LOG_INDEX", "1") != "0"                            # write the .idx sidecar
+LOG_QUEUE_SIZE = 100_000
 
-def log(message: str, **data: Dict[str, Any]):
+
+# ----- Sidecar Index -----
+#
+# Alongside logs.jsonl the writer appends one fixed-size entry per record to
+# logs.jsonl.idx: (unix timestamp, byte offset, byte length, session hash).
+# Entries are in write order, so they are sorted by time; log_query.py
+# binary-searches them and builds a session-sorted copy for session lookups.
+
+INDEX_ENTRY = struct.Struct("<dQIQ")
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+def session_hash(session_id: Optional[str]) -> int:
+    """64-bit hash of a session ID (0 for records without one)."""
+    if not session_id:
+        return 0
+    return int.from_bytes(blake2b(str(session_id).encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+class BufferedJsonLogger:
     """
-    Append a structured JSON log entry to logs.jsonl.
+    JSONL logger that keeps file I/O off the request path.
 
-    Parameters:
-    - message (str): Description of the log event
-    - **data: Arbitrary key-value pairs to include in the log
+    log() serializes the record and puts it on a queue. A background thread
+    takes records off the queue in batches (up to flush_size records, or
+    whatever arrived within flush_interval seconds) and appends each batch
+    with one write to a file it keeps open. When the file grows past
+    max_bytes or gets older than rotate_seconds it is renamed to
+    logs.jsonl.1 (older backups shift up, at most backup_count are kept) and
+    a new file is started.
+
+    If the queue is full, records are dropped rather than blocking the
+    caller; the number dropped is logged once the writer catches up.
+    Records logged after close() are written synchronously instead.
     """
+
+    def __init__(self, path: str = LOG_FILE, flush_interval: float = LOG_FLUSH_INTERVAL,
+                 flush_size: int = LOG_FLUSH_SIZE, max_bytes: int = LOG_MAX_BYTES,
+                 rotate_seconds: float = LOG_ROTATE_SECONDS, backup_count: int = LOG_BACKUP_COUNT,
+                 queue_size: int = LOG_QUEUE_SIZE, index: bool = LOG_INDEX):
+        self.path = path
+        self.index = index
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backup_count = backup_count
+        self.dropped = 0
+
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._index_file = None
+        self._opened_at = 0.0
+        self._closed = False
+        # Guards _closed, dropped and the synchronous writes after close()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="json-logger", daemon=True)
+        self._thread.start()
+
+    # ----- Producer side -----
+
+    def log(self, message: str, **data: Dict[str, Any]) -> None:
+        record = _format(message, data)
+        with self._lock:
+            if not self._closed:
+                # Queued under the lock, so it can't land behind close()'s stop marker
+                try:
+                    self._queue.put_nowait(record)
+                except queue.Full:
+                    self.dropped += 1
+                return
+
+        # Late records (e.g. from other atexit hooks) are written here, with
+        # their index entries, once the writer thread has finished
+        self._thread.join()
+        with self._lock:
+            self._write([record])
+            self._close_files()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every record logged so far is written. Returns False on timeout.
+        """
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        Write everything still queued, stop the writer and close the file.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # ----- Writer thread -----
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Tuple[bytes, Optional[str], float]] = []
+            waiters: List[threading.Event] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+
+            item = self._queue.get()
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if stop or waiters or len(batch) >= self.flush_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+
+            with self._lock:
+                dropped, self.dropped = self.dropped, 0
+            if dropped:
+                batch.append(_format("Log records dropped (queue full)", {"dropped": dropped}))
+            if batch:
+                self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                self._close_files()
+                return
+
+    def _write(self, batch: List[Tuple[bytes, Optional[str], float]]) -> None:
+        try:
+            self._maybe_rotate()
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                if self.index:
+                    # Index whatever an earlier, unindexed run left in the file first
+                    from log_query import build_index
+                    build_index(self.path)
+                    self._index_file = open(index_path(self.path), "ab")
+                self._file = open(self.path, "ab")
+                self._opened_at = time.time()
+
+            offset = self._file.tell()
+            self._file.write(b"".join(line for line, _, _ in batch))
+            self._file.flush()
+
+            # The index is written after the records, so it never points past the log
+            if self._index_file is not None:
+                entries = []
+                for line, session_id, ts in batch:
+                    entries.append(INDEX_ENTRY.pack(ts, offset, len(line), session_hash(session_id)))
+                    offset += len(line)
+                self._index_file.write(b"".join(entries))
+                self._index_file.flush()
+        except OSError as e:
+            print(f"[LOG] could not write {len(batch)} records to {self.path}: {e}")
+
+    def _close_files(self) -> None:
+        for f in (self._file, self._index_file):
+            if f is not None:
+                f.close()
+        self._file = self._index_file = None
+
+    def _maybe_rotate(self) -> None:
+        if self._file is None:
+            return
+        too_big = self.max_bytes and self._file.tell() >= self.max_bytes
+        too_old = self.rotate_seconds and time.time() - self._opened_at >= self.rotate_seconds
+        if not (too_big or too_old):
+            return
+
+        self._close_files()
+        # Each log file moves together with its sidecar indexes
+        for suffix in ("", ".idx", ".sidx"):
+            current = self.path + suffix
+            if self.backup_count <= 0:
+                if os.path.exists(current):
+                    os.remove(current)
+                continue
+            for i in range(self.backup_count - 1, 0, -1):
+                older = f"{self.path}.{i}{suffix}"
+                if os.path.exists(older):
+                    os.replace(older, f"{self.path}.{i + 1}{suffix}")
+            if os.path.exists(current):
+                os.replace(current, f"{self.path}.1{suffix}")
+
+
+def _format(message: str, data: Dict[str, Any]) -> Tuple[bytes, Optional[str], float]:
+    # Serialized by the caller, so later changes to `data` can't leak into the record
+    ts = time.time()
     log_entry = {
-        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "timestamp": datetime.datetime.utcfromtimestamp(ts).isoformat() + "Z",
         "message": message,
         "data": data,
     }
+    line = (json.dumps(log_entry, default=str) + "\n").encode("utf-8")
+    return line, data.get("session_id"), ts
+
+
+# ----- Shared Logger -----
+
+_logger: Optional[BufferedJsonLogger] = None
+_logger_lock = threading.Lock()
+
+
+def get_logger() -> BufferedJsonLogger:
+    """
+    Return the process-wide logger, starting its writer thread on first use.
+    """
+    global _logger
+    if _logger is None:
+        with _logger_lock:
+            if _logger is None:
+                _logger = BufferedJsonLogger(LOG_FILE)
+                atexit.register(shutdown)
+    return _logger
+
+
+def configure(**settings: Any) -> BufferedJsonLogger:
+    """
+    Replace the process-wide logger, e.g. configure(path="run.jsonl", flush_interval=0.2).
+    The previous logger is flushed and closed first.
+    """
+    global _logger
+    with _logger_lock:
+        if _logger is not None:
+            _logger.close()
+        else:
+            atexit.register(shutdown)
+        _logger = BufferedJsonLogger(**{"path": LOG_FILE, **settings})
+        return _logger
+
+
+def flush(timeout: Optional[float] = None) -> bool:
+    """
+    Block until every record logged so far has been written.
+    """
+    return get_logger().flush(timeout) if _logger is not None else True
+
+
+def shutdown() -> None:
+    """
+    Flush and stop the writer; registered with atexit.
+    """
+    if _logger is not None:
+        _logger.close()
 
-    # Make sure the directory exists
-    os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
 
-    # Append as one line per JSON record
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(json.dumps(log_entry) + "\n")
+def log(message: str, **data: Dict[str, Any]):
+    """
+    Append a structured JSON log entry to logs.jsonl.
+
+    The entry is queued and written by a background thread, so this call
+    does no file I/O.
+
+    Parameters:
+    - message (str): Description of the log event
+    - **data: Arbitrary key-value pairs to include in the log
+    """
+    get_logger().log(message, **data)
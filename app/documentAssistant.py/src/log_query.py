@@ -0,0 +1,399 @@
+"""
+Query logs.jsonl by session or time range without scanning it.
+
+Usage:
+    python log_query.py --session session_123                # every event of one session
+    python log_query.py --since 2026-10-18T09:00 --until 2026-10-18T09:05
+    python log_query.py --session session_123 --since 2026-10-18T09:00
+    python log_query.py --build                              # index logs written without one
+
+Rotated backups (logs.jsonl.1, logs.jsonl.2, ...) are searched too, oldest
+first. Times are ISO 8601 in UTC, like the "timestamp" field of each record.
+"""
+import argparse
+import datetime
+import glob
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from json_logger import INDEX_ENTRY, LOG_FILE, index_path, session_hash
+
+# ----- File Format -----
+#
+# logs.jsonl.idx is written by the logger (see json_logger.py): one
+# (timestamp, offset, length, session hash) entry per record, in write order.
+# Time-range queries binary-search it directly.
+#
+# logs.jsonl.sidx is derived from it on first use: the same records as
+# (session hash, offset, length), sorted, behind a header recording how many
+# .idx entries it covers. Session queries binary-search it and scan only the
+# .idx entries added since. Once those pass SESSION_REBUILD_ENTRIES, only they
+# are sorted and merged in; the existing entries are copied over unparsed. Both files are memory-mapped, so a query reads
+# the index pages and records it touches and nothing else.
+#
+# Records past the last indexed one (written with LOG_INDEX=0, or after the
+# writer stopped) are parsed on each query; build_index() indexes them for good.
+
+SESSION_MAGIC = b"DASX"
+SESSION_VERSION = 1
+
+SESSION_HEADER = struct.Struct("<4sIQ")
+SESSION_ENTRY = struct.Struct("<QQI")
+
+# .idx entries tolerated past the session index before it is rebuilt
+SESSION_REBUILD_ENTRIES = 10_000
+
+if sys.byteorder != "little":
+    raise ImportError("log_query requires a little-endian platform")
+
+TimeLike = Union[None, float, int, str, datetime.datetime]
+
+
+def to_epoch(value: TimeLike) -> Optional[float]:
+    """
+    Unix time for an epoch number, datetime or ISO 8601 string (naive times are UTC).
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.strip().removesuffix("Z"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def _map(path: str) -> Optional[mmap.mmap]:
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+
+def _parse(line: bytes) -> Optional[Tuple[float, Optional[str], Dict[str, Any]]]:
+    try:
+        record = json.loads(line)
+        data = record.get("data") or {}
+        return to_epoch(record["timestamp"]), data.get("session_id"), record
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _scan(mm: mmap.mmap, start: int) -> Iterator[Tuple[int, int, bytes]]:
+    """(offset, length, line) for each complete line from start on."""
+    while start < len(mm):
+        end = mm.find(b"\n", start)
+        if end < 0:
+            return  # a record still being written
+        yield start, end + 1 - start, mm[start:end + 1]
+        start = end + 1
+
+
+class LogIndex:
+    """
+    Session and time-range lookups over one log file and its sidecar index.
+
+    Args:
+        path: The JSONL log file (logs.jsonl or a rotated logs.jsonl.N)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._log = _map(path)
+        self._idx = _map(index_path(path))
+        self._count = len(self._idx) // INDEX_ENTRY.size if self._idx is not None else 0
+
+        # Where the indexed records end; anything after is parsed on demand
+        self._indexed_end = 0
+        if self._count:
+            _, offset, length, _ = self._entry(self._count - 1)
+            self._indexed_end = offset + length
+        if self._log is None or self._indexed_end > len(self._log):
+            # The index belongs to a different (e.g. truncated) file
+            self._count = self._indexed_end = 0
+
+    def close(self) -> None:
+        for mm in (self._log, self._idx):
+            if mm is not None:
+                mm.close()
+
+    def __enter__(self) -> "LogIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ----- Index access -----
+
+    def _entry(self, i: int) -> Tuple[float, int, int, int]:
+        return INDEX_ENTRY.unpack_from(self._idx, i * INDEX_ENTRY.size)
+
+    def _record(self, offset: int, length: int) -> Dict[str, Any]:
+        return json.loads(self._log[offset:offset + length])
+
+    def _tail(self) -> Iterator[Tuple[float, Optional[str], Dict[str, Any]]]:
+        if self._log is None:
+            return
+        for _, _, line in _scan(self._log, self._indexed_end):
+            parsed = _parse(line)
+            if parsed is not None:
+                yield parsed
+
+    def _session_index(self) -> Tuple[Optional[mmap.mmap], int, int]:
+        """
+        The mapped .sidx, its entry count and the .idx entries it covers.
+        Built on first use and extended once SESSION_REBUILD_ENTRIES more are logged.
+        """
+        path = self.path + ".sidx"
+        sidx, n, covered = _map(path), 0, 0
+        if sidx is not None:
+            magic, version, covered = SESSION_HEADER.unpack_from(sidx, 0)
+            if magic == SESSION_MAGIC and version == SESSION_VERSION and covered <= self._count:
+                n = (len(sidx) - SESSION_HEADER.size) // SESSION_ENTRY.size
+                if self._count < covered + SESSION_REBUILD_ENTRIES:
+                    return sidx, n, covered
+            else:
+                sidx.close()
+                sidx, covered = None, 0
+        if self._count == 0:
+            return None, 0, 0
+
+        added = sorted((h, offset, length) for _, offset, length, h in INDEX_ENTRY.iter_unpack(
+            self._idx[covered * INDEX_ENTRY.size:self._count * INDEX_ENTRY.size]))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(SESSION_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, self._count))
+                _merge_sessions(f, sidx, n, added)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # e.g. a read-only log directory: keep using what there is and
+            # scan the remaining .idx entries
+            print(f"[LOG] could not write {path}: {e}")
+            return (sidx, n, covered) if sidx is not None else (None, 0, 0)
+        if sidx is not None:
+            sidx.close()
+        return _map(path), n + len(added), self._count
+
+    # ----- Queries -----
+
+    def session(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        Every record logged with this session_id, in the order written.
+        """
+        target = session_hash(session_id)
+        found: List[Tuple[int, int]] = []
+
+        sidx, n, covered = self._session_index()
+        if sidx is not None:
+            lo, hi = 0, n
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if SESSION_ENTRY.unpack_from(sidx, SESSION_HEADER.size + mid * SESSION_ENTRY.size)[0] < target:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            while lo < n:
+                h, offset, length = SESSION_ENTRY.unpack_from(sidx, SESSION_HEADER.size + lo * SESSION_ENTRY.size)
+                if h != target:
+                    break
+                found.append((offset, length))
+                lo += 1
+            sidx.close()
+
+        # Entries logged since the session index was built
+        for i in range(covered, self._count):
+            _, offset, length, h = self._entry(i)
+            if h == target:
+                found.append((offset, length))
+
+        # Hashes can collide, so check the session_id of each record read
+        records = [r for r in (self._record(o, l) for o, l in found)
+                   if (r.get("data") or {}).get("session_id") == session_id]
+        records.extend(r for _, sid, r in self._tail() if sid == session_id)
+        return records
+
+    def between(self, start: TimeLike = None, end: TimeLike = None) -> List[Dict[str, Any]]:
+        """
+        Every record with start <= timestamp <= end; either bound may be omitted.
+        """
+        start, end = to_epoch(start), to_epoch(end)
+        records: List[Dict[str, Any]] = []
+
+        lo, hi = 0, self._count
+        if start is not None:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._entry(mid)[0] < start:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        for i in range(lo, self._count):
+            ts, offset, length, _ = self._entry(i)
+            if end is not None and ts > end:
+                break
+            records.append(self._record(offset, length))
+
+        records.extend(r for ts, _, r in self._tail()
+                       if (start is None or ts >= start) and (end is None or ts <= end))
+        return records
+
+    def fully_indexed(self) -> bool:
+        return self._log is None or self._indexed_end == len(self._log)
+
+    def time_span(self) -> Optional[Tuple[float, float]]:
+        """First and last indexed timestamps, or None when nothing is indexed."""
+        if self._count == 0:
+            return None
+        return self._entry(0)[0], self._entry(self._count - 1)[0]
+
+
+# ----- Index Maintenance -----
+
+def _session_upper_bound(sidx: mmap.mmap, n: int, target: int, lo: int) -> int:
+    """First entry from lo on whose session hash is above target."""
+    hi = n
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if SESSION_ENTRY.unpack_from(sidx, SESSION_HEADER.size + mid * SESSION_ENTRY.size)[0] <= target:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def _merge_sessions(f, sidx: Optional[mmap.mmap], n: int, added: List[Tuple[int, int, int]]) -> None:
+    """
+    Write the n entries of sidx with the sorted `added` entries merged in.
+    Added entries come later in the log, so each goes after the existing
+    entries of its session; the runs in between are copied as raw bytes.
+    """
+    if sidx is None:
+        f.write(b"".join(SESSION_ENTRY.pack(*entry) for entry in added))
+        return
+    with memoryview(sidx)[SESSION_HEADER.size:] as entries:
+        copied = 0
+        for target, group in itertools.groupby(added, key=lambda entry: entry[0]):
+            end = _session_upper_bound(sidx, n, target, copied)
+            f.write(entries[copied * SESSION_ENTRY.size:end * SESSION_ENTRY.size])
+            f.write(b"".join(SESSION_ENTRY.pack(*entry) for entry in group))
+            copied = end
+        f.write(entries[copied * SESSION_ENTRY.size:n * SESSION_ENTRY.size])
+
+
+def build_index(path: str = LOG_FILE) -> int:
+    """
+    Index the records of a log file that its .idx doesn't cover yet, e.g. a
+    log written before indexing existed or with LOG_INDEX=0. Only the
+    unindexed tail is read, so repeated runs are cheap.
+
+    Run it on files no logger is writing to (a rotated backup, or after the
+    process stopped): the live writer appends its own entries.
+
+    Returns:
+        The number of entries added
+    """
+    with LogIndex(path) as index:
+        start, count = index._indexed_end, index._count
+        if index._log is None:
+            return 0
+        entries = []
+        for offset, length, line in _scan(index._log, start):
+            parsed = _parse(line)
+            if parsed is None:
+                continue
+            ts, session_id, _ = parsed
+            entries.append(INDEX_ENTRY.pack(ts, offset, length, session_hash(session_id)))
+
+    with open(index_path(path), "r+b" if os.path.exists(index_path(path)) else "wb") as f:
+        # Drop a partially written entry, if any, before appending
+        f.truncate(count * INDEX_ENTRY.size)
+        f.seek(0, os.SEEK_END)
+        f.write(b"".join(entries))
+    return len(entries)
+
+
+def log_files(path: str = LOG_FILE) -> List[str]:
+    """The log file and its rotated backups, oldest first."""
+    backups = []
+    for candidate in glob.glob(glob.escape(path) + ".*"):
+        suffix = candidate[len(path) + 1:]
+        if suffix.isdigit():
+            backups.append((int(suffix), candidate))
+    return [p for _, p in sorted(backups, reverse=True)] + ([path] if os.path.exists(path) else [])
+
+
+# ----- Queries across rotated files -----
+
+def session_events(session_id: str, path: str = LOG_FILE, since: TimeLike = None,
+                   until: TimeLike = None) -> List[Dict[str, Any]]:
+    """
+    Every record of one session across the log and its backups, optionally
+    limited to a time range.
+    """
+    since, until = to_epoch(since), to_epoch(until)
+    records = []
+    for file_path in log_files(path):
+        with LogIndex(file_path) as index:
+            for record in index.session(session_id):
+                ts = to_epoch(record["timestamp"])
+                if (since is None or ts >= since) and (until is None or ts <= until):
+                    records.append(record)
+    return records
+
+
+def events_between(start: TimeLike = None, end: TimeLike = None, path: str = LOG_FILE) -> List[Dict[str, Any]]:
+    """
+    Every record between two times across the log and its backups.
+    """
+    start, end = to_epoch(start), to_epoch(end)
+    records = []
+    for file_path in log_files(path):
+        with LogIndex(file_path) as index:
+            span = index.time_span()
+            # Files entirely outside the range are skipped unless they have an unindexed tail
+            if span is not None and index.fully_indexed():
+                if (start is not None and span[1] < start) or (end is not None and span[0] > end):
+                    continue
+            records.extend(index.between(start, end))
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log", default=LOG_FILE, help="Log file (rotated backups are included)")
+    parser.add_argument("--session", help="Session ID to return events for")
+    parser.add_argument("--since", help="Earliest timestamp (ISO 8601, UTC)")
+    parser.add_argument("--until", help="Latest timestamp (ISO 8601, UTC)")
+    parser.add_argument("--build", action="store_true", help="Index records the .idx files don't cover yet")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    if args.build:
+        for file_path in log_files(args.log):
+            added = build_index(file_path)
+            print(f"Indexed {added} records in {file_path}")
+        return
+
+    if args.session:
+        records = session_events(args.session, args.log, args.since, args.until)
+    else:
+        records = events_between(args.since, args.until, args.log)
+    elapsed = time.perf_counter() - start
+
+    for record in records:
+        print(json.dumps(record))
+    print(f"{len(records)} records in {elapsed * 1000:.1f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,51 @@
-from langchain_openai import ChatOpenAI
 from agent import agent_workflow
 from schemas import AgentState
 from tools import retrieve_documents, search_specific_document, calculate
 from dotenv import load_dotenv
 from json_logger import log
+from document_store import get_document_store
+from intent_router import router
+from response_cache import CachedWorkflow
+from tool_cache import tool_cache
+from instrumentation import node_metrics
+from streaming import stream_answer, print_stream
+import argparse
+import asyncio
+import functools
+import os
 import uuid
 
 load_dotenv()
 
+# Chat model used by the entry points below
+MODEL = "gpt-5-mini"
+
+
+@functools.lru_cache(maxsize=None)
+def create_llm():
+    """
+    The process's chat model. langchain_openai (and the openai SDK behind
+    it) would be most of this module's import time, so the entry points
+    pass this function as config["configurable"]["llm"] and the first node
+    that needs the model calls it (see runnable_registry.resolve_llm).
+    """
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=MODEL)
+
+
+# With WARM_START=1, do the first request's setup at import time, e.g. ahead
+# of a platform snapshot or a pre-forking server's fork (see warmup.py)
+if os.getenv("WARM_START") == "1":
+    from warmup import warm_up
+    warm_up(create_llm)
+
+
 def main():
-    # Initialize the LLM
-    llm = ChatOpenAI(model="gpt-5-mini")
+    # The LLM is created by the first node that needs it
+    llm = create_llm
+
+    # Build the retrieval index once, before any agent node needs it
+    get_document_store()
     
     # Create a session ID for this conversation
     session_id = str(uuid.uuid4())
@@ -27,9 +62,11 @@ def main():
     
     log("Starting new session", session_id=session_id)
     
-    # CRITICAL: Create the workflow ONCE and reuse it
-    # Each call to agent_workflow() creates a NEW checkpointer
-    workflow = agent_workflow()
+    # The compiled graph is memoized: agent_workflow() returns the same
+    # instance (and shared checkpointer) on every call in this process
+    # Repeated first-turn questions are answered from the response cache
+    # when RESPONSE_CACHE is set
+    workflow = CachedWorkflow(agent_workflow())
     
     # Create initial state using the Pydantic model
     # Note: Don't initialize actions_taken=[] when using checkpointer
@@ -74,10 +111,12 @@ def main():
     print("Running second query in same session...")
     print("="*50 + "\n")
     
-    second_state = AgentState(
-        user_input="What was the last question?",
-        session_id=session_id
-    )
+    # Pass only the fields that change: an AgentState would also send its
+    # defaults (e.g. messages=[]) and overwrite the checkpointed history
+    second_state = {
+        "user_input": "What was the last question?",
+        "session_id": session_id
+    }
     log("Second query started", session_id=session_id)
     
     # CRITICAL: Use the SAME workflow instance to access the same checkpointer
@@ -91,5 +130,97 @@ def main():
     print(f"\nTotal actions across both invocations: {result2.get('actions_taken', [])}")
     log("Second query completed", session_id=session_id, response=result2.get("current_response").answer if result2.get("current_response") else None, actions_taken=result2.get("actions_taken", []))
 
+    report_stats()
+
+
+def report_stats():
+    stats = router.stats()
+    print(f"\nFast intent router: {stats['fast_path_hits']}/{stats['requests']} routed locally "
+          f"({stats['hit_rate']:.0%}), ~{stats['estimated_seconds_saved']:.2f}s of triage LLM time saved")
+    log("Fast intent router stats", **stats)
+
+    cache_stats = tool_cache.stats()
+    print(f"Tool result cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+          f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries")
+    log("Tool result cache stats", **cache_stats)
+
+    print("\nPer-node latency and usage:")
+    print(node_metrics.format_report())
+    log("Node metrics report", **node_metrics.report())
+
+
+async def run_session(workflow, llm, user_input: str) -> dict:
+    """
+    Run one single-turn conversation through the graph on the event loop.
+    """
+    session_id = str(uuid.uuid4())
+    config = {
+        "configurable": {
+            "thread_id": session_id,
+            "llm": llm,
+            "tools": [retrieve_documents, search_specific_document, calculate]
+        }
+    }
+    log("Starting new async session", session_id=session_id)
+    result = await workflow.ainvoke(AgentState(user_input=user_input, session_id=session_id), config)
+    log("Async session completed", session_id=session_id, actions_taken=result.get("actions_taken", []))
+    return result
+
+
+async def amain(sessions: int, user_input: str = "Can you summarise doc_1?"):
+    """
+    Async entry point: drive many concurrent sessions on one event loop.
+    """
+    llm = create_llm
+    get_document_store()
+    workflow = CachedWorkflow(agent_workflow())
+
+    results = await asyncio.gather(*(run_session(workflow, llm, user_input) for _ in range(sessions)))
+
+    for result in results:
+        if result.get("current_response"):
+            print(f"Response: {result['current_response'].answer}")
+    print(f"\nCompleted {len(results)} concurrent sessions")
+    report_stats()
+
+
+def stream_main(user_input: str = "Can you summarise doc_1?"):
+    """
+    Streaming entry point: print node transitions and the answer token by token.
+    """
+    llm = create_llm
+    get_document_store()
+    workflow = agent_workflow()
+
+    session_id = str(uuid.uuid4())
+    config = {
+        "configurable": {
+            "thread_id": session_id,
+            "llm": llm,
+            "tools": [retrieve_documents, search_specific_document, calculate]
+        }
+    }
+    log("Starting new streaming session", session_id=session_id)
+
+    state, done = print_stream(stream_answer(workflow, {"user_input": user_input, "session_id": session_id}, config))
+
+    print(f"\nTime to first token: {done['ttft_seconds']:.2f}s, total: {done['total_seconds']:.2f}s")
+    log("Streaming session completed", session_id=session_id, actions_taken=state.get("actions_taken", []),
+        ttft_seconds=done["ttft_seconds"], total_seconds=done["total_seconds"])
+    report_stats()
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Document assistant demo")
+    parser.add_argument("--async-sessions", type=int, default=0,
+                        help="Run this many concurrent sessions on one event loop instead of the demo")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream the answer token by token instead of waiting for the whole graph")
+    args = parser.parse_args()
+
+    if args.stream:
+        stream_main()
+    elif args.async_sessions:
+        asyncio.run(amain(args.async_sessions))
+    else:
+        main()
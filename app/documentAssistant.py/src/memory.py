@@ -0,0 +1,296 @@
+import functools
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from schemas import AgentState
+
+# ----- Conversation Memory -----
+#
+# AgentState.messages alternates [user_input, answer, user_input, answer, ...].
+# After every turn the memory node keeps the last few turns verbatim and
+# folds older turns into conversation_summary. Only the turns that fell out
+# of the window are summarized, so the work per turn stays constant however
+# long the session runs. Prompts get the summary plus the recent turns,
+# trimmed to a token budget.
+#
+# The extractive summarizer runs inline: it costs microseconds. A
+# model-backed summarizer would add an LLM call to every reply, so it runs
+# in a background thread after the turn instead, and its summary is
+# applied by the memory node at the end of a later turn on the same thread.
+# Until then the extra turns stay in messages, and render() keeps prompts
+# within the budget.
+
+DEFAULT_MAX_TURNS = 4
+DEFAULT_TOKEN_BUDGET = 1000
+
+# Background summaries run concurrently, and the most kept waiting for
+# their thread's next turn
+SUMMARY_WORKERS = 4
+MAX_PENDING_SUMMARIES = 10_000
+
+# Words kept from each side of a folded turn
+SUMMARY_QUESTION_WORDS = 25
+SUMMARY_ANSWER_WORDS = 40
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+# Set to a tiktoken encoding name (e.g. "cl100k_base") to count tokens
+# exactly. tiktoken downloads the encoding on first use, so it is opt-in.
+TOKENIZER_ENV = "TIKTOKEN_ENCODING"
+
+
+@functools.lru_cache(maxsize=1)
+def _encoding():
+    name = os.getenv(TOKENIZER_ENV)
+    if not name:
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"Falling back to estimated token counts: {e}")
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token count from tiktoken when TIKTOKEN_ENCODING is set, otherwise an
+    estimate of about four characters per token for English text.
+    """
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _clip_words(text: str, limit: int) -> str:
+    words = text.split()
+    return " ".join(words[:limit]) + (" ..." if len(words) > limit else "")
+
+
+def _turns(messages: Sequence[str]) -> List[Tuple[str, str]]:
+    return [(messages[i], messages[i + 1] if i + 1 < len(messages) else "")
+            for i in range(0, len(messages), 2)]
+
+
+# ----- Summarizers -----
+
+class Summarizer:
+    """
+    Folds turns that left the verbatim window into the running summary.
+    """
+
+    def summarize(self, summary: str, turns: Sequence[Tuple[str, str]], token_budget: int) -> str:
+        raise NotImplementedError
+
+
+class ExtractiveSummarizer(Summarizer):
+    """
+    Keeps one line per folded turn: the question and the answer's first
+    sentence. When the summary exceeds the budget, the oldest lines go first.
+    No model call, so it is cheap enough to run after every turn.
+    """
+
+    def summarize(self, summary: str, turns: Sequence[Tuple[str, str]], token_budget: int) -> str:
+        lines = [line for line in (summary or "").splitlines() if line]
+        for question, answer in turns:
+            first_sentence = _SENTENCE_END.split(answer.strip(), maxsplit=1)[0]
+            lines.append(f"- User: {_clip_words(question, SUMMARY_QUESTION_WORDS)} "
+                         f"| Assistant: {_clip_words(first_sentence, SUMMARY_ANSWER_WORDS)}")
+        while len(lines) > 1 and estimate_tokens("\n".join(lines)) > token_budget:
+            lines.pop(0)
+        return "\n".join(lines)
+
+
+class LLMSummarizer(Summarizer):
+    """
+    Rewrites the summary with a (cheap) chat model.
+    """
+
+    PROMPT = (
+        "Update the conversation summary with the new turns. Keep facts, document IDs "
+        "and numbers; stay under {words} words.\n\nCurrent summary:\n{summary}\n\nNew turns:\n{turns}"
+    )
+
+    def __init__(self, llm):
+        self.llm = llm
+
+    def summarize(self, summary: str, turns: Sequence[Tuple[str, str]], token_budget: int) -> str:
+        rendered = "\n".join(f"User: {q}\nAssistant: {a}" for q, a in turns)
+        prompt = self.PROMPT.format(words=token_budget * 3 // 4, summary=summary or "(none)", turns=rendered)
+        response = self.llm.invoke(prompt)
+        return response.content if hasattr(response, "content") else str(response)
+
+
+# ----- Memory Manager -----
+
+class ConversationMemory:
+    """
+    Bounds the conversation carried in AgentState.
+
+    Args:
+        max_turns: Turns kept verbatim in messages
+        token_budget: Token budget for the history rendered into prompts
+            (the summary gets at most half of it)
+        summarizer: How older turns are folded into the summary
+    """
+
+    def __init__(self, max_turns: int = DEFAULT_MAX_TURNS, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 summarizer: Optional[Summarizer] = None):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.summarizer = summarizer or ExtractiveSummarizer()
+
+    @classmethod
+    def from_config(cls, config) -> "ConversationMemory":
+        configurable = (config or {}).get("configurable", {})
+        summary_llm = configurable.get("summary_llm")
+        return cls(
+            max_turns=configurable.get("memory_max_turns", DEFAULT_MAX_TURNS),
+            token_budget=configurable.get("memory_token_budget", DEFAULT_TOKEN_BUDGET),
+            summarizer=LLMSummarizer(summary_llm) if summary_llm is not None else None,
+        )
+
+    def compact(self, state: AgentState) -> Dict[str, Any]:
+        """
+        State update that moves turns beyond max_turns into the summary.
+        Returns an empty update when nothing needs folding.
+        """
+        keep = self.max_turns * 2
+        if len(state.messages) <= keep:
+            return {}
+
+        folded = state.messages[:len(state.messages) - keep]
+        summary = self.summarizer.summarize(state.conversation_summary or "", _turns(folded),
+                                            self.token_budget // 2)
+        return {
+            "messages": state.messages[len(folded):],
+            "conversation_summary": summary,
+        }
+
+    def render(self, state: AgentState) -> str:
+        """
+        The summary plus as many of the most recent turns as fit the budget.
+        """
+        parts: List[str] = []
+        remaining = self.token_budget
+        if state.conversation_summary:
+            summary = f"Summary of earlier conversation:\n{state.conversation_summary}"
+            parts.append(summary)
+            remaining -= estimate_tokens(summary)
+
+        recent: List[str] = []
+        for question, answer in reversed(_turns(state.messages)):
+            turn = f"User: {question}\nAssistant: {answer}"
+            cost = estimate_tokens(turn)
+            if cost > remaining:
+                break
+            recent.insert(0, turn)
+            remaining -= cost
+
+        if recent:
+            parts.append("Recent turns:\n" + "\n".join(recent))
+        return "\n\n".join(parts)
+
+
+# ----- Background Summaries -----
+
+class _PendingSummary(NamedTuple):
+    future: "Future[str]"
+    base_summary: str
+    folded: List[str]
+
+
+class BackgroundSummaries:
+    """
+    Runs a slow summarizer off the response path, one job per conversation
+    thread, and hands each summary to the next turn of that thread.
+
+    State lives in this process: if the next turn lands on another worker,
+    that worker starts its own job and the finished one is eventually
+    evicted.
+    """
+
+    def __init__(self, max_workers: int = SUMMARY_WORKERS, max_pending: int = MAX_PENDING_SUMMARIES):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="memory-summary")
+        self._pending: "OrderedDict[str, _PendingSummary]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compact(self, memory: ConversationMemory, state: AgentState, thread_id: str) -> Dict[str, Any]:
+        """
+        State update applying a finished summary for this thread, if any,
+        and start summarizing the turns that are now beyond the window.
+        Never waits for the summarizer.
+        """
+        with self._lock:
+            pending = self._pending.get(thread_id)
+            if pending is not None and not pending.future.done():
+                return {}
+            self._pending.pop(thread_id, None)
+
+        update = self._apply(pending, state) if pending is not None else {}
+        messages = update.get("messages", state.messages)
+        summary = update.get("conversation_summary", state.conversation_summary or "")
+
+        keep = memory.max_turns * 2
+        if len(messages) > keep:
+            folded = messages[:len(messages) - keep]
+            future = self._executor.submit(memory.summarizer.summarize, summary, _turns(folded),
+                                           memory.token_budget // 2)
+            with self._lock:
+                self._pending[thread_id] = _PendingSummary(future, summary, folded)
+                # Threads that never came back; a running job finishes unobserved
+                while len(self._pending) > self.max_pending:
+                    self._pending.popitem(last=False)
+        return update
+
+    @staticmethod
+    def _apply(pending: _PendingSummary, state: AgentState) -> Dict[str, Any]:
+        # Only valid if the turns it folded are still the oldest in messages
+        if pending.future.exception() is not None:
+            print(f"Conversation summary failed: {pending.future.exception()}")
+            return {}
+        if ((state.conversation_summary or "") != pending.base_summary
+                or state.messages[:len(pending.folded)] != pending.folded):
+            return {}
+        return {
+            "messages": state.messages[len(pending.folded):],
+            "conversation_summary": pending.future.result(),
+        }
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until every running summary has finished (for tests and shutdown)."""
+        with self._lock:
+            futures = [pending.future for pending in self._pending.values()]
+        for future in futures:
+            try:
+                future.result(timeout)
+            except Exception:
+                pass
+
+
+background_summaries = BackgroundSummaries()
+
+
+def _compact(state: AgentState, config) -> Dict[str, Any]:
+    memory = ConversationMemory.from_config(config)
+    thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+    if isinstance(memory.summarizer, LLMSummarizer) and thread_id is not None:
+        return background_summaries.compact(memory, state, thread_id)
+    return memory.compact(state)
+
+
+def memory_manager_node(state: AgentState, config):
+    """Fold turns beyond the verbatim window into the conversation summary"""
+    return _compact(state, config)
+
+
+async def amemory_manager_node(state: AgentState, config):
+    """Async memory node; neither summarizer blocks the event loop"""
+    return _compact(state, config)
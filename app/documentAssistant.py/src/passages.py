@@ -0,0 +1,125 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+from document_store import DocumentStore, InMemoryDocumentStore
+
+# ----- Passage Splitting -----
+
+# Sentence boundaries: end punctuation followed by whitespace
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+# Roughly 100-150 tokens per passage
+DEFAULT_PASSAGE_CHARS = 600
+
+
+def split_passages(text: str, max_chars: int = DEFAULT_PASSAGE_CHARS) -> List[Dict[str, Any]]:
+    """
+    Split text into passages of whole sentences, each at most max_chars long
+    (a single longer sentence becomes its own passage).
+
+    Returns:
+        Passages with "text" plus "start"/"end" byte offsets into the
+        UTF-8 encoded text
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_BREAK.finditer(text):
+        sentences.append((start, match.start()))
+        start = match.end()
+    if text[start:].strip():
+        sentences.append((start, len(text)))
+
+    # Group consecutive sentences into character spans
+    spans = []
+    for start, end in sentences:
+        if spans and end - spans[-1][0] <= max_chars:
+            spans[-1][1] = end
+        else:
+            spans.append([start, end])
+
+    # Convert character offsets to byte offsets in one left-to-right pass
+    passages = []
+    char_pos = byte_pos = 0
+    for start, end in spans:
+        byte_pos += len(text[char_pos:start].encode("utf-8"))
+        start_byte = byte_pos
+        byte_pos += len(text[start:end].encode("utf-8"))
+        char_pos = end
+        passages.append({"text": text[start:end], "start": start_byte, "end": byte_pos})
+
+    return passages
+
+
+# ----- Per-Document Passage Index -----
+
+class PassageIndex:
+    """
+    BM25 index over the passages of a single document.
+    """
+
+    def __init__(self, doc: Dict[str, Any], max_chars: int = DEFAULT_PASSAGE_CHARS):
+        self.doc_id = doc["id"]
+        self.passages = split_passages(doc.get("content", ""), max_chars)
+        self._index = InMemoryDocumentStore(
+            ({"id": str(i), **p} for i, p in enumerate(self.passages)),
+            text_fn=lambda p: p["text"],
+        )
+
+    def search(self, query: str, max_passages: int = 3) -> List[Dict[str, Any]]:
+        """
+        Return the best-matching passages with their byte spans, in document order.
+        If nothing matches, the opening passage is returned with a score of 0.
+        """
+        hits = self._index.score(query, max_passages)
+        if not hits:
+            return [{**p, "score": 0.0} for p in self.passages[:1]]
+        ordered = sorted(hits, key=lambda hit: hit[1])
+        return [{**self.passages[num], "score": round(score, 3)} for score, num in ordered]
+
+
+class PassageIndexCache:
+    """
+    LRU cache of passage indexes, keyed by store, document ID and corpus
+    version so an updated document is re-split on its next lookup.
+    """
+
+    def __init__(self, max_documents: int = 256):
+        self.max_documents = max_documents
+        self._entries: "OrderedDict[Tuple[int, str, int], PassageIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, store: DocumentStore, doc_id: str) -> Optional[PassageIndex]:
+        key = (id(store), doc_id.lower(), store.version)
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+                return index
+
+        doc = store.get(doc_id)
+        if doc is None:
+            return None
+        index = PassageIndex(doc)
+
+        with self._lock:
+            self._entries[key] = index
+            while len(self._entries) > self.max_documents:
+                self._entries.popitem(last=False)
+        return index
+
+
+_cache = PassageIndexCache()
+
+
+def search_passages(store: DocumentStore, doc_id: str, query: str,
+                    max_passages: int = 3) -> Optional[List[Dict[str, Any]]]:
+    """
+    Top passages for a query within one document, or None if the document
+    does not exist.
+    """
+    index = _cache.get(store, doc_id)
+    if index is None:
+        return None
+    return index.search(query, max_passages)
@@ -11,6 +11,8 @@ cite all source document IDs, and produce a structured response.
 
 Rules:
 - Use the retrieval tool to locate relevant documents when needed.
+- Once you know which document holds the answer, prefer 'search_specific_document',
+  which returns only the relevant passages instead of the whole document.
 - Base all answers strictly on retrieved documents.
 - Provide accurate and concise answers.
 - Always return a structured AnswerResponse object.
@@ -36,9 +38,12 @@ identify the mathematical expression, and compute the result.
 
 Rules:
 - ALWAYS use the calculator tool for ALL calculations (no mental math).
+- For figures stated in the documents (revenue, costs, growth, ...), try query_facts first:
+  it finds the values and can sum, average or compute growth in the same call.
 - Retrieve documents when needed.
 - Determine the correct formula or expression to compute.
 - Return the final numeric result using the calculator tool.
+- When you need several results or totals, compute them together in one calculate_batch call.
 - Always return a structured AnswerResponse object.
 """
 
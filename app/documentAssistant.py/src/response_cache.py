@@ -0,0 +1,438 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from schemas import AgentState, AnswerResponse, UserIntent
+from document_store import DocumentStore, document_text, get_document_store
+from memory import memory_manager_node
+
+# ----- Response Cache -----
+#
+# Caches final answers so a repeated request ("summarise doc_1") skips the
+# triage call, the tool loop and the final generation. Entries are keyed on
+# the normalized user input, the intent (or "*" for whole-graph entries) and
+# the cache scope, and carry a fingerprint of the documents the answer was
+# built from: {document ID: content hash}. A lookup whose fingerprint no
+# longer matches the store (a document was updated or deleted) is treated as
+# a miss and the entry is dropped.
+#
+# Only first turns are cached. Follow-ups depend on the conversation history
+# and always run the full graph.
+
+# "memory" for an in-process cache, or the path of a SQLite cache file
+RESPONSE_CACHE_ENV = "RESPONSE_CACHE"
+
+DEFAULT_TTL_SECONDS = 3600.0
+DEFAULT_MAX_ENTRIES = 1024
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+
+
+def normalize_input(user_input: Optional[str]) -> str:
+    """
+    Lowercase, collapse whitespace and drop trailing punctuation, so
+    "Summarise doc_1?" and "summarise  doc_1" share an entry.
+    """
+    text = _WHITESPACE.sub(" ", (user_input or "").lower()).strip()
+    return _TRAILING_PUNCTUATION.sub("", text)
+
+
+def document_fingerprint(store: DocumentStore, doc_ids) -> Dict[str, Optional[str]]:
+    """
+    Content hash of each document (None if it no longer exists).
+    """
+    fingerprint = {}
+    for doc_id in sorted(set(doc_ids)):
+        doc = store.get(doc_id)
+        fingerprint[doc_id] = (
+            hashlib.blake2b(document_text(doc).encode("utf-8"), digest_size=8).hexdigest()
+            if doc is not None else None
+        )
+    return fingerprint
+
+
+class CachedAnswer(NamedTuple):
+    response: AnswerResponse
+    intent: Optional[UserIntent]
+    tools_used: List[str]
+    # Specialist node that produced the answer
+    node: Optional[str]
+
+
+# ----- Backends -----
+
+class CacheBackend:
+    """
+    Key/value storage with TTL and LRU eviction. Values are JSON strings.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    In-process LRU held in an OrderedDict.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache shared across processes and restarts in one SQLite file. Each
+    read updates last_access, and the least recently used rows beyond
+    max_entries are deleted on write.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS response_cache_lru ON response_cache (last_access)"
+            )
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access)"
+                " VALUES (?, ?, ?, ?)", (key, value, now + ttl, now)
+            )
+            self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                " SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM response_cache")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+# ----- Cache -----
+
+class ResponseCache:
+    """
+    Answer cache used by CachedWorkflow (whole graph) and ToolLoop
+    (each specialist node).
+
+    Args:
+        backend: Where entries live (MemoryCacheBackend or SQLiteCacheBackend)
+        ttl: Seconds an entry stays valid
+        store: Document store used to check fingerprints
+            (defaults to the process-wide store)
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None, ttl: float = DEFAULT_TTL_SECONDS,
+                 store: Optional[DocumentStore] = None):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl = ttl
+        self._store = store
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def store(self) -> DocumentStore:
+        return self._store or get_document_store()
+
+    @staticmethod
+    def cacheable(state: AgentState) -> bool:
+        return bool(state.user_input) and not state.messages
+
+    @staticmethod
+    def key(scope: str, user_input: Optional[str], intent: Optional[str] = None) -> str:
+        raw = json.dumps([scope, normalize_input(user_input), intent or "*"])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, scope: str, state: AgentState,
+               intent: Optional[str] = None) -> Optional[CachedAnswer]:
+        """
+        Return the cached answer for a valid entry, or None.
+        """
+        if not self.cacheable(state):
+            return None
+
+        key = self.key(scope, state.user_input, intent)
+        raw = self.backend.get(key)
+        if raw is None:
+            self._count("misses")
+            return None
+
+        entry = json.loads(raw)
+        fingerprint = entry["fingerprint"]
+        if document_fingerprint(self.store, fingerprint) != fingerprint:
+            self.backend.delete(key)
+            self._count("invalidations")
+            self._count("misses")
+            return None
+
+        self._count("hits")
+        print(f"[CACHE] {scope}: reusing answer for '{normalize_input(state.user_input)}'")
+        cached_intent = UserIntent.model_validate(entry["intent"]) if entry["intent"] else None
+        return CachedAnswer(AnswerResponse.model_validate(entry["response"]), cached_intent,
+                            entry["tools_used"], entry.get("node"))
+
+    def remember(self, scope: str, state: AgentState, response: Optional[AnswerResponse],
+                 intent: Optional[str] = None, user_intent: Optional[UserIntent] = None,
+                 tools_used: Optional[list] = None, node: Optional[str] = None) -> None:
+        """
+        Store a successful answer for this input.
+        """
+        if response is None or not response.confidence or not self.cacheable(state):
+            return
+
+        entry = {
+            "response": response.model_dump(mode="json"),
+            "intent": user_intent.model_dump() if user_intent else None,
+            "tools_used": tools_used or [],
+            "node": node,
+            "fingerprint": document_fingerprint(self.store, response.sources),
+        }
+        self.backend.set(self.key(scope, state.user_input, intent), json.dumps(entry), self.ttl)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+
+# ----- Shared Cache -----
+
+_cache: Optional[ResponseCache] = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    Return the process-wide response cache configured by RESPONSE_CACHE,
+    or None when caching is off.
+    """
+    global _cache, _cache_loaded
+    if not _cache_loaded:
+        with _cache_lock:
+            if not _cache_loaded:
+                setting = os.getenv(RESPONSE_CACHE_ENV)
+                if setting == "memory":
+                    _cache = ResponseCache(MemoryCacheBackend())
+                elif setting:
+                    _cache = ResponseCache(SQLiteCacheBackend(setting))
+                _cache_loaded = True
+    return _cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """
+    Replace the process-wide response cache (None turns caching off).
+    """
+    global _cache, _cache_loaded
+    with _cache_lock:
+        _cache = cache
+        _cache_loaded = True
+
+
+def resolve_response_cache(config) -> Optional[ResponseCache]:
+    """
+    The cache for this invocation: config["configurable"]["response_cache"]
+    when given (False disables caching), otherwise the shared cache.
+    """
+    configurable = (config or {}).get("configurable", {})
+    if "response_cache" in configurable:
+        return configurable["response_cache"] or None
+    return get_response_cache()
+
+
+# ----- Graph Wrapper -----
+
+class CachedWorkflow:
+    """
+    Wraps a compiled agent_workflow() graph. A cached first-turn answer is
+    returned without running any node; otherwise the graph runs and its
+    answer is cached. Everything else is delegated to the graph.
+
+    With a checkpointer, a thread that already has history is never served
+    from the cache, and a cache hit is written to the thread's checkpoint as
+    a finished turn (after the memory manager's step), so the next turn sees
+    it.
+    """
+
+    SCOPE = "graph"
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def _checkpointed(self, config) -> bool:
+        return getattr(self.graph, "checkpointer", None) is not None and \
+            "thread_id" in (config or {}).get("configurable", {})
+
+    def invoke(self, input: Union[AgentState, Dict[str, Any]], config=None, **kwargs):
+        state = AgentState.model_validate(input)
+        cache = resolve_response_cache(config)
+        snapshot = self.graph.get_state(config) if cache and self._checkpointed(config) else None
+        if snapshot is not None:
+            state = state.model_copy(update={"messages": snapshot.values.get("messages", [])})
+        hit = cache.lookup(self.SCOPE, state) if cache else None
+        if hit:
+            result = self._cached_result(state, hit)
+            if snapshot is not None:
+                self.graph.update_state(config, self._update(snapshot.values, result, config), as_node="memory_manager")
+            return result
+
+        result = self.graph.invoke(input, config, **kwargs)
+        if cache:
+            self._remember(cache, state, result)
+        return result
+
+    async def ainvoke(self, input: Union[AgentState, Dict[str, Any]], config=None, **kwargs):
+        state = AgentState.model_validate(input)
+        cache = resolve_response_cache(config)
+        snapshot = await self.graph.aget_state(config) if cache and self._checkpointed(config) else None
+        if snapshot is not None:
+            state = state.model_copy(update={"messages": snapshot.values.get("messages", [])})
+        hit = cache.lookup(self.SCOPE, state) if cache else None
+        if hit:
+            result = self._cached_result(state, hit)
+            if snapshot is not None:
+                await self.graph.aupdate_state(config, self._update(snapshot.values, result, config),
+                                               as_node="memory_manager")
+            return result
+
+        result = await self.graph.ainvoke(input, config, **kwargs)
+        if cache:
+            self._remember(cache, state, result)
+        return result
+
+    def _remember(self, cache: ResponseCache, state: AgentState, result: Dict[str, Any]) -> None:
+        actions = result.get("actions_taken") or []
+        cache.remember(self.SCOPE, state, result.get("current_response"),
+                       user_intent=result.get("intent"), tools_used=result.get("tools_used"),
+                       node=actions[-1] if actions else None)
+
+    @staticmethod
+    def _cached_result(state: AgentState, hit: CachedAnswer) -> Dict[str, Any]:
+        # Same shape as a graph result, so callers can't tell the difference
+        result = {name: getattr(state, name) for name in AgentState.model_fields}
+        result.update({
+            "intent": hit.intent,
+            "current_response": hit.response,
+            "messages": state.messages + [state.user_input, hit.response.answer],
+            "tools_used": state.tools_used + hit.tools_used,
+            "actions_taken": state.actions_taken + ["response_cache"],
+        })
+        return result
+
+    @staticmethod
+    def _update(values: Dict[str, Any], result: Dict[str, Any], config) -> Dict[str, Any]:
+        # Written as the memory manager's output, so the thread ends the turn at
+        # END; its compaction is applied to the result as well
+        fields = ("user_input", "intent", "current_response", "messages", "tools_used", "session_id")
+        update = {name: result[name] for name in fields}
+        compacted = memory_manager_node(AgentState.model_validate({**values, **update}), config)
+        result.update(compacted)
+        return {**update, **compacted, "actions_taken": ["response_cache"]}
+
+    def __getattr__(self, name):
+        return getattr(self.graph, name)
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Sequence, Tuple, Type
+
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel
+
+# ----- Prepared Runnable Registry -----
+#
+# llm.bind_tools(...) and llm.with_structured_output(...) both rebuild JSON
+# schemas and wrapper runnables every time they are called. The registry
+# prepares each (llm, tool set) or (llm, schema) pair once and hands the same
+# runnable to every node, graph invocation and session that asks for it.
+#
+# Prepared runnables hold a strong reference to their LLM, so entries live in
+# a bounded LRU rather than a weak-keyed map; holding the LLM also keeps its
+# id() from being reused while the entry exists.
+
+MAX_ENTRIES = 256
+
+
+class RunnableRegistry:
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[int, Hashable], Tuple[Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_or_build(self, llm, key: Hashable, build: Callable[[], Any]):
+        full_key = (id(llm), key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] is llm:
+                self._entries.move_to_end(full_key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # Built outside the lock; a racing duplicate build is harmless
+        runnable = build()
+
+        with self._lock:
+            self._entries[full_key] = (llm, runnable)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return runnable
+
+    def bind_tools(self, llm, tools: Sequence[BaseTool]):
+        """
+        Cached llm.bind_tools(tools), keyed by the tool names.
+        """
+        key = ("tools",) + tuple(sorted(t.name for t in tools))
+        return self._get_or_build(llm, key, lambda: llm.bind_tools(list(tools)))
+
+    def structured_output(self, llm, schema: Type[BaseModel]):
+        """
+        Cached llm.with_structured_output(schema), keyed by the schema class.
+        """
+        key = ("schema", schema.__module__, schema.__qualname__)
+        return self._get_or_build(llm, key, lambda: llm.with_structured_output(schema))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+# Process-wide registry shared by every node
+registry = RunnableRegistry()
+
+
+def resolve_llm(llm):
+    """
+    config["configurable"]["llm"] may be a chat model or a zero-argument
+    factory for one (e.g. main.create_llm). A factory is called when a node
+    first needs the model, so the provider SDK's import stays off startup
+    and off requests that never reach an LLM (response cache hits). It
+    should return the same model on every call, as entries are keyed on it.
+    """
+    if callable(llm) and not isinstance(llm, Runnable):
+        return llm()
+    return llm
+
+
+def get_bound_llm(llm, tools: Sequence[BaseTool]):
+    return registry.bind_tools(resolve_llm(llm), tools)
+
+
+def get_structured_llm(llm, schema: Type[BaseModel]):
+    return registry.structured_output(resolve_llm(llm), schema)
@@ -44,6 +44,9 @@ class AgentState(BaseModel):
     
     # Which tools were used in this turn (retriever, calculator, etc.)
     tools_used: List[str] = []
+
+    # Per-iteration LLM and tool timings from the specialist's tool loop
+    iteration_timings: List[Dict[str, Any]] = []
     
     # Session and user tracking
     session_id: Optional[str] = None
@@ -0,0 +1,518 @@
+import contextlib
+import glob
+import heapq
+import json
+import os
+import threading
+from typing import List, Dict, Any, Callable, Iterable, Optional, Set, Tuple, NamedTuple, FrozenSet, TypeVar, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, so use one writer process at a time
+    fcntl = None
+
+from document_store import DocumentStore, InMemoryDocumentStore, CorpusStats, tokenize
+from disk_index import write_index, MmapDocumentStore
+
+# ----- Segments -----
+#
+# The index is a list of immutable segments plus one small in-memory buffer,
+# in the style of Lucene:
+#
+#   - new and updated documents go into the buffer
+#   - deleting a document only records a tombstone against its segment
+#   - a full buffer is written out as a new segment file
+#   - a background thread merges small segments and drops tombstoned documents
+#
+# Readers work from an immutable snapshot of the segment list, so queries
+# keep running while documents are added, deleted or merged.
+#
+# Several processes may open the same directory (an ingest --update next to
+# the serving workers). Every change to the manifest happens under an
+# exclusive lock on the directory's lock file, after re-reading the manifest
+# if its generation moved on, so segment names are never reused and no
+# process writes the manifest from a stale view.
+
+MANIFEST = "manifest.json"
+LOCK_FILE = "manifest.lock"
+
+SegmentIndex = Union[MmapDocumentStore, InMemoryDocumentStore]
+
+
+class Segment(NamedTuple):
+    name: str
+    index: SegmentIndex
+    deleted: FrozenSet[int] = frozenset()
+    # The part of `deleted` hidden only because a newer copy is still in
+    # memory; those stay live in the manifest until the newer copy is flushed
+    replaced: FrozenSet[int] = frozenset()
+
+    @property
+    def live_count(self) -> int:
+        return len(self.index) - len(self.deleted)
+
+    def live_documents(self) -> Iterable[Dict[str, Any]]:
+        for doc_num in range(len(self.index)):
+            if doc_num not in self.deleted:
+                yield self.index.document(doc_num)
+
+
+class SegmentedDocumentStore(DocumentStore):
+    """
+    Updatable document store made of segment files in a directory.
+
+    Args:
+        directory: Where segment files and the manifest live (created if missing)
+        flush_threshold: Buffered documents that trigger a new segment file
+        merge_factor: Merge once there are more than this many segments
+        merge_interval: Seconds between background checks for merges and for
+            changes committed by other processes (None disables the thread;
+            call refresh() to pick up those changes)
+    """
+
+    def __init__(self, directory: str, flush_threshold: int = 1000, merge_factor: int = 8,
+                 merge_interval: Optional[float] = 5.0):
+        self.directory = directory
+        self.flush_threshold = flush_threshold
+        self.merge_factor = merge_factor
+
+        # Serializes writers (add/delete/flush/merge swap); readers never take it
+        self._write_lock = threading.RLock()
+        # Guards the mutable buffer, which readers also search
+        self._buffer_lock = threading.Lock()
+
+        self._buffer = InMemoryDocumentStore()
+        self._buffer_deleted: set = set()
+        self._segments: Tuple[Segment, ...] = ()
+        self._next_segment = 1
+        # Manifest generation this view was loaded from (None until loaded)
+        self._generation: Optional[int] = None
+        self._version = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(os.path.join(directory, LOCK_FILE), "a")
+        self._lock_depth = 0
+        with self._directory_lock():
+            self._load_manifest()
+
+        self._stop = threading.Event()
+        self._merger = None
+        if merge_interval is not None:
+            self._merger = threading.Thread(target=self._merge_loop, args=(merge_interval,),
+                                            name="segment-merger", daemon=True)
+            self._merger.start()
+
+    # ----- Manifest -----
+
+    @contextlib.contextmanager
+    def _directory_lock(self):
+        """
+        Hold the write lock and the directory's lock file, which serializes
+        manifest changes across processes. Re-entrant within a thread.
+        """
+        with self._write_lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load_manifest(self) -> bool:
+        """
+        Adopt the manifest on disk if another process changed it since this
+        view was loaded or saved. Returns True if the view changed.
+        Callers hold the directory lock.
+        """
+        path = os.path.join(self.directory, MANIFEST)
+        if not os.path.exists(path):
+            return False
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        generation = manifest.get("generation", 0)
+        if generation == self._generation:
+            return False
+
+        opened = {s.name: s.index for s in self._segments if isinstance(s.index, MmapDocumentStore)}
+        with self._buffer_lock:
+            # Keep a segment this process is still writing, and keep hiding the
+            # on-disk copies of documents it has replaced but not flushed yet.
+            # A copy another process deleted meanwhile stays deleted.
+            frozen = tuple(s for s in self._segments if not isinstance(s.index, MmapDocumentStore))
+            replaced_ids = self._replaced_ids()
+            segments = []
+            for entry in manifest["segments"]:
+                index = opened.get(entry["name"]) or MmapDocumentStore(os.path.join(self.directory, entry["name"]))
+                deleted = frozenset(entry["deleted"])
+                doc_nums = (index.doc_number(doc_id) for doc_id in replaced_ids)
+                replaced = frozenset(n for n in doc_nums if n is not None and n not in deleted)
+                segments.append(Segment(entry["name"], index, deleted | replaced, replaced))
+            self._segments = tuple(segments) + frozen
+            self._version += 1
+        self._next_segment = manifest["next_segment"]
+        self._generation = generation
+        return True
+
+    def _save_manifest(self) -> None:
+        """
+        Write this view as the next manifest generation. Callers hold the
+        directory lock and have called _load_manifest() since taking it.
+        """
+        with self._buffer_lock:
+            # Copies whose replacement has been flushed are deleted for good
+            replaced_ids = self._replaced_ids()
+            self._segments = segments = tuple(
+                s._replace(replaced=frozenset(n for n in s.replaced if s.index.document(n)["id"] in replaced_ids))
+                for s in self._segments)
+        self._generation = (self._generation or 0) + 1
+        manifest = {
+            "generation": self._generation,
+            "next_segment": self._next_segment,
+            # A copy replaced by a document still in memory stays live on disk
+            # until the replacement is flushed, so a crash doesn't lose it
+            "segments": [{"name": s.name, "deleted": sorted(s.deleted - s.replaced)}
+                         for s in segments if isinstance(s.index, MmapDocumentStore)],
+        }
+        path = os.path.join(self.directory, MANIFEST)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _pending_ids(self) -> Set[str]:
+        # IDs whose newest copy is only in memory (the buffer or a segment
+        # being written). Callers hold the buffer lock.
+        ids = {self._buffer.document(n)["id"] for n in range(len(self._buffer)) if n not in self._buffer_deleted}
+        for segment in self._segments:
+            if not isinstance(segment.index, MmapDocumentStore):
+                ids.update(doc["id"] for doc in segment.live_documents())
+        return ids
+
+    def _replaced_ids(self) -> Set[str]:
+        # IDs with an on-disk copy hidden by a newer copy still in memory.
+        # Callers hold the buffer lock.
+        ids = {s.index.document(n)["id"] for s in self._segments for n in s.replaced}
+        return ids & self._pending_ids() if ids else ids
+
+    def refresh(self) -> bool:
+        """
+        Pick up segments and deletions committed by other processes.
+        Returns True if anything changed.
+        """
+        with self._directory_lock():
+            return self._load_manifest()
+
+    # ----- Reads -----
+
+    def _stats(self, segments: Tuple[Segment, ...], terms: Iterable[str]) -> CorpusStats:
+        # Like Lucene, document frequencies still count tombstoned documents
+        # until a merge drops them; the error is small and avoids rescans.
+        # Callers hold the buffer lock.
+        indexes = [s.index for s in segments] + [self._buffer]
+        n_live = sum(s.live_count for s in segments) + len(self._buffer) - len(self._buffer_deleted)
+        n_total = sum(len(index) for index in indexes)
+        total_length = sum(index.total_length() for index in indexes)
+        df = {term: sum(index.document_frequency(term) for index in indexes) for term in terms}
+        return CorpusStats(max(n_live, 1), total_length / n_total if n_total else 0.0, df)
+
+    def search(self, query: str, max_results: int = 5) -> List[Tuple[float, Dict[str, Any]]]:
+        # Snapshot the segment list together with the buffer, so a concurrent
+        # flush can't move documents out of view between the two
+        with self._buffer_lock:
+            segments = self._segments
+            stats = self._stats(segments, set(tokenize(query)))
+            candidates = [(score, self._buffer.document(doc_num))
+                          for score, doc_num in self._buffer.score(query, max_results, stats, self._buffer_deleted)]
+
+        for segment in segments:
+            for score, doc_num in segment.index.score(query, max_results, stats, segment.deleted):
+                candidates.append((score, (segment.index, doc_num)))
+
+        top = heapq.nlargest(max_results, candidates, key=lambda c: c[0])
+        return [(score, doc if isinstance(doc, dict) else doc[0].document(doc[1])) for score, doc in top]
+
+    def get(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        with self._buffer_lock:
+            segments = self._segments
+            doc_num = self._buffer.doc_number(doc_id)
+            if doc_num is not None and doc_num not in self._buffer_deleted:
+                return self._buffer.document(doc_num)
+
+        # Newest segment first; at most one copy of an ID is ever live
+        for segment in reversed(segments):
+            doc_num = segment.index.doc_number(doc_id)
+            if doc_num is not None and doc_num not in segment.deleted:
+                return segment.index.document(doc_num)
+        return None
+
+    def documents(self) -> Iterable[Dict[str, Any]]:
+        with self._buffer_lock:
+            segments = self._segments
+            buffered = [self._buffer.document(n) for n in range(len(self._buffer))
+                        if n not in self._buffer_deleted]
+        for segment in segments:
+            yield from segment.live_documents()
+        yield from buffered
+
+    def __len__(self) -> int:
+        with self._buffer_lock:
+            return sum(s.live_count for s in self._segments) + len(self._buffer) - len(self._buffer_deleted)
+
+    def snapshot(self) -> Tuple[List[Tuple[MmapDocumentStore, FrozenSet[str]]], List[Dict[str, Any]]]:
+        """
+        The corpus as segment files, each with the IDs deleted from it, plus
+        the live documents that are only in memory so far.
+
+        Segment files never change, so data derived from one (facts,
+        vectors) can be kept for as long as the file is in the snapshot.
+        """
+        with self._buffer_lock:
+            segments = self._segments
+            in_memory = [self._buffer.document(n) for n in range(len(self._buffer))
+                         if n not in self._buffer_deleted]
+        files = []
+        for segment in segments:
+            if isinstance(segment.index, MmapDocumentStore):
+                deleted = frozenset(segment.index.document(doc_num)["id"] for doc_num in segment.deleted)
+                files.append((segment.index, deleted))
+            else:
+                in_memory.extend(segment.live_documents())
+        return files, in_memory
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    # ----- Writes -----
+
+    def add_document(self, doc: Dict[str, Any]) -> None:
+        """
+        Add a document, replacing any live document with the same ID.
+        """
+        with self._write_lock:
+            # Tombstone and insert under one lock so readers never see the ID missing
+            with self._buffer_lock:
+                self._delete_live(doc["id"], replacing=True)
+                # A stale buffered copy stays tombstoned; the ID now maps to the new slot
+                self._buffer.add(doc)
+                self._version += 1
+            if len(self._buffer) >= self.flush_threshold:
+                self.flush()
+
+    def update_document(self, doc: Dict[str, Any]) -> None:
+        """
+        Replace an existing document.
+
+        Raises:
+            KeyError: If no live document has this ID
+        """
+        with self._write_lock:
+            if self.get(doc["id"]) is None:
+                raise KeyError(doc["id"])
+            self.add_document(doc)
+
+    def delete_document(self, doc_id: str) -> bool:
+        """
+        Delete a document by ID. Returns False if it did not exist.
+
+        The deletion is written to the manifest straight away, so other
+        processes see it once they refresh.
+        """
+        with self._directory_lock():
+            self._load_manifest()
+            with self._buffer_lock:
+                deleted = self._delete_live(doc_id)
+                if deleted:
+                    self._version += 1
+            if deleted:
+                self._save_manifest()
+            return deleted
+
+    def _delete_live(self, doc_id: str, replacing: bool = False) -> bool:
+        # Callers hold both locks. A copy hidden for a replacement is recorded
+        # in Segment.replaced; an explicit delete also makes the on-disk copies
+        # an earlier replacement hid deleted for good.
+        segments = list(self._segments)
+        if not replacing:
+            for i, segment in enumerate(segments):
+                doc_num = segment.index.doc_number(doc_id)
+                if doc_num in segment.replaced:
+                    segments[i] = segment._replace(replaced=segment.replaced - {doc_num})
+            self._segments = tuple(segments)
+
+        doc_num = self._buffer.doc_number(doc_id)
+        if doc_num is not None and doc_num not in self._buffer_deleted:
+            self._buffer_deleted.add(doc_num)
+            return True
+
+        for i in range(len(segments) - 1, -1, -1):
+            segment = segments[i]
+            doc_num = segment.index.doc_number(doc_id)
+            if doc_num is not None and doc_num not in segment.deleted:
+                replaced = segment.replaced
+                if replacing and isinstance(segment.index, MmapDocumentStore):
+                    replaced = replaced | {doc_num}
+                segments[i] = segment._replace(deleted=segment.deleted | {doc_num}, replaced=replaced)
+                self._segments = tuple(segments)
+                return True
+        return False
+
+    def flush(self) -> None:
+        """
+        Write the buffered documents out as a new segment file.
+        """
+        with self._directory_lock():
+            with self._buffer_lock:
+                if len(self._buffer) == len(self._buffer_deleted):
+                    self._buffer, self._buffer_deleted = InMemoryDocumentStore(), set()
+                    return
+            # Another process may have added segments since this view was loaded
+            self._load_manifest()
+            with self._buffer_lock:
+                # Freeze the buffer as an in-memory segment so queries still
+                # see its documents while the file is being written
+                name = f"seg_{self._next_segment:06d}.idx"
+                self._next_segment += 1
+                frozen = Segment(name, self._buffer, frozenset(self._buffer_deleted))
+                self._segments = self._segments + (frozen,)
+                self._buffer, self._buffer_deleted = InMemoryDocumentStore(), set()
+
+            path = os.path.join(self.directory, name)
+            write_index(frozen.live_documents(), path)
+            on_disk = Segment(name, MmapDocumentStore(path))
+            self._segments = tuple(on_disk if s.name == name else s for s in self._segments)
+            self._save_manifest()
+
+    def commit(self) -> None:
+        """
+        Flush the buffer so the directory reflects every change. Deletions
+        are already persisted by delete_document().
+        """
+        self.flush()
+
+    # ----- Merging -----
+
+    def maybe_merge(self) -> bool:
+        """
+        Merge the smallest segments into one if there are too many.
+        Returns True if a merge happened.
+        """
+        with self._directory_lock():
+            self._load_manifest()
+            segments = [s for s in self._segments if isinstance(s.index, MmapDocumentStore)]
+            if len(segments) <= self.merge_factor:
+                return False
+            chosen = sorted(segments, key=lambda s: s.live_count)[:self.merge_factor]
+            # Only documents deleted on disk are dropped; copies replaced by
+            # documents still in memory are kept, and stay hidden below
+            dropped = {s.name: s.deleted - s.replaced for s in chosen}
+            # Reserve the name in the manifest so no other process reuses it
+            name = f"seg_{self._next_segment:06d}.idx"
+            self._next_segment += 1
+            self._save_manifest()
+
+        # The expensive part runs without any lock held
+        path = os.path.join(self.directory, name)
+        docs = (segment.index.document(doc_num) for segment in chosen
+                for doc_num in range(len(segment.index)) if doc_num not in dropped[segment.name])
+        write_index(docs, path)
+        merged = MmapDocumentStore(path)
+
+        with self._directory_lock():
+            self._load_manifest()
+            current = {s.name: s for s in self._segments}
+            if any(segment.name not in current for segment in chosen):
+                # Another process merged some of these segments first
+                os.remove(path)
+                return False
+
+            # Carry over deletions that happened while the merge was running,
+            # and hide copies superseded by documents still in memory
+            deleted, replaced = set(), set()
+            for segment in chosen:
+                latest = current[segment.name]
+                for doc_num in latest.deleted - dropped[segment.name]:
+                    doc_id = segment.index.document(doc_num)["id"]
+                    new_num = merged.doc_number(doc_id)
+                    if new_num is not None:
+                        deleted.add(new_num)
+                        if doc_num in latest.replaced:
+                            replaced.add(new_num)
+
+            chosen_names = {s.name for s in chosen}
+            with self._buffer_lock:
+                remaining = [s for s in self._segments if s.name not in chosen_names]
+                self._segments = (Segment(name, merged, frozenset(deleted), frozenset(replaced)),) + tuple(remaining)
+            self._save_manifest()
+
+        # Open snapshots may still read the old files; on POSIX unlinking is
+        # safe, elsewhere the files are left for a later cleanup. Sidecars
+        # derived from a segment ({name}.facts.json, ...) go with it.
+        for segment in chosen:
+            old_path = os.path.join(self.directory, segment.name)
+            for filename in [old_path] + glob.glob(glob.escape(old_path) + ".*"):
+                try:
+                    os.remove(filename)
+                except OSError:
+                    pass
+        return True
+
+    def _merge_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+                while self.maybe_merge():
+                    pass
+            except Exception as e:
+                print(f"[INDEX] background merge failed: {e}")
+
+    def close(self) -> None:
+        """
+        Stop the merge thread and commit outstanding changes.
+        """
+        self._stop.set()
+        if self._merger is not None:
+            self._merger.join()
+        self.commit()
+        self._lock_file.close()
+
+
+# ----- Per-Segment Data -----
+
+T = TypeVar("T")
+
+
+def segment_cache(store: SegmentedDocumentStore, cache: Dict[str, T],
+                  load: Callable[[MmapDocumentStore], Optional[T]],
+                  build: Callable[[Iterable[Dict[str, Any]]], T],
+                  combine: Callable[[List[Tuple[T, FrozenSet[str]]]], Any]) -> Any:
+    """
+    Combine data derived per segment file (facts, vectors) for a snapshot
+    of the store.
+
+    Each segment's part comes from `cache` (keyed by path; a segment file
+    never changes), else from load() (e.g. a sidecar; None if missing or
+    stale), else from build() over its documents. The documents only in
+    memory get a freshly built part. combine() receives (part, deleted IDs)
+    pairs. Callers serialize calls that share a cache.
+    """
+    files, in_memory = store.snapshot()
+    parts = []
+    for index, deleted in files:
+        part = cache.get(index.path)
+        if part is None:
+            part = load(index)
+            if part is None:
+                part = build(index.documents())
+            cache[index.path] = part
+        parts.append((part, deleted))
+    # Only the documents not yet flushed to a segment are processed again
+    parts.append((build(in_memory), frozenset()))
+
+    # Forget segments that were merged away
+    current = {index.path for index, _ in files}
+    for path in [path for path in cache if path not in current]:
+        del cache[path]
+    return combine(parts)
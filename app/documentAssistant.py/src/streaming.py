@@ -0,0 +1,114 @@
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+# ----- Streaming -----
+#
+# Runs the graph with LangGraph's "updates", "messages" and "values" stream
+# modes and turns them into a few simple events:
+#
+#   {"event": "node",  "node": "triage_agent", "seconds": 0.41}
+#   {"event": "token", "node": "qa_agent", "text": "Machine "}
+#   {"event": "done",  "state": {...}, "ttft_seconds": 0.93, "total_seconds": 1.80}
+#
+# Tokens come from the specialist's final answer only; triage output and
+# tool-calling turns carry no answer text. If the answer never streamed
+# (a cached answer, or a model that doesn't stream), it is sent as a
+# single token event before "done".
+
+# Nodes whose LLM output is the user-facing answer
+ANSWER_NODES = frozenset({"qa_agent", "summarisation_agent", "calculation_agent"})
+
+STREAM_MODES = ["updates", "messages", "values"]
+
+
+class _Timer:
+    """Time to first token and total latency for one streamed run."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_token: Optional[float] = None
+        self.state: Dict[str, Any] = {}
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def handle(self, mode: str, payload: Any) -> Iterator[Dict[str, Any]]:
+        if mode == "updates":
+            for node in payload:
+                yield {"event": "node", "node": node, "seconds": round(self.elapsed(), 6)}
+        elif mode == "messages":
+            chunk, metadata = payload
+            node = metadata.get("langgraph_node")
+            text = chunk.content if isinstance(chunk.content, str) else ""
+            if node in ANSWER_NODES and text:
+                if self.first_token is None:
+                    self.first_token = self.elapsed()
+                yield {"event": "token", "node": node, "text": text}
+        elif mode == "values":
+            self.state = payload
+
+    def done(self) -> Iterator[Dict[str, Any]]:
+        response = self.state.get("current_response")
+        if self.first_token is None and response is not None:
+            self.first_token = self.elapsed()
+            yield {"event": "token", "node": None, "text": response.answer}
+        total = self.elapsed()
+        yield {
+            "event": "done",
+            "state": self.state,
+            "ttft_seconds": round(self.first_token if self.first_token is not None else total, 6),
+            "total_seconds": round(total, 6),
+        }
+
+
+def _graph(workflow):
+    # Stream from the compiled graph; a CachedWorkflow wrapper is bypassed,
+    # although the specialists' node-level response cache still applies
+    return getattr(workflow, "graph", workflow)
+
+
+def stream_answer(workflow, input, config) -> Iterator[Dict[str, Any]]:
+    """
+    Run the graph and yield node, token and done events as they happen.
+    """
+    timer = _Timer()
+    for mode, payload in _graph(workflow).stream(input, config, stream_mode=STREAM_MODES):
+        yield from timer.handle(mode, payload)
+    yield from timer.done()
+
+
+async def astream_answer(workflow, input, config) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Async version of stream_answer, for use on an event loop.
+    """
+    timer = _Timer()
+    async for mode, payload in _graph(workflow).astream(input, config, stream_mode=STREAM_MODES):
+        for event in timer.handle(mode, payload):
+            yield event
+    for event in timer.done():
+        yield event
+
+
+def print_stream(events: Iterator[Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Print tokens as they arrive and node transitions on their own lines.
+    Returns the final state and the done event.
+    """
+    answering = False
+    done: Dict[str, Any] = {}
+    for event in events:
+        if event["event"] == "token":
+            if not answering:
+                print("Response: ", end="", flush=True)
+                answering = True
+            print(event["text"], end="", flush=True)
+        elif event["event"] == "node":
+            if answering:
+                print()
+                answering = False
+            print(f"[{event['seconds']:.2f}s] {event['node']} done")
+        else:
+            done = event
+    if answering:
+        print()
+    return done.get("state", {}), done
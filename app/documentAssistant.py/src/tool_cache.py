@@ -0,0 +1,145 @@
+import copy
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from document_store import get_document_store
+
+# ----- Tool Result Cache -----
+#
+# The agents often repeat a tool call with the same arguments, both within
+# one tool loop and across turns. memoize_tool caches a tool function's
+# results, keyed by tool name and canonical arguments (bound to the
+# function's signature with defaults applied, so retrieve_documents("x") and
+# retrieve_documents("x", max_results=5) share an entry).
+#
+# Every entry records the document store and corpus version it was computed
+# against. An entry from another store or an older version counts as a miss.
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 300.0
+
+
+def _corpus_version() -> Tuple[int, int]:
+    store = get_document_store()
+    return id(store), store.version
+
+
+class ToolResultCache:
+    """
+    LRU of tool results with a TTL per entry and hit/miss counters per tool.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[int, int], Any]]" = OrderedDict()
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(tool_name: str, args: Dict[str, Any]) -> str:
+        return json.dumps([tool_name, args], sort_keys=True, default=str)
+
+    def get(self, tool_name: str, args: Dict[str, Any], version: Tuple[int, int]) -> Tuple[bool, Any]:
+        """
+        Return (True, result) on a hit and (False, None) on a miss.
+        """
+        key = self.key(tool_name, args)
+        with self._lock:
+            counters = self._counters.setdefault(tool_name, {"hits": 0, "misses": 0})
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic() or entry[1] != version:
+                if entry is not None:
+                    del self._entries[key]
+                counters["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            counters["hits"] += 1
+            result = entry[2]
+        # Callers get their own copy, so mutating a result can't poison the cache
+        return True, copy.deepcopy(result)
+
+    def put(self, tool_name: str, args: Dict[str, Any], version: Tuple[int, int],
+            result: Any, ttl: float) -> None:
+        key = self.key(tool_name, args)
+        entry = (time.monotonic() + ttl, version, copy.deepcopy(result))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Entry count plus hits, misses and hit rate per tool and overall.
+        """
+        with self._lock:
+            per_tool = {name: dict(c) for name, c in self._counters.items()}
+            entries = len(self._entries)
+        for counters in per_tool.values():
+            total = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = counters["hits"] / total if total else 0.0
+        hits = sum(c["hits"] for c in per_tool.values())
+        misses = sum(c["misses"] for c in per_tool.values())
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "tools": per_tool,
+        }
+
+
+# Process-wide cache shared by every memoized tool
+tool_cache = ToolResultCache()
+
+
+def memoize_tool(ttl: float = DEFAULT_TTL_SECONDS, cache: Optional[ToolResultCache] = None,
+                 depends_on_corpus: bool = True) -> Callable:
+    """
+    Decorator that caches a tool function's results. Apply it below @tool
+    so LangChain still sees the original signature and docstring:
+
+        @tool
+        @memoize_tool(ttl=300)
+        def retrieve_documents(query: str, max_results: int = 5): ...
+
+    Args:
+        ttl: Seconds a result stays valid for this tool
+        cache: Cache to use (defaults to the shared tool_cache)
+        depends_on_corpus: Invalidate results when the corpus version changes
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+        name = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            target = cache or tool_cache
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = dict(bound.arguments)
+            version = _corpus_version() if depends_on_corpus else (0, 0)
+
+            hit, result = target.get(name, arguments, version)
+            if hit:
+                print(f"[TOOL] {name}: cache hit for {arguments}")
+                return result
+
+            result = func(*args, **kwargs)
+            target.put(name, arguments, version, result, ttl)
+            return result
+
+        return wrapper
+
+    return decorator
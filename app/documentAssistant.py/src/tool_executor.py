@@ -0,0 +1,153 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, List, Dict, Any, Mapping, Optional
+
+from langchain_core.tools import BaseTool
+
+# Default cap on tool calls run at the same time within one LLM turn.
+# Override per request with config["configurable"]["max_tool_concurrency"].
+DEFAULT_MAX_TOOL_CONCURRENCY = 4
+
+
+def max_tool_concurrency(config) -> int:
+    return config["configurable"].get("max_tool_concurrency", DEFAULT_MAX_TOOL_CONCURRENCY)
+
+
+# Event loop on its own thread that sync callers await async tools on, so
+# no loop is started per call and callers that are already inside a running
+# loop (a sync node under an async host) work too
+_tool_loop: Optional[asyncio.AbstractEventLoop] = None
+_tool_loop_lock = threading.Lock()
+
+
+def _get_tool_loop() -> asyncio.AbstractEventLoop:
+    global _tool_loop
+    if _tool_loop is None:
+        with _tool_loop_lock:
+            if _tool_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="tool-loop", daemon=True).start()
+                _tool_loop = loop
+    return _tool_loop
+
+
+def _run_on_tool_loop(coro: Awaitable[Any]) -> Future:
+    """Schedule coro on the tool loop, in a copy of the caller's context."""
+    loop = _get_tool_loop()
+    result: Future = Future()
+
+    def done(task: asyncio.Task) -> None:
+        if task.cancelled():
+            result.cancel()
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    def start() -> None:
+        loop.create_task(coro).add_done_callback(done)
+
+    loop.call_soon_threadsafe(start, context=contextvars.copy_context())
+    return result
+
+
+def _is_async(tool: BaseTool) -> bool:
+    return getattr(tool, "coroutine", None) is not None
+
+
+def _run_sync(tool: BaseTool, args: Dict[str, Any]) -> Any:
+    try:
+        return tool.invoke(args)
+    except Exception as e:
+        print(f"[TOOL] {tool.name} error: {e}")
+        return {"error": f"{tool.name} failed: {e}"}
+
+
+async def _run_async(tool: BaseTool, args: Dict[str, Any], limit: asyncio.Semaphore) -> Any:
+    async with limit:
+        try:
+            return await tool.ainvoke(args)
+        except Exception as e:
+            print(f"[TOOL] {tool.name} error: {e}")
+            return {"error": f"{tool.name} failed: {e}"}
+
+
+def execute_tool_calls(tool_calls: List[Dict[str, Any]], tools_by_name: Mapping[str, BaseTool],
+                       max_concurrency: int = DEFAULT_MAX_TOOL_CONCURRENCY) -> List[Any]:
+    """
+    Run the tool calls from one LLM turn concurrently.
+
+    Sync tools run on a thread pool and async tools (those with a coroutine)
+    are awaited together with asyncio.gather on a shared event loop thread,
+    so this also works when called from inside a running loop. At most
+    max_concurrency calls of each kind run at once. A failing or unknown tool
+    yields an error dict instead of aborting the other calls.
+
+    Returns:
+        One result per tool call, in the same order as tool_calls
+    """
+    results: List[Any] = [None] * len(tool_calls)
+    sync_jobs = []
+    async_jobs = []
+
+    for position, tool_call in enumerate(tool_calls):
+        tool = tools_by_name.get(tool_call["name"])
+        if tool is None:
+            results[position] = {"error": f"Unknown tool: {tool_call['name']}"}
+        elif _is_async(tool):
+            async_jobs.append((position, tool, tool_call["args"]))
+        else:
+            sync_jobs.append((position, tool, tool_call["args"]))
+
+    limit = max(1, max_concurrency)
+
+    # A lone sync call runs inline; thread pool start-up would only add latency
+    if len(sync_jobs) == 1 and not async_jobs:
+        position, tool, args = sync_jobs[0]
+        results[position] = _run_sync(tool, args)
+        return results
+
+    pool = ThreadPoolExecutor(max_workers=min(limit, len(sync_jobs))) if sync_jobs else None
+    try:
+        # Sync and async calls overlap. Each runs in a copy of the caller's
+        # context, so callbacks (tracing, node instrumentation) see the tool
+        # call as part of the current node.
+        futures = [(position, pool.submit(contextvars.copy_context().run, _run_sync, tool, args))
+                   for position, tool, args in sync_jobs]
+
+        if async_jobs:
+            async def gather():
+                semaphore = asyncio.Semaphore(limit)
+                return await asyncio.gather(*(_run_async(tool, args, semaphore)
+                                              for _, tool, args in async_jobs))
+            for (position, _, _), output in zip(async_jobs, _run_on_tool_loop(gather()).result()):
+                results[position] = output
+
+        for position, future in futures:
+            results[position] = future.result()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    return results
+
+
+async def aexecute_tool_calls(tool_calls: List[Dict[str, Any]], tools_by_name: Mapping[str, BaseTool],
+                              max_concurrency: int = DEFAULT_MAX_TOOL_CONCURRENCY) -> List[Any]:
+    """
+    Async counterpart of execute_tool_calls for use on an event loop.
+
+    Every call goes through tool.ainvoke, which awaits async tools directly
+    and runs sync tools in the default executor, so the loop is never blocked.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(tool_call: Dict[str, Any]) -> Any:
+        tool = tools_by_name.get(tool_call["name"])
+        if tool is None:
+            return {"error": f"Unknown tool: {tool_call['name']}"}
+        return await _run_async(tool, tool_call["args"], semaphore)
+
+    return list(await asyncio.gather(*(run(tool_call) for tool_call in tool_calls)))
@@ -0,0 +1,252 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from langchain_core.tools import BaseTool
+
+from schemas import AgentState, AnswerResponse
+from prompts import get_chat_prompt_template
+from tool_executor import execute_tool_calls, aexecute_tool_calls, max_tool_concurrency
+from runnable_registry import get_bound_llm
+from response_cache import ResponseCache, resolve_response_cache
+from memory import ConversationMemory
+from compaction import ToolResultCompactor, DEFAULT_TOOL_TOKEN_BUDGET
+from json_logger import log
+
+
+# ----- Result Collectors -----
+
+# How each tool's result contributes to the retrieved documents used for sources
+DOCUMENT_COLLECTORS: Dict[str, Callable[[List[Dict[str, Any]], Any], None]] = {
+    "retrieve_documents": lambda docs, result: docs.extend(result) if isinstance(result, list) else None,
+    "search_specific_document": lambda docs, result: docs.append(result) if isinstance(result, dict) else None,
+}
+
+
+# ----- Tool Loop -----
+
+@dataclass(frozen=True)
+class AgentSpec:
+    """
+    Everything that differs between the specialist agents.
+
+    Args:
+        name: Node name recorded in actions_taken
+        prompt_type: Key passed to get_chat_prompt_template
+        tools: Tools this agent may call
+        confidence: Confidence reported on a successful answer
+        failure_message: Answer used when the iteration limit is reached
+        max_iterations: LLM round-trips allowed per turn
+        max_tool_concurrency: Per-agent cap on parallel tool calls
+            (falls back to config["configurable"]["max_tool_concurrency"])
+    """
+    name: str
+    prompt_type: str
+    tools: Tuple[BaseTool, ...]
+    confidence: float
+    failure_message: str
+    max_iterations: int = 5
+    max_tool_concurrency: Optional[int] = None
+
+
+class _Turn:
+    """Mutable bookkeeping for one run of the loop."""
+
+    def __init__(self, spec: AgentSpec, state: AgentState, history: str = "",
+                 tool_token_budget: int = DEFAULT_TOOL_TOKEN_BUDGET):
+        self.spec = spec
+        self.state = state
+        self.compactor = ToolResultCompactor(tool_token_budget)
+        self.messages = [{"role": "system", "content": get_chat_prompt_template(spec.prompt_type)}]
+        if history:
+            # Summary and recent turns, already trimmed to the memory token budget
+            self.messages.append({"role": "system", "content": f"Conversation so far:\n{history}"})
+        self.messages.append({"role": "user", "content": state.user_input})
+        self.tools_used: List[str] = []
+        self.retrieved_docs: List[Dict[str, Any]] = []
+        self.timings: List[Dict[str, Any]] = []
+
+    def record(self, iteration: int, tool_calls: List[Dict[str, Any]], results: List[Any],
+               llm_seconds: float, tool_seconds: float) -> None:
+        saved_before = self.compactor.tokens_saved
+        contents = self.compactor.compact(results)
+        for tool_call, tool_result, content in zip(tool_calls, results, contents):
+            tool_name = tool_call['name']
+            collect = DOCUMENT_COLLECTORS.get(tool_name)
+            if collect is not None:
+                collect(self.retrieved_docs, tool_result)
+
+            self.tools_used.append(tool_name)
+            self.messages.append({
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [tool_call]
+            })
+            self.messages.append({
+                "role": "tool",
+                "content": content,
+                "tool_call_id": tool_call.get('id', 'unknown')
+            })
+
+        self.timings.append({
+            "agent": self.spec.name,
+            "iteration": iteration,
+            "llm_seconds": round(llm_seconds, 6),
+            "tool_seconds": round(tool_seconds, 6),
+            "tool_calls": [call['name'] for call in tool_calls],
+            "tool_tokens_saved": self.compactor.tokens_saved - saved_before,
+        })
+
+    def log_compaction(self) -> None:
+        if self.compactor.tokens_before:
+            log("Tool results compacted", agent=self.spec.name, session_id=self.state.session_id,
+                **self.compactor.stats())
+
+    def finish(self, iteration: int, response, llm_seconds: float) -> Dict[str, Any]:
+        self.log_compaction()
+        self.timings.append({
+            "agent": self.spec.name,
+            "iteration": iteration,
+            "llm_seconds": round(llm_seconds, 6),
+            "tool_seconds": 0.0,
+            "tool_calls": [],
+        })
+        final_answer = response.content if hasattr(response, 'content') else str(response)
+
+        sources = list(set([doc.get('id', doc.get('document_id', 'unknown'))
+                            for doc in self.retrieved_docs]))
+
+        return {
+            "messages": self.state.messages + [self.state.user_input, final_answer],
+            "current_response": AnswerResponse(
+                question=self.state.user_input,
+                answer=final_answer,
+                sources=sources,
+                confidence=self.spec.confidence,
+                timestamp=datetime.now(),
+                retrieved_documents=self.retrieved_docs
+            ),
+            "tools_used": self.state.tools_used + self.tools_used,
+            "iteration_timings": self.timings,
+            "actions_taken": [self.spec.name]
+        }
+
+    def reuse(self, response: AnswerResponse, tools_used: List[str]) -> Dict[str, Any]:
+        return {
+            "messages": self.state.messages + [self.state.user_input, response.answer],
+            "current_response": response,
+            "tools_used": self.state.tools_used + tools_used,
+            "iteration_timings": [],
+            "actions_taken": [self.spec.name]
+        }
+
+    def give_up(self) -> Dict[str, Any]:
+        self.log_compaction()
+        return {
+            "current_response": AnswerResponse(
+                question=self.state.user_input,
+                answer=self.spec.failure_message,
+                sources=[],
+                confidence=0.0,
+                timestamp=datetime.now()
+            ),
+            "tools_used": self.state.tools_used + self.tools_used,
+            "iteration_timings": self.timings,
+            "actions_taken": [self.spec.name]
+        }
+
+
+def _intent_type(state: AgentState) -> Optional[str]:
+    return state.intent.intent_type if state.intent else None
+
+
+class ToolLoop:
+    """
+    The iterate / dispatch / append loop shared by every specialist agent.
+
+    Each iteration asks the tool-bound LLM (prepared once by the runnable
+    registry) for a response. Tool calls are
+    dispatched by name through a dict and run concurrently, and their
+    results are appended to the conversation. The first response without
+    tool calls becomes the answer. Sync (run) and async (arun) versions
+    share all bookkeeping.
+
+    When a response cache is configured, a first-turn answer for the same
+    input and intent is reused instead of running the loop.
+    """
+
+    def __init__(self, spec: AgentSpec):
+        self.spec = spec
+        self.tools_by_name: Dict[str, BaseTool] = {t.name: t for t in spec.tools}
+
+    def _concurrency(self, config) -> int:
+        if self.spec.max_tool_concurrency is not None:
+            return self.spec.max_tool_concurrency
+        return max_tool_concurrency(config)
+
+    def _turn(self, state: AgentState, config) -> _Turn:
+        configurable = config["configurable"]
+        return _Turn(self.spec, state, ConversationMemory.from_config(config).render(state),
+                     configurable.get("tool_token_budget", DEFAULT_TOOL_TOKEN_BUDGET))
+
+    def _cached(self, turn: _Turn, config) -> Tuple[Optional[ResponseCache], Optional[Dict[str, Any]]]:
+        cache = resolve_response_cache(config)
+        if cache is None:
+            return None, None
+        hit = cache.lookup(self.spec.name, turn.state, _intent_type(turn.state))
+        return cache, turn.reuse(hit.response, hit.tools_used) if hit else None
+
+    def _remember(self, cache: Optional[ResponseCache], turn: _Turn, result: Dict[str, Any]) -> Dict[str, Any]:
+        if cache is not None:
+            cache.remember(self.spec.name, turn.state, result["current_response"],
+                           intent=_intent_type(turn.state), tools_used=turn.tools_used)
+        return result
+
+    def run(self, state: AgentState, config) -> Dict[str, Any]:
+        concurrency = self._concurrency(config)
+        turn = self._turn(state, config)
+        cache, cached = self._cached(turn, config)
+        if cached is not None:
+            return cached
+
+        # Bound after the cache check, so a cached answer never needs the model
+        llm_with_tools = get_bound_llm(config["configurable"]["llm"], self.spec.tools)
+
+        for i in range(self.spec.max_iterations):
+            start = time.perf_counter()
+            response = llm_with_tools.invoke(turn.messages)
+            llm_seconds = time.perf_counter() - start
+
+            if not getattr(response, 'tool_calls', None):
+                return self._remember(cache, turn, turn.finish(i, response, llm_seconds))
+
+            start = time.perf_counter()
+            results = execute_tool_calls(response.tool_calls, self.tools_by_name, concurrency)
+            turn.record(i, response.tool_calls, results, llm_seconds, time.perf_counter() - start)
+
+        return turn.give_up()
+
+    async def arun(self, state: AgentState, config) -> Dict[str, Any]:
+        concurrency = self._concurrency(config)
+        turn = self._turn(state, config)
+        cache, cached = self._cached(turn, config)
+        if cached is not None:
+            return cached
+
+        # Bound after the cache check, so a cached answer never needs the model
+        llm_with_tools = get_bound_llm(config["configurable"]["llm"], self.spec.tools)
+
+        for i in range(self.spec.max_iterations):
+            start = time.perf_counter()
+            response = await llm_with_tools.ainvoke(turn.messages)
+            llm_seconds = time.perf_counter() - start
+
+            if not getattr(response, 'tool_calls', None):
+                return self._remember(cache, turn, turn.finish(i, response, llm_seconds))
+
+            start = time.perf_counter()
+            results = await aexecute_tool_calls(response.tool_calls, self.tools_by_name, concurrency)
+            turn.record(i, response.tool_calls, results, llm_seconds, time.perf_counter() - start)
+
+        return turn.give_up()
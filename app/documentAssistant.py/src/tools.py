@@ -1,115 +1,102 @@
 from langchain_core.tools import tool
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional
 import json
+import math
+
+from document_store import DocumentStore, get_document_store
+from passages import search_passages
+from tool_cache import memoize_tool
+from calculator import CalculationError, evaluate, evaluate_batch
+from facts import AGGREGATES, aggregate as aggregate_facts, asks_for_total, get_fact_table, is_total
+
+# Facts listed in a query_facts result; aggregates always use every match
+MAX_FACT_ROWS = 20
 
 
 @tool
-def retrieve_documents(query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+@memoize_tool(ttl=300)
+def retrieve_documents(query: str, max_results: int = 5,
+                       mode: Literal["keyword", "dense", "hybrid"] = "keyword") -> List[Dict[str, Any]]:
     """
     Retrieve documents based on a search query or document ID.
 
     Args:
         query: The search query or document ID (e.g., "doc_1", "machine learning", "visualization")
         max_results: Maximum number of documents to return
+        mode: "keyword" for BM25, "dense" for embedding similarity, or "hybrid"
+              to fuse both rankings (useful when the wording may differ from the documents)
 
     Returns:
         List of documents with id, content, and metadata
     """
-    # Enhanced mock documents database
-    mock_documents = [
-        {
-            "id": "doc_1",
-            "content": "Data visualization is the graphical representation of information and data. By using visual elements like charts, graphs, and maps, data visualization tools provide an accessible way to see and understand trends, outliers, and patterns in data. In the world of Big Data, data visualization tools and technologies are essential to analyze massive amounts of information and make data-driven decisions.",
-            "title": "Introduction to Data Visualization",
-            "source": "data_viz_guide.pdf"
-        },
-        {
-            "id": "doc_2",
-            "content": "Effective data visualization helps in understanding complex datasets by presenting information in a visual context. Key principles include choosing the right chart type, using appropriate colors, maintaining simplicity, and ensuring accessibility. Common visualization types include bar charts, line graphs, scatter plots, heat maps, and tree maps.",
-            "title": "Best Practices in Data Visualization",
-            "source": "viz_best_practices.pdf"
-        },
-        {
-            "id": "doc_3",
-            "content": "Machine learning is a subset of artificial intelligence that enables systems to learn and improve from experience without being explicitly programmed. It focuses on developing computer programs that can access data and use it to learn for themselves.",
-            "title": "Introduction to Machine Learning",
-            "source": "ml_basics.pdf"
-        },
-        {
-            "id": "doc_4",
-            "content": "Python data visualization libraries include Matplotlib for basic plotting, Seaborn for statistical visualizations, Plotly for interactive charts, and Bokeh for web-based visualizations. Each library has its strengths and use cases depending on the project requirements.",
-            "title": "Python Visualization Libraries",
-            "source": "python_viz.pdf"
-        },
-        {
-            "id": "doc_5",
-            "content": "The quarterly revenue for Q1 was $1,250,000, Q2 was $1,450,000, Q3 was $1,680,000, and Q4 was $1,920,000. Total annual revenue reached $6,300,000 representing a 15% year-over-year growth.",
-            "title": "2024 Financial Report",
-            "source": "finance_2024.pdf"
-        }
-    ]
-
-    # Improved keyword matching - case insensitive and handles partial matches
+    store = get_document_store()
     query_lower = query.lower()
-    query_words = query_lower.split()
 
     # Check if query is a specific document ID
     if query_lower.startswith("doc_") or query_lower.startswith("document_"):
         doc_id = query_lower.replace("document_", "doc_")
-        matching_docs = [doc for doc in mock_documents if doc["id"] == doc_id]
-        if matching_docs:
+        doc = store.get(doc_id)
+        if doc is not None:
             print(f"[TOOL] retrieve_documents: Found document by ID '{doc_id}'")
-            return matching_docs
+            return [doc]
 
-    # Score each document based on relevance
-    scored_docs = []
-    for doc in mock_documents:
-        score = 0
-        doc_text = (doc["content"] + " " + doc["title"] + " " + doc["id"]).lower()
+    if mode == "keyword":
+        # BM25 ranking over the shared inverted index
+        relevant_docs = [doc for score, doc in store.search(query, max_results)]
+    else:
+        relevant_docs = _dense_or_hybrid_search(store, query, max_results, mode)
 
-        # Check for exact phrase match (higher score)
-        if query_lower in doc_text:
-            score += 10
+    print(f"[TOOL] retrieve_documents called with query='{query}', mode='{mode}', found {len(relevant_docs)} documents")
 
-        # Check for individual word matches
-        for word in query_words:
-            if len(word) > 2:  # Ignore very short words
-                if word in doc_text:
-                    score += 1
+    return relevant_docs
 
-        if score > 0:
-            scored_docs.append((score, doc))
 
-    # Sort by relevance score (descending)
-    scored_docs.sort(reverse=True, key=lambda x: x[0])
+def _dense_or_hybrid_search(store: DocumentStore, query: str, max_results: int, mode: str) -> List[Dict[str, Any]]:
+    from vector_index import get_dense_index, get_embedder, reciprocal_rank_fusion
 
-    # Return top results
-    relevant_docs = [doc for score, doc in scored_docs[:max_results]]
+    # Rank deeper than max_results so fusion has candidates to reorder
+    depth = max(max_results * 4, 20)
+    query_vector = get_embedder().embed([query])[0]
+    dense_ids = [doc_id for score, doc_id in get_dense_index(store).search(query_vector, depth)]
 
-    print(f"[TOOL] retrieve_documents called with query='{query}', found {len(relevant_docs)} documents")
+    if mode == "dense":
+        ranked_ids = dense_ids[:max_results]
+    else:
+        keyword_ids = [doc["id"] for score, doc in store.search(query, depth)]
+        fused = reciprocal_rank_fusion([keyword_ids, dense_ids])
+        ranked_ids = [doc_id for score, doc_id in fused[:max_results]]
 
-    return relevant_docs
+    docs = (store.get(doc_id) for doc_id in ranked_ids)
+    return [doc for doc in docs if doc is not None]
 
 
 @tool
-def search_specific_document(document_id: str, query: str) -> Dict[str, Any]:
+@memoize_tool(ttl=600)
+def search_specific_document(document_id: str, query: str, max_passages: int = 3) -> Dict[str, Any]:
     """
     Search for specific information within a particular document.
 
     Args:
         document_id: The ID of the document to search
         query: What to search for within the document
+        max_passages: Maximum number of passages to return
 
     Returns:
-        Document section matching the query
+        The best-matching passages of the document with their byte offsets
     """
-    # Mock implementation - in production, this would search within the actual document
-    print(f"[TOOL] search_specific_document called for doc_id='{document_id}', query='{query}'")
+    store = get_document_store()
+    passages = search_passages(store, document_id, query, max_passages)
+
+    if passages is None:
+        print(f"[TOOL] search_specific_document: document '{document_id}' not found")
+        return {"document_id": document_id, "error": f"Document {document_id} not found"}
+
+    print(f"[TOOL] search_specific_document called for doc_id='{document_id}', query='{query}', "
+          f"found {len(passages)} passages")
 
     return {
         "document_id": document_id,
-        "matching_section": f"Found relevant content for '{query}' in document {document_id}. This section discusses {query} in detail with specific examples and technical explanations.",
-        "confidence": 0.85
+        "passages": passages,
     }
 
 
@@ -119,17 +106,87 @@ def calculate(expression: str) -> float | str:
     Perform mathematical calculations.
 
     Args:
-        expression: Mathematical expression to evaluate (e.g., "2 + 2", "10 * 5", "1250000 + 1450000 + 1680000 + 1920000")
+        expression: Mathematical expression to evaluate (e.g., "2 + 2", "10 * 5", "1250000 + 1450000 + 1680000 + 1920000").
+            Supports + - * / // % **, parentheses and abs, round, min, max, sqrt, log, exp, floor, ceil
 
     Returns:
         The calculated result as a float
     """
+    print(f"[TOOL] calculate called with expression='{expression}'")
     try:
-        print(f"[TOOL] calculate called with expression='{expression}'")
-        # Use eval with restricted namespace for safety
-        # In production, use a proper math parser like ast.literal_eval or sympy
-        result = eval(expression, {"__builtins__": {}}, {})
-        return float(result)
-    except Exception as e:
+        # Parsed and checked by the safe evaluator in calculator.py, never eval()
+        return evaluate(expression)
+    except CalculationError as e:
         print(f"[TOOL] calculate error: {str(e)}")
         return f"Error in calculation: {str(e)}"
+    except Exception as e:
+        # Anything the evaluator didn't anticipate still goes back to the model
+        print(f"[TOOL] calculate error: {type(e).__name__}: {e}")
+        return f"Error in calculation: {type(e).__name__}: {e}"
+
+
+@tool
+def calculate_batch(expressions: List[str], variables: Optional[Dict[str, List[float]]] = None) -> Dict[str, Any]:
+    """
+    Perform many calculations in one call, e.g. subtotals for several documents.
+
+    Args:
+        expressions: Expressions to evaluate (e.g., ["1250000 + 1450000", "1680000 * 1.15"])
+        variables: Optional named lists of values of equal length (e.g., {"price": [10, 12], "qty": [3, 5]});
+            an expression using them (e.g., "price * qty") is computed for every position
+
+    Returns:
+        One result per expression (a number, a list of numbers, or an error message)
+        and the total of all numeric results
+    """
+    print(f"[TOOL] calculate_batch called with {len(expressions)} expressions")
+    try:
+        results = evaluate_batch(expressions, variables)
+    except CalculationError as e:
+        print(f"[TOOL] calculate_batch error: {str(e)}")
+        return {"error": f"Error in calculation: {str(e)}"}
+    except Exception as e:
+        print(f"[TOOL] calculate_batch error: {type(e).__name__}: {e}")
+        return {"error": f"Error in calculation: {type(e).__name__}: {e}"}
+
+    numbers = [value for result in results if not isinstance(result, str)
+               for value in (result if isinstance(result, list) else [result])]
+    return {"results": results, "total": math.fsum(numbers)}
+
+
+@tool
+def query_facts(metric: str, aggregate: Literal[AGGREGATES] = "list", document_id: Optional[str] = None,
+                period: Optional[str] = None, year: Optional[int] = None,
+                unit: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Look up numeric facts extracted from the documents (revenue, costs, growth, ...)
+    and aggregate them in one step.
+
+    Args:
+        metric: What is measured, e.g. "revenue", "quarterly revenue", "operating costs"
+        aggregate: "list", "sum", "mean", "min", "max", "count", or "growth"
+            (% change from the earliest to the latest period)
+        document_id: Only facts from this document (e.g., "doc_5")
+        period: Only this period (e.g., "Q1", "H2", "annual")
+        year: Only this year (e.g., 2024)
+        unit: Only this unit (e.g., "USD" or "%")
+
+    Returns:
+        The matching facts (document, metric, period, year, value, unit) and the aggregate result
+    """
+    facts = get_fact_table(get_document_store()).query(metric, period, document_id, year, unit)
+
+    # Aggregate either the stated totals ("total annual revenue") or the figures
+    # they are made of, never both, so nothing is counted twice
+    if aggregate != "list" and not period:
+        wants_total = asks_for_total(metric)
+        facts = [fact for fact in facts if is_total(fact) == wants_total] or facts
+
+    print(f"[TOOL] query_facts called with metric='{metric}', aggregate='{aggregate}', found {len(facts)} facts")
+
+    rows = [fact._asdict() for fact in facts[:MAX_FACT_ROWS]]
+    try:
+        result = aggregate_facts(facts, aggregate)
+    except ValueError as e:
+        return {"error": str(e), "matched": len(facts), "facts": rows}
+    return {"matched": len(facts), "facts": rows, **result}
@@ -0,0 +1,321 @@
+import hashlib
+import heapq
+import json
+import os
+import threading
+from typing import List, Dict, Any, FrozenSet, Iterable, Optional, Tuple, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:  # Dense retrieval is optional; keyword search works without it
+    np = None
+
+from document_store import DocumentStore, tokenize, document_text
+from segments import segment_cache
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Dense retrieval requires numpy: pip install numpy")
+
+
+# ----- Embedders -----
+
+class Embedder:
+    """
+    Interface for local embedding models. Implementations return one
+    L2-normalised float32 row per input text.
+    """
+    dim: int
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Deterministic bag-of-words embedder using signed feature hashing.
+
+    It needs no model download and gives the same vectors on every machine,
+    which makes it suitable for offline tests and as a fallback.
+    """
+
+    def __init__(self, dim: int = 256):
+        _require_numpy()
+        self.dim = dim
+
+    def _bucket(self, token: str) -> Tuple[int, float]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if value >> 63 else -1.0
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                bucket, sign = self._bucket(token)
+                matrix[row, bucket] += sign
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """
+    Embedder backed by a local sentence-transformers model.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        _require_numpy()
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("SentenceTransformerEmbedder requires sentence-transformers")
+        self._model = SentenceTransformer(model_name)
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        return self._model.encode(list(texts), normalize_embeddings=True).astype(np.float32)
+
+
+# ----- Dense Index -----
+
+class DenseIndex:
+    """
+    Exact or IVF-approximate nearest-neighbour search over one contiguous
+    float32 matrix of document embeddings.
+
+    Args:
+        ids: Document ID for each matrix row
+        matrix: (n, dim) float32 array, usually a read-only memmap
+        centroids: Optional IVF coarse centroids (nlist, dim)
+        assignments: Optional IVF list number for each row
+    """
+
+    def __init__(self, ids: List[str], matrix: "np.ndarray",
+                 centroids: Optional["np.ndarray"] = None,
+                 assignments: Optional["np.ndarray"] = None):
+        _require_numpy()
+        self.ids = ids
+        self.matrix = matrix
+        self.centroids = centroids
+        self._lists: Optional[List["np.ndarray"]] = None
+        if centroids is not None:
+            order = np.argsort(assignments, kind="stable")
+            bounds = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+
+    @classmethod
+    def build(cls, docs: Iterable[Dict[str, Any]], embedder: Embedder, nlist: int = 0,
+              batch_size: int = 1024) -> "DenseIndex":
+        """
+        Embed documents into an in-memory index. nlist > 0 adds an IVF layer.
+        """
+        ids: List[str] = []
+        rows: List["np.ndarray"] = []
+        batch: List[str] = []
+        for doc in docs:
+            ids.append(doc["id"])
+            batch.append(document_text(doc))
+            if len(batch) == batch_size:
+                rows.append(embedder.embed(batch))
+                batch = []
+        if batch:
+            rows.append(embedder.embed(batch))
+        matrix = np.vstack(rows) if rows else np.zeros((0, embedder.dim), dtype=np.float32)
+
+        if nlist and len(ids) > nlist:
+            centroids, assignments = kmeans(matrix, nlist)
+            return cls(ids, matrix, centroids, assignments)
+        return cls(ids, matrix)
+
+    def save(self, path: str) -> None:
+        """
+        Write the matrix as a .npy file (memory-mappable) plus ID and IVF sidecars.
+
+        Each file is written under a temporary name and renamed, the matrix
+        last, so a process loading the index meanwhile never sees a partial one.
+        """
+        out = np.lib.format.open_memmap(f"{path}.vectors.tmp.npy", mode="w+",
+                                        dtype=np.float32, shape=self.matrix.shape)
+        out[:] = self.matrix
+        out.flush()
+        del out
+        with open(f"{path}.vectors.ids.json.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.ids, f)
+        os.replace(f"{path}.vectors.ids.json.tmp", f"{path}.vectors.ids.json")
+        if self.centroids is not None:
+            assignments = np.empty(len(self.ids), dtype=np.int32)
+            for list_no, rows in enumerate(self._lists):
+                assignments[rows] = list_no
+            np.savez(f"{path}.vectors.ivf.tmp.npz", centroids=self.centroids, assignments=assignments)
+            os.replace(f"{path}.vectors.ivf.tmp.npz", f"{path}.vectors.ivf.npz")
+        os.replace(f"{path}.vectors.tmp.npy", f"{path}.vectors.npy")
+
+    @classmethod
+    def load(cls, path: str) -> "DenseIndex":
+        _require_numpy()
+        matrix = np.load(f"{path}.vectors.npy", mmap_mode="r")
+        with open(f"{path}.vectors.ids.json", encoding="utf-8") as f:
+            ids = json.load(f)
+        ivf_path = f"{path}.vectors.ivf.npz"
+        if os.path.exists(ivf_path):
+            ivf = np.load(ivf_path)
+            return cls(ids, matrix, ivf["centroids"], ivf["assignments"])
+        return cls(ids, matrix)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(f"{path}.vectors.npy")
+
+    def search(self, query_vector: "np.ndarray", max_results: int = 5,
+               nprobe: int = 8) -> List[Tuple[float, str]]:
+        """
+        Return up to max_results (cosine score, document ID) pairs, best first.
+        """
+        if max_results <= 0 or not self.ids:
+            return []
+
+        if self._lists is not None:
+            # Only score rows in the nprobe closest IVF lists
+            nearest = top_k_indices(self.centroids @ query_vector, nprobe)
+            rows = np.concatenate([self._lists[i] for i in nearest])
+            scores = self.matrix[rows] @ query_vector
+            best = top_k_indices(scores, max_results)
+            return [(float(scores[i]), self.ids[rows[i]]) for i in best]
+
+        # One vectorised matmul over the whole matrix
+        scores = self.matrix @ query_vector
+        best = top_k_indices(scores, max_results)
+        return [(float(scores[i]), self.ids[i]) for i in best]
+
+
+class CombinedDenseIndex:
+    """
+    The dense indexes of several segments searched as one, skipping
+    documents deleted from each segment.
+
+    Args:
+        parts: (index, deleted document IDs) per segment
+    """
+
+    def __init__(self, parts: Sequence[Tuple[DenseIndex, FrozenSet[str]]]):
+        self.parts = list(parts)
+
+    def search(self, query_vector: "np.ndarray", max_results: int = 5,
+               nprobe: int = 8) -> List[Tuple[float, str]]:
+        """
+        Return up to max_results (cosine score, document ID) pairs, best first.
+        """
+        hits = []
+        for index, deleted in self.parts:
+            # Deeper by the deleted count, so enough live rows remain
+            found = index.search(query_vector, max_results + len(deleted), nprobe)
+            hits.extend(hit for hit in found if hit[1] not in deleted)
+        return heapq.nlargest(max_results, hits, key=lambda hit: hit[0])
+
+
+def top_k_indices(scores: "np.ndarray", k: int) -> "np.ndarray":
+    """
+    Indices of the k highest scores, best first, via argpartition.
+    """
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def kmeans(matrix: "np.ndarray", k: int, iterations: int = 10, seed: int = 0) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Spherical k-means for the IVF coarse quantizer.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = np.array(matrix[rng.choice(len(matrix), size=k, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        for i in range(k):
+            members = matrix[assignments == i]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[i] = centroid / max(np.linalg.norm(centroid), 1e-12)
+    assignments = np.argmax(matrix @ centroids.T, axis=1).astype(np.int32)
+    return centroids, assignments
+
+
+# ----- Rank Fusion -----
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[Tuple[float, str]]:
+    """
+    Combine several ranked ID lists: each list contributes 1 / (k + rank).
+    """
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(((score, doc_id) for doc_id, score in fused.items()), reverse=True)
+
+
+# ----- Shared Dense Index -----
+
+_embedder: Optional[Embedder] = None
+_dense: Optional[Tuple[int, int, Union[DenseIndex, CombinedDenseIndex]]] = None
+# Indexes of segment files by path; a segment file never changes
+_segment_dense: Dict[str, DenseIndex] = {}
+_dense_lock = threading.Lock()
+
+
+def get_embedder() -> Embedder:
+    global _embedder
+    if _embedder is None:
+        _embedder = HashingEmbedder()
+    return _embedder
+
+
+def set_embedder(embedder: Embedder) -> None:
+    """
+    Use a different local embedder; the dense index is rebuilt on next use.
+    """
+    global _embedder, _dense
+    with _dense_lock:
+        _embedder = embedder
+        _dense = None
+        _segment_dense.clear()
+
+
+def _load_checked(path: str) -> DenseIndex:
+    index = DenseIndex.load(path)
+    if index.matrix.shape[1] != get_embedder().dim:
+        raise ValueError(f"Vectors in {path} were built with a different embedder")
+    return index
+
+
+def _saved_index(segment) -> Optional[DenseIndex]:
+    # The sidecar written by ingest.py --embeddings, if it matches the segment
+    index = _load_checked(segment.path) if DenseIndex.exists(segment.path) else None
+    return index if index is not None and len(index.ids) == len(segment) else None
+
+
+def get_dense_index(store: DocumentStore) -> Union[DenseIndex, CombinedDenseIndex]:
+    """
+    Dense index for the given store: the memory-mapped vectors written by
+    ingest.py --embeddings when present, otherwise built in memory. Refreshed
+    when the store's corpus version changes; for a segment directory that
+    embeds only segments it hasn't seen and the documents not yet flushed.
+    """
+    global _dense
+    key = (id(store), store.version)
+    if _dense is not None and _dense[:2] == key:
+        return _dense[2]
+
+    with _dense_lock:
+        if _dense is None or _dense[:2] != key:
+            path = getattr(store, "path", None)
+            if hasattr(store, "snapshot"):
+                index = segment_cache(store, _segment_dense, _saved_index,
+                                      lambda docs: DenseIndex.build(docs, get_embedder()), CombinedDenseIndex)
+            elif path and DenseIndex.exists(path):
+                index = _load_checked(path)
+            else:
+                index = DenseIndex.build(store.documents(), get_embedder())
+            _dense = (key[0], key[1], index)
+        return _dense[2]
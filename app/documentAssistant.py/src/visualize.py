@@ -0,0 +1,80 @@
+"""
+Render the agent graph locally; nothing is sent to a remote renderer.
+
+Usage:
+    python visualize.py                  # Mermaid text on stdout
+    python visualize.py -o graph.mmd     # Mermaid text to a file (paste into any Mermaid viewer)
+    python visualize.py -o graph.png     # PNG via Graphviz (needs pygraphviz) or a local
+                                         # headless browser (needs pyppeteer)
+    python visualize.py --ascii          # box drawing in the terminal (needs grandalf)
+"""
+import argparse
+import os
+
+from agent import build_workflow
+
+MERMAID_EXTENSIONS = {".mmd", ".mermaid", ".md"}
+
+
+def render_png(graph) -> bytes:
+    """
+    PNG bytes for a compiled graph, from Graphviz or else from a local browser.
+
+    Raises:
+        RuntimeError: If neither pygraphviz nor pyppeteer is installed
+    """
+    drawable = graph.get_graph()
+    try:
+        return drawable.draw_png()
+    except ImportError:
+        pass
+    try:
+        from langchain_core.runnables.graph import MermaidDrawMethod
+        return drawable.draw_mermaid_png(draw_method=MermaidDrawMethod.PYPPETEER)
+    except ImportError:
+        raise RuntimeError("PNG output needs pygraphviz or pyppeteer: pip install pygraphviz "
+                           "(or pyppeteer), or write Mermaid text with -o graph.mmd")
+
+
+def save_graph(graph, path: str) -> None:
+    """
+    Write a compiled graph to path: Mermaid text for .mmd/.mermaid/.md, PNG for .png.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in MERMAID_EXTENSIONS:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(graph.get_graph().draw_mermaid())
+    elif ext == ".png":
+        data = render_png(graph)
+        with open(path, "wb") as f:
+            f.write(data)
+    else:
+        raise ValueError(f"Unsupported output '{path}'; use .mmd, .mermaid, .md or .png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", help="File to write (.mmd, .mermaid, .md or .png)")
+    parser.add_argument("--ascii", action="store_true", help="Print the graph as ASCII art")
+    args = parser.parse_args()
+
+    # The structure doesn't depend on the checkpointer, so none is opened
+    graph = build_workflow(instrument=False).compile()
+
+    if args.ascii:
+        try:
+            print(graph.get_graph().draw_ascii())
+        except ImportError as e:
+            parser.exit(1, f"{e}\n")
+    elif args.output:
+        try:
+            save_graph(graph, args.output)
+        except (RuntimeError, ValueError) as e:
+            parser.exit(1, f"{e}\n")
+        print(f"Graph saved to {args.output}")
+    else:
+        print(graph.get_graph().draw_mermaid())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Pre-warm the document assistant so its first request doesn't pay for setup.
+
+warm_up() does a new process's one-time work ahead of traffic:
+
+    graph          compile the agent graph (memoized by agent_workflow())
+    documents      build the retrieval index and the numeric fact table
+    prompts        render every agent's system prompt and the triage prompt
+                   (loads the tiktoken encoding when TIKTOKEN_ENCODING is set)
+    tool_schemas   bind each agent's tools and the triage schema to the LLM in
+                   the runnable registry, importing the provider SDK on the way
+
+The result lives in process memory: a compiled graph, pydantic models and
+bound runnables can't be written to disk and loaded back any faster than
+they are built. It becomes a snapshot when the platform captures the
+process after warm_up(), so call it during init, before a snapshot is taken
+(e.g. Lambda SnapStart, CRIU) or before a pre-forking server forks its
+workers. main.py calls it on import when WARM_START=1.
+
+Usage:
+    python warmup.py          # warm up once and report each step's time
+    python warmup.py --fake   # with the fake LLM, without the provider SDK
+"""
+import argparse
+import time
+from typing import Callable, Dict
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from agent import agent_workflow
+from assistant import QA_AGENT, SUMMARISATION_AGENT, CALCULATION_AGENT, triage_prompt
+from document_store import get_document_store
+from facts import get_fact_table
+from json_logger import log
+from prompts import get_chat_prompt_template
+from runnable_registry import get_bound_llm, get_structured_llm
+from schemas import AgentState, UserIntent
+
+# Environment variable that makes main.py warm up on import
+WARM_START_ENV = "WARM_START"
+
+AGENTS = (QA_AGENT, SUMMARISATION_AGENT, CALCULATION_AGENT)
+
+
+def _warm_documents() -> None:
+    get_fact_table(get_document_store())
+
+
+def _warm_prompts() -> None:
+    for agent in AGENTS:
+        get_chat_prompt_template(agent.spec.prompt_type)
+    triage_prompt(AgentState(user_input="warm-up"), {"configurable": {}})
+
+
+def _warm_tool_schemas(llm) -> None:
+    for agent in AGENTS:
+        if llm is None:
+            for tool in agent.spec.tools:
+                convert_to_openai_tool(tool)
+        else:
+            get_bound_llm(llm, agent.spec.tools)
+    if llm is not None:
+        get_structured_llm(llm, UserIntent)
+
+
+def warm_up(llm=None) -> Dict[str, float]:
+    """
+    Run every warm-up step once and return the seconds each took.
+
+    Args:
+        llm: The chat model, or a factory for it like main.create_llm, that
+            requests will use. Without one, tool schemas are generated but
+            not bound to a model.
+    """
+    steps: Dict[str, Callable[[], None]] = {
+        "graph": agent_workflow,
+        "documents": _warm_documents,
+        "prompts": _warm_prompts,
+        "tool_schemas": lambda: _warm_tool_schemas(llm),
+    }
+    timings = {}
+    for name, step in steps.items():
+        start = time.perf_counter()
+        step()
+        timings[name] = round(time.perf_counter() - start, 6)
+    log("Warm-up finished", **timings)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fake", action="store_true", help="Warm up with the fake LLM")
+    args = parser.parse_args()
+
+    if args.fake:
+        from fake_llm import FakeChatModel
+        llm = FakeChatModel()
+    else:
+        from main import create_llm
+        llm = create_llm
+
+    timings = warm_up(llm)
+    for name, seconds in timings.items():
+        print(f"{name:<14} {seconds * 1000:>9.1f} ms")
+    print(f"{'total':<14} {sum(timings.values()) * 1000:>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# The application modules live in src/ and import each other by bare name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def log_to_temp_dir(tmp_path_factory):
+    # Keep test runs out of the application log
+    import json_logger
+    json_logger.configure(path=str(tmp_path_factory.mktemp("logs") / "logs.jsonl"))
+    yield
+    json_logger.shutdown()
+
+
+@pytest.fixture
+def use_store():
+    """Call with a store to make it the process-wide one for this test."""
+    import document_store
+    previous = document_store._store
+    yield document_store.set_document_store
+    document_store.set_document_store(previous)
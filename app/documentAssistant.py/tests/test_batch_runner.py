@@ -0,0 +1,10 @@
+from batch_runner import thread_namespace
+
+
+def test_thread_namespace_differs_per_input_and_run(tmp_path):
+    first, second = str(tmp_path / "a.jsonl"), str(tmp_path / "b.jsonl")
+
+    assert thread_namespace(first, "run1") == thread_namespace(first, "run1")
+    assert thread_namespace(first, "run1") != thread_namespace(second, "run1")
+    assert thread_namespace(first, "run1") != thread_namespace(first, "run2")
+    assert thread_namespace(first, "run1").startswith("batch-")
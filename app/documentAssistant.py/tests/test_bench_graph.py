@@ -0,0 +1,18 @@
+import contextlib
+import io
+
+import pytest
+
+from bench_graph import build_corpus, run_scenario
+from fake_llm import FakeChatModel
+
+
+@pytest.mark.parametrize("cache", [False, True])
+def test_run_scenario(use_store, cache):
+    use_store(build_corpus(5))
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = run_scenario(FakeChatModel(), "qa", 5, concurrency=2, sessions=4, cache=cache, measure_memory=False)
+
+    assert result["sessions"] == 4
+    assert result["throughput"] > 0
+    assert result["misrouted"] == 0
@@ -0,0 +1,46 @@
+import pytest
+
+import calculator
+from calculator import CalculationError, evaluate, evaluate_batch
+
+
+def test_evaluates_arithmetic():
+    assert evaluate("1250000 + 1450000 + 1680000 + 1920000") == 6300000.0
+    assert evaluate("round(x * 1.15, 2)", {"x": 10}) == 11.5
+
+
+@pytest.mark.parametrize("expression", [
+    "10**400",               # an integer too large for a float
+    "2**1000*2**1000*2**100",
+    "10.0**400",
+    "9**9**9",
+    "2**4000*2**4000",
+    "exp(1000)",
+    "1/0",
+    "sqrt(-1)",
+])
+def test_limits_raise_calculation_error(expression):
+    with pytest.raises(CalculationError):
+        evaluate(expression)
+
+
+@pytest.mark.parametrize("expression", ["__import__('os')", "x.real", "[1, 2]", "'a' * 3"])
+def test_rejects_unsupported_syntax(expression):
+    with pytest.raises(CalculationError):
+        evaluate(expression, {"x": 1})
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_failing_expression_does_not_abort_the_batch(monkeypatch, vectorized):
+    if not vectorized:
+        monkeypatch.setattr(calculator, "_numpy", lambda: None)
+    results = evaluate_batch(["10**400", "x*2", "1/0"], {"x": [1, 2]})
+    assert results[0].startswith("Error in calculation")
+    assert results[1] == [2.0, 4.0]
+    assert results[2].startswith("Error in calculation")
+
+
+def test_calculate_tool_reports_errors():
+    from tools import calculate
+    assert calculate.invoke({"expression": "10**400"}).startswith("Error in calculation")
+    assert calculate.invoke({"expression": "2 + 2"}) == 4.0
@@ -0,0 +1,59 @@
+import asyncio
+import contextlib
+import io
+
+import pytest
+
+from agent import agent_workflow
+from checkpointer import SQLiteCheckpointSaver
+from fake_llm import FakeChatModel
+
+
+@pytest.fixture
+def saver(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.sqlite"))
+    yield saver
+    saver.close()
+
+
+def ask(workflow, thread_id, question):
+    config = {"configurable": {"thread_id": thread_id, "llm": FakeChatModel()}}
+    with contextlib.redirect_stdout(io.StringIO()):
+        return workflow.invoke({"user_input": question, "session_id": thread_id}, config)
+
+
+def count(saver, table):
+    return saver._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_delete_thread_removes_documents_no_other_thread_uses(saver):
+    workflow = agent_workflow(saver)
+    ask(workflow, "a", "Can you summarise doc_1?")
+    ask(workflow, "b", "Can you summarise doc_1?")
+    shared = count(saver, "documents")
+    assert shared > 0
+
+    saver.delete_thread("a")
+    assert count(saver, "documents") == shared
+    assert workflow.get_state({"configurable": {"thread_id": "b"}}).values["current_response"].retrieved_documents
+
+    saver.delete_thread("b")
+    assert count(saver, "documents") == 0
+    assert count(saver, "document_refs") == 0
+
+
+def test_async_methods_match_sync_ones(saver):
+    workflow = agent_workflow(saver)
+    ask(workflow, "a", "Can you summarise doc_1?")
+    config = {"configurable": {"thread_id": "a"}}
+
+    async def read():
+        listed = [item async for item in saver.alist(config, limit=2)]
+        return await saver.aget_tuple(config), listed
+
+    latest, listed = asyncio.run(read())
+    assert latest.config == saver.get_tuple(config).config
+    assert [item.config for item in listed] == [item.config for item in saver.list(config, limit=2)]
+
+    asyncio.run(saver.adelete_thread("a"))
+    assert saver.get_tuple(config) is None
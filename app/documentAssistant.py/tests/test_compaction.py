@@ -0,0 +1,40 @@
+import json
+
+from compaction import ToolResultCompactor
+
+
+def long_document(doc_id):
+    return {"id": doc_id, "title": "Annual report", "source": "report.txt",
+            "content": " ".join(f"sentence {i} about revenue." for i in range(400))}
+
+
+def passages(doc_id, *starts):
+    return {"document_id": doc_id,
+            "passages": [{"text": f"passage at {start} about revenue", "start": start, "end": start + 30}
+                         for start in starts]}
+
+
+def test_truncated_document_does_not_hide_its_passages():
+    compactor = ToolResultCompactor(token_budget=200)
+    shown = json.loads(compactor.compact([[long_document("doc_1")]])[0])
+    assert shown[0]["content"].endswith("…")
+
+    result = json.loads(compactor.compact([passages("doc_1", 0, 500)])[0])
+    assert [p["text"] for p in result["passages"]] == ["passage at 0 about revenue", "passage at 500 about revenue"]
+    assert "note" not in result
+
+    # Shortened documents are sent again rather than referenced
+    again = json.loads(compactor.compact([[long_document("doc_1")]])[0])
+    assert "note" not in again[0]
+
+
+def test_documents_and_passages_shown_in_full_are_referenced():
+    compactor = ToolResultCompactor(token_budget=2000)
+    compactor.compact([[{"id": "doc_2", "title": "Memo", "content": "Revenue was $5 million."}]])
+    assert json.loads(compactor.compact([[{"id": "doc_2", "content": "Revenue was $5 million."}]])[0]) == [
+        {"id": "doc_2", "note": "already shown above"}]
+
+    compactor.compact([passages("doc_3", 0)])
+    result = json.loads(compactor.compact([passages("doc_3", 0, 120)])[0])
+    assert result["passages"] == [{"text": "passage at 120 about revenue"}]
+    assert result["note"] == "some passages already shown above"
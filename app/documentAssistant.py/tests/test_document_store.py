@@ -0,0 +1,75 @@
+import pytest
+
+from disk_index import MmapDocumentStore, write_index
+from document_store import InMemoryDocumentStore
+
+DOCS = [
+    {"id": "doc_1", "title": "Revenue", "content": "Revenue grew. Revenue revenue revenue in every quarter."},
+    {"id": "doc_2", "title": "Costs", "content": "Operating costs and revenue were flat."},
+    {"id": "doc_3", "title": "Hiring", "content": "The team hired twelve engineers."},
+    {"id": "doc_4", "title": "Margins", "content": "Margins improved while costs fell and revenue held in a long "
+                                                 "report with many other unrelated words to pad its length out."},
+]
+
+
+def ranked_ids(results):
+    return [doc["id"] for _, doc in results]
+
+
+def test_bm25_ranks_by_term_frequency_and_rarity():
+    store = InMemoryDocumentStore(DOCS)
+
+    results = store.search("revenue")
+    assert ranked_ids(results) == ["doc_1", "doc_2", "doc_4"]
+    scores = [score for score, _ in results]
+    assert scores == sorted(scores, reverse=True) and scores[-1] > 0
+
+    # The rarer term outweighs the common one
+    assert ranked_ids(store.search("revenue engineers"))[0] == "doc_3"
+    assert store.search("nothing matches") == []
+
+
+def test_top_k_and_deleted_documents():
+    store = InMemoryDocumentStore(DOCS)
+
+    assert ranked_ids(store.search("revenue costs", max_results=2)) == \
+        ranked_ids(store.search("revenue costs"))[:2]
+    assert store.search("revenue", max_results=0) == []
+    assert [n for _, n in store.score("revenue", deleted={0})] == [1, 3]
+
+
+def test_lookup_by_id_is_case_insensitive():
+    store = InMemoryDocumentStore(DOCS)
+
+    assert store.get("DOC_2")["title"] == "Costs"
+    assert store.get("doc_9") is None
+    assert len(store) == store.version == 4
+
+
+def test_mmap_store_round_trips_through_write_index(tmp_path):
+    path = str(tmp_path / "corpus.idx")
+    assert write_index(DOCS, path) == 4
+    memory = InMemoryDocumentStore(DOCS)
+
+    store = MmapDocumentStore(path)
+    try:
+        assert list(store.documents()) == DOCS
+        assert len(store) == 4
+        assert store.get("doc_3") == DOCS[2]
+        assert store.doc_number("doc_4") == 3 and store.document(3) == DOCS[3]
+        assert store.get("doc_9") is None
+        for query in ("revenue", "costs revenue", "engineers", "nothing"):
+            expected = memory.search(query, max_results=3)
+            actual = store.search(query, max_results=3)
+            assert ranked_ids(actual) == ranked_ids(expected)
+            assert [s for s, _ in actual] == pytest.approx([s for s, _ in expected])
+    finally:
+        store.close()
+
+
+def test_mmap_store_rejects_other_files(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("not an index" * 20)
+
+    with pytest.raises(ValueError):
+        MmapDocumentStore(str(path))
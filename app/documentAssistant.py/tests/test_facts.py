@@ -0,0 +1,68 @@
+import pytest
+
+import facts
+from facts import FactTable, extract_facts, get_fact_table
+from segments import SegmentedDocumentStore
+
+
+def years(content, title=""):
+    return [(fact.value, fact.year) for fact in extract_facts({"id": "d", "content": content, "title": title})]
+
+
+@pytest.mark.parametrize("content, expected", [
+    ("Revenue grew from $2.1 million in 2022 to $3.4 million in 2023.",
+     [(2_100_000, 2022), (3_400_000, 2023)]),
+    ("In 2023, revenue was $5 million, and in 2024 $6 million.",
+     [(5_000_000, 2023), (6_000_000, 2024)]),
+    ("The company saw a 15% year-over-year growth in 2024.", [(15, 2024)]),
+    ("Q2 revenue was $1,450,000.", [(1_450_000, 2021)]),
+])
+def test_year_of_each_figure(content, expected):
+    assert years(content, title="Annual Report 2021") == expected
+
+
+def test_period_right_after_a_figure():
+    found = extract_facts({"id": "d", "content": "Sales were $1m in Q1 and $2m in Q2 2024."})
+    assert [(f.period, f.year) for f in found] == [("q1", 0), ("q2", 2024)]
+
+
+def revenue(doc_id, amount):
+    return {"id": doc_id, "title": doc_id, "source": doc_id,
+            "content": f"Quarterly revenue was ${amount} million in Q1 2024."}
+
+
+def test_segment_tables_are_reused_and_follow_changes(tmp_path, monkeypatch):
+    store = SegmentedDocumentStore(str(tmp_path), flush_threshold=2, merge_interval=None)
+    for i in range(4):
+        store.add_document(revenue(f"doc_{i}", i + 1))
+    store.add_document(revenue("doc_9", 9))
+    assert sorted(f.value for f in get_fact_table(store).query("revenue")) == [1e6, 2e6, 3e6, 4e6, 9e6]
+
+    # After a change only the new segment and the unflushed documents are extracted
+    built = []
+    build = FactTable.build.__func__
+
+    def recording_build(cls, docs):
+        docs = list(docs)
+        built.append([doc["id"] for doc in docs])
+        return build(cls, docs)
+
+    monkeypatch.setattr(FactTable, "build", classmethod(recording_build))
+    store.delete_document("doc_1")
+    store.add_document(revenue("doc_0", 5))  # flushes doc_9 and doc_0
+    table = get_fact_table(store)
+    assert sorted(f.value for f in table.query("revenue")) == [3e6, 4e6, 5e6, 9e6]
+    assert built == [["doc_9", "doc_0"], []]
+    assert len(table) == 4
+
+
+def test_segment_sidecar_is_used(tmp_path):
+    store = SegmentedDocumentStore(str(tmp_path), merge_interval=None)
+    store.add_document(revenue("doc_1", 1))
+    store.commit()
+    (index, _), = store.snapshot()[0]
+    FactTable.build(index.documents()).save(index.path)
+    facts._segment_facts.clear()
+
+    assert FactTable.load(index.path).documents == 1
+    assert [f.value for f in get_fact_table(store).query("revenue")] == [1e6]
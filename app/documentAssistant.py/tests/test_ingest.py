@@ -0,0 +1,62 @@
+from ingest import iter_documents
+from segments import SegmentedDocumentStore
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def update(directory, inputs):
+    store = SegmentedDocumentStore(str(directory), merge_interval=None)
+    existing = list(store.documents())
+    for doc in iter_documents([str(p) for p in inputs], existing):
+        store.add_document(doc)
+    store.close()
+
+
+def live(directory):
+    store = SegmentedDocumentStore(str(directory), merge_interval=None)
+    return {doc["id"]: (doc["source"], doc["content"]) for doc in store.documents()}
+
+
+def test_update_keeps_earlier_documents_without_ids(tmp_path):
+    write(tmp_path / "first" / "a.txt", "alpha")
+    write(tmp_path / "first" / "b.txt", "beta")
+    write(tmp_path / "second" / "c.txt", "gamma")
+    corpus = tmp_path / "corpus"
+
+    update(corpus, [tmp_path / "first"])
+    update(corpus, [tmp_path / "second"])
+
+    assert live(corpus) == {
+        "doc_1": ("a.txt", "alpha"),
+        "doc_2": ("b.txt", "beta"),
+        "doc_3": ("c.txt", "gamma"),
+    }
+
+
+def test_update_replaces_a_file_ingested_again(tmp_path):
+    write(tmp_path / "docs" / "a.txt", "alpha")
+    write(tmp_path / "docs" / "sub" / "a.txt", "nested alpha")
+    corpus = tmp_path / "corpus"
+    update(corpus, [tmp_path / "docs"])
+
+    write(tmp_path / "docs" / "a.txt", "alpha, revised")
+    update(corpus, [tmp_path / "docs" / "a.txt"])
+
+    assert live(corpus) == {
+        "doc_1": ("a.txt", "alpha, revised"),
+        "doc_2": ("sub/a.txt", "nested alpha"),
+    }
+
+
+def test_update_writes_fact_sidecars_per_segment(tmp_path, monkeypatch):
+    import ingest
+    write(tmp_path / "docs" / "q.txt", "Quarterly revenue was $1.2 million in Q1 2024.")
+    corpus = tmp_path / "corpus"
+    monkeypatch.setattr("sys.argv", ["ingest.py", str(tmp_path / "docs"), "-o", str(corpus), "--update"])
+    ingest.main()
+
+    segments = sorted(p.name for p in corpus.iterdir() if p.suffix == ".idx")
+    assert segments and all((corpus / f"{name}.facts.json").exists() for name in segments)
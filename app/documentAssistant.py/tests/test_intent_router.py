@@ -0,0 +1,61 @@
+import pytest
+
+from intent_router import FastIntentRouter
+
+# Input and the intent the router should pick locally (None: ask the LLM)
+LABELLED = [
+    ("Can you summarise doc_1?", "summarisation"),
+    ("Give me an overview of the financial report", "summarisation"),
+    ("Summarize the key points", "summarisation"),
+    ("Calculate the total revenue in doc_5", "calculation"),
+    ("Calculate 1250000 + 1450000", "calculation"),
+    ("What is 20 percent of 50?", "calculation"),
+    ("What is machine learning?", "qa"),
+    ("Explain neural networks", "qa"),
+    ("Which Python libraries are used for visualization?", "qa"),
+    ("Describe the data pipeline", "qa"),
+    # Numeric questions the qa agent can't answer
+    ("What is 15% of 200?", None),
+    ("What is 12 times 4?", None),
+    ("What is 7 plus 5?", None),
+    ("What is the ratio of 30 to 40?", None),
+    ("What was the revenue of 2024?", None),
+    # Ambiguous between qa and calculation
+    ("What was the total revenue?", None),
+    ("What was the year-over-year growth in the financial report?", None),
+    ("How many employees are there?", None),
+    ("hello", None),
+]
+
+
+@pytest.mark.parametrize("user_input, expected", LABELLED)
+def test_routes_labelled_inputs(user_input, expected):
+    intent = FastIntentRouter().classify(user_input)
+
+    assert (intent.intent_type if intent else None) == expected
+
+
+def test_follow_ups_go_to_the_llm_only_with_history():
+    router = FastIntentRouter()
+
+    assert router.classify("What about doc_2?", has_history=True) is None
+    assert router.classify("What about doc_2?").intent_type == "qa"
+
+
+def test_stats_count_hits_and_fallbacks():
+    router = FastIntentRouter()
+    for user_input, _ in LABELLED:
+        router.classify(user_input)
+    router.record_llm_call(0.5)
+
+    stats = router.stats()
+    hits = sum(expected is not None for _, expected in LABELLED)
+    assert stats["requests"] == len(LABELLED)
+    assert stats["fast_path_hits"] == hits
+    assert stats["llm_fallbacks"] == len(LABELLED) - hits
+    assert stats["hit_rate"] == pytest.approx(hits / len(LABELLED))
+    assert stats["avg_llm_triage_seconds"] == pytest.approx(0.5 / (len(LABELLED) - hits))
+    assert 0 < stats["estimated_seconds_saved"] < hits * stats["avg_llm_triage_seconds"]
+
+    router.reset()
+    assert router.stats()["requests"] == 0
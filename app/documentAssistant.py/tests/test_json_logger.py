@@ -0,0 +1,43 @@
+import json
+import os
+import threading
+
+from json_logger import INDEX_ENTRY, BufferedJsonLogger, index_path
+
+
+def _messages(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_records_logged_after_close_are_written_and_indexed(tmp_path):
+    path = str(tmp_path / "logs.jsonl")
+    logger = BufferedJsonLogger(path, flush_interval=60)
+    logger.log("before close", session_id="s1")
+    logger.close()
+    logger.log("after close", session_id="s1")
+    logger.log("after close again")
+
+    assert [r["message"] for r in _messages(path)] == ["before close", "after close", "after close again"]
+    assert os.path.getsize(index_path(path)) == 3 * INDEX_ENTRY.size
+
+
+def test_every_record_is_written_or_counted_as_dropped(tmp_path):
+    path = str(tmp_path / "logs.jsonl")
+    logger = BufferedJsonLogger(path, flush_interval=0.01, queue_size=8, index=False)
+
+    def produce():
+        for i in range(500):
+            logger.log("record", i=i)
+
+    threads = [threading.Thread(target=produce) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    logger.close()
+
+    records = _messages(path)
+    written = sum(r["message"] == "record" for r in records)
+    dropped = sum(r["data"]["dropped"] for r in records if r["message"] == "Log records dropped (queue full)")
+    assert written + dropped == 8 * 500
@@ -0,0 +1,88 @@
+import os
+
+import log_query
+from json_logger import BufferedJsonLogger, index_path
+from log_query import LogIndex, events_between, log_files, session_events, to_epoch
+
+
+def write_log(path, sessions, rounds, **settings):
+    logger = BufferedJsonLogger(path, **settings)
+    for i in range(rounds):
+        for session_id in sessions:
+            logger.log("event", session_id=session_id, i=i)
+    logger.close()
+
+
+def covered(path):
+    with open(path + ".sidx", "rb") as f:
+        return log_query.SESSION_HEADER.unpack(f.read(log_query.SESSION_HEADER.size))[2]
+
+
+def steps(records):
+    return [r["data"]["i"] for r in records]
+
+
+def test_queries_span_rotated_files(tmp_path):
+    path = str(tmp_path / "logs.jsonl")
+    # Flushed a few records at a time, so the log rotates several times
+    write_log(path, ["s1", "s2", "s3"], 200, flush_size=16, max_bytes=4000, backup_count=100)
+    assert len(log_files(path)) > 3
+
+    assert steps(session_events("s2", path=path)) == list(range(200))
+    everything = events_between(path=path)
+    assert len(everything) == 600
+
+    # The index keeps sub-microsecond times, so records at the bounds may fall either side
+    start, end = everything[150]["timestamp"], everything[450]["timestamp"]
+    window = events_between(start, end, path=path)
+    assert everything[151:450] == [r for r in window if r in everything[151:450]]
+    assert 299 <= len(window) <= 301
+    assert steps(session_events("s1", path=path, since=start, until=end)) == [
+        r["data"]["i"] for r in everything
+        if r["data"]["session_id"] == "s1" and to_epoch(start) <= to_epoch(r["timestamp"]) <= to_epoch(end)]
+
+
+def test_stale_session_index_is_extended(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_query, "SESSION_REBUILD_ENTRIES", 10)
+    path = str(tmp_path / "logs.jsonl")
+    sessions = [f"s{n}" for n in range(7)]
+    write_log(path, sessions, 5)
+    with LogIndex(path) as index:
+        assert steps(index.session("s3")) == list(range(5))
+
+    # Fewer new records than the threshold: scanned from the .idx
+    write_log(path, sessions[:1], 5)
+    with LogIndex(path) as index:
+        assert steps(index.session("s0")) == list(range(5)) * 2
+    assert covered(path) == 35
+
+    # Past it: merged into the .sidx
+    write_log(path, sessions, 3)
+    with LogIndex(path) as index:
+        assert steps(index.session("s0")) == list(range(5)) * 2 + list(range(3))
+        assert steps(index.session("s6")) == list(range(5)) + list(range(3))
+    assert covered(path) == 61
+    with open(path + ".sidx", "rb") as f:
+        merged = f.read()
+
+    # Same bytes as building it from scratch
+    os.remove(path + ".sidx")
+    with LogIndex(path) as index:
+        index.session("s0")
+    with open(path + ".sidx", "rb") as f:
+        assert f.read() == merged
+
+
+def test_session_index_from_a_different_file_is_rebuilt(tmp_path):
+    path = str(tmp_path / "logs.jsonl")
+    write_log(path, ["s1", "s2"], 4)
+    with LogIndex(path) as index:
+        index.session("s1")
+
+    # The log is replaced by a shorter one; the old .sidx covers too much
+    for name in (path, index_path(path)):
+        os.remove(name)
+    write_log(path, ["s1"], 2)
+    with LogIndex(path) as index:
+        assert steps(index.session("s1")) == [0, 1]
+        assert index.session("s2") == []
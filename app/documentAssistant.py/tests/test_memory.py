@@ -0,0 +1,60 @@
+import threading
+import time
+
+from memory import background_summaries, memory_manager_node
+from schemas import AgentState
+
+
+class SlowSummaryLLM:
+    def __init__(self, seconds=0.2):
+        self.seconds = seconds
+        self.calls = 0
+        self.release = threading.Event()
+
+    def invoke(self, prompt):
+        self.calls += 1
+        self.release.wait(self.seconds)
+        return f"summary {self.calls}"
+
+
+def conversation(turns):
+    return [text for i in range(turns) for text in (f"question {i}", f"answer {i}")]
+
+
+def config(llm, thread_id):
+    return {"configurable": {"thread_id": thread_id, "summary_llm": llm, "memory_max_turns": 2}}
+
+
+def test_model_summary_runs_after_the_turn():
+    llm = SlowSummaryLLM()
+    state = AgentState(user_input="question 2", messages=conversation(3))
+
+    start = time.perf_counter()
+    assert memory_manager_node(state, config(llm, "deferred")) == {}
+    assert time.perf_counter() - start < llm.seconds / 2
+
+    # The next turn picks up the finished summary of the turn that left the window
+    background_summaries.wait()
+    state = AgentState(user_input="question 3", messages=conversation(4))
+    update = memory_manager_node(state, config(llm, "deferred"))
+    assert update["conversation_summary"] == "summary 1"
+    assert update["messages"] == conversation(4)[2:]
+    background_summaries.wait()
+
+
+def test_stale_summary_is_discarded():
+    llm = SlowSummaryLLM(seconds=0)
+    memory_manager_node(AgentState(user_input="q", messages=conversation(3)), config(llm, "stale"))
+    background_summaries.wait()
+
+    # The history changed in the meantime (e.g. the thread was rewound)
+    state = AgentState(user_input="q", messages=["other"] * 6)
+    assert memory_manager_node(state, config(llm, "stale")) == {}
+    background_summaries.wait()
+
+
+def test_extractive_summary_stays_inline():
+    state = AgentState(user_input="q", messages=conversation(3))
+    update = memory_manager_node(state, {"configurable": {"thread_id": "inline", "memory_max_turns": 2}})
+    assert update["messages"] == conversation(3)[2:]
+    assert update["conversation_summary"].startswith("- User: question 0")
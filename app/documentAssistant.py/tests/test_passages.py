@@ -0,0 +1,29 @@
+from passages import split_passages
+
+TEXT = "Revenue rose to €1.2m. Costs fell — sharply! Did margins improve? Yes.  Naïve forecasts were wrong."
+
+
+def test_offsets_are_utf8_byte_offsets():
+    data = TEXT.encode("utf-8")
+
+    for passage in split_passages(TEXT, max_chars=30):
+        assert data[passage["start"]:passage["end"]].decode("utf-8") == passage["text"]
+
+
+def test_passages_group_whole_sentences_up_to_max_chars():
+    passages = split_passages(TEXT, max_chars=50)
+
+    assert [p["text"] for p in passages] == [
+        "Revenue rose to €1.2m. Costs fell — sharply!",
+        "Did margins improve? Yes.",
+        "Naïve forecasts were wrong.",
+    ]
+    assert all(len(p["text"]) <= 50 for p in passages)
+
+
+def test_long_sentence_is_its_own_passage():
+    long_sentence = "word " * 40 + "end."
+    passages = split_passages(f"Short one. {long_sentence} Tail.", max_chars=20)
+
+    assert [p["text"] for p in passages] == ["Short one.", long_sentence, "Tail."]
+    assert split_passages("   ") == []
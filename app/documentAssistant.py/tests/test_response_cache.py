@@ -0,0 +1,65 @@
+import asyncio
+import contextlib
+import io
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from agent import agent_workflow
+from fake_llm import FakeChatModel
+from response_cache import CachedWorkflow, MemoryCacheBackend, ResponseCache
+
+QUESTION = "What is machine learning?"
+
+
+def make_config(thread_id, cache, **settings):
+    return {"configurable": {"thread_id": thread_id, "llm": FakeChatModel(), "response_cache": cache, **settings}}
+
+
+def ask(workflow, question, config):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return workflow.invoke({"user_input": question, "session_id": config["configurable"]["thread_id"]}, config)
+
+
+def test_hit_finishes_the_turn_and_the_thread_continues():
+    workflow = CachedWorkflow(agent_workflow(InMemorySaver()))
+    cache = ResponseCache(MemoryCacheBackend())
+    miss = ask(workflow, QUESTION, make_config("first", cache))
+
+    config = make_config("second", cache)
+    hit = ask(workflow, QUESTION, config)
+    assert hit["actions_taken"][-1] == "response_cache"
+    assert hit["current_response"].answer == miss["current_response"].answer
+    snapshot = workflow.get_state(config)
+    assert snapshot.next == ()
+    assert snapshot.values["messages"] == [QUESTION, hit["current_response"].answer]
+
+    follow_up = ask(workflow, "Can you summarise doc_1?", config)
+    assert "response_cache" not in follow_up["actions_taken"][-2:]
+    assert follow_up["messages"][:2] == [QUESTION, hit["current_response"].answer]
+    assert len(follow_up["messages"]) == 4
+    assert workflow.get_state(config).next == ()
+
+
+def test_hit_runs_memory_compaction():
+    workflow = CachedWorkflow(agent_workflow(InMemorySaver()))
+    cache = ResponseCache(MemoryCacheBackend())
+    ask(workflow, QUESTION, make_config("first", cache, memory_max_turns=0))
+
+    config = make_config("second", cache, memory_max_turns=0)
+    hit = ask(workflow, QUESTION, config)
+    values = workflow.get_state(config).values
+    assert values["messages"] == hit["messages"] == []
+    assert values["conversation_summary"] == hit["conversation_summary"]
+    assert QUESTION in values["conversation_summary"]
+
+
+def test_async_hit_finishes_the_turn():
+    workflow = CachedWorkflow(agent_workflow(InMemorySaver()))
+    cache = ResponseCache(MemoryCacheBackend())
+    ask(workflow, QUESTION, make_config("first", cache))
+
+    config = make_config("second", cache)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(workflow.ainvoke({"user_input": QUESTION, "session_id": "second"}, config))
+    assert result["actions_taken"][-1] == "response_cache"
+    assert asyncio.run(workflow.aget_state(config)).next == ()
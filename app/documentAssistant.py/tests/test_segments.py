@@ -0,0 +1,129 @@
+from segments import SegmentedDocumentStore
+
+
+def doc(doc_id, content="quarterly revenue report"):
+    return {"id": doc_id, "title": doc_id, "source": f"{doc_id}.txt", "content": content}
+
+
+def open_store(directory, **kwargs):
+    return SegmentedDocumentStore(str(directory), merge_interval=None, **kwargs)
+
+
+def ids(store):
+    return sorted(d["id"] for d in store.documents())
+
+
+def test_two_processes_do_not_overwrite_each_others_segments(tmp_path):
+    ingest = open_store(tmp_path)
+    ingest.add_document(doc("a1"))
+    ingest.close()
+
+    # A serving worker and a later `ingest --update` share the directory
+    worker = open_store(tmp_path)
+    update = open_store(tmp_path)
+    update.add_document(doc("b1"))
+    update.commit()
+    worker.add_document(doc("c1"))
+    worker.commit()
+
+    assert ids(worker) == ["a1", "b1", "c1"]
+    update.refresh()
+    assert ids(update) == ["a1", "b1", "c1"]
+    assert ids(open_store(tmp_path)) == ["a1", "b1", "c1"]
+
+
+def test_deletions_and_replacements_reach_other_processes(tmp_path):
+    first = open_store(tmp_path)
+    for doc_id in ("a1", "a2", "a3"):
+        first.add_document(doc(doc_id))
+    first.commit()
+
+    second = open_store(tmp_path)
+    second.delete_document("a1")
+    second.add_document(doc("a2", "restated revenue"))
+
+    # The deletion is persisted at once; the replacement only once flushed
+    assert first.refresh()
+    assert ids(first) == ["a2", "a3"]
+    assert first.get("a2")["content"] == "quarterly revenue report"
+
+    second.commit()
+    first.refresh()
+    assert first.get("a2")["content"] == "restated revenue"
+    assert ids(first) == ["a2", "a3"]
+
+
+def test_merge_keeps_changes_from_other_processes(tmp_path):
+    writer = open_store(tmp_path, flush_threshold=1, merge_factor=2)
+    for i in range(4):
+        writer.add_document(doc(f"d{i}"))
+
+    other = open_store(tmp_path)
+    other.add_document(doc("x1"))
+    other.delete_document("d0")
+    other.commit()
+
+    while writer.maybe_merge():
+        pass
+    expected = ["d1", "d2", "d3", "x1"]
+    assert ids(writer) == expected
+    assert ids(open_store(tmp_path)) == expected
+
+
+def test_readding_a_deleted_document_keeps_the_old_copy_deleted(tmp_path):
+    store = open_store(tmp_path)
+    store.add_document(doc("x", "old secret"))
+    store.add_document(doc("y"))
+    store.commit()
+
+    store.delete_document("x")
+    store.add_document(doc("x", "new text"))
+    # Any later manifest write must not bring the old copy back
+    store.delete_document("y")
+
+    other = open_store(tmp_path)
+    assert other.get("x") is None
+    assert ids(other) == []
+    assert store.get("x")["content"] == "new text"
+
+
+def test_deleting_a_replacement_deletes_the_replaced_copy(tmp_path):
+    store = open_store(tmp_path)
+    store.add_document(doc("x", "old secret"))
+    store.add_document(doc("y"))
+    store.commit()
+
+    store.add_document(doc("x", "new text"))
+    # Until flushed, other processes still see the copy on disk
+    assert open_store(tmp_path).get("x")["content"] == "old secret"
+    store.delete_document("x")
+    store.delete_document("y")
+
+    assert ids(open_store(tmp_path)) == []
+
+
+def test_replacement_survives_merges_and_deletes_by_other_processes(tmp_path):
+    writer = open_store(tmp_path, flush_threshold=1, merge_factor=2)
+    for i in range(3):
+        writer.add_document(doc(f"d{i}", f"version {i}"))
+    writer.add_document(doc("d0", "second version"))
+    writer.commit()
+
+    # Not yet flushed: hidden here, live on disk
+    writer.flush_threshold = 10
+    writer.add_document(doc("d1", "third version"))
+    other = open_store(tmp_path)
+    other.delete_document("d2")
+    while other.maybe_merge():
+        pass
+
+    writer.refresh()
+    assert writer.get("d1")["content"] == "third version"
+    assert ids(writer) == ["d0", "d1"]
+    writer.delete_document("d0")
+    assert ids(open_store(tmp_path)) == ["d1"]
+    assert open_store(tmp_path).get("d1")["content"] == "version 1"
+
+    writer.commit()
+    assert open_store(tmp_path).get("d1")["content"] == "third version"
+    assert ids(open_store(tmp_path)) == ["d1"]
@@ -0,0 +1,64 @@
+from segments import SegmentedDocumentStore
+from tool_cache import ToolResultCache, memoize_tool
+
+
+def doc(doc_id, content):
+    return {"id": doc_id, "title": doc_id, "content": content}
+
+
+def counted_search(cache, calls, **settings):
+    @memoize_tool(cache=cache, **settings)
+    def search(query: str, max_results: int = 5):
+        calls.append(query)
+        return [{"query": query, "max_results": max_results}]
+    return search
+
+
+def test_repeat_calls_hit_and_defaults_share_an_entry(tmp_path, use_store):
+    use_store(SegmentedDocumentStore(str(tmp_path), merge_interval=None))
+    cache, calls = ToolResultCache(), []
+    search = counted_search(cache, calls)
+
+    assert search("revenue") == search("revenue", max_results=5) == search(query="revenue")
+    assert search("revenue", max_results=3)[0]["max_results"] == 3
+    assert calls == ["revenue", "revenue"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+    assert stats["tools"]["search"]["hit_rate"] == 0.5
+
+
+def test_corpus_changes_invalidate_results(tmp_path, use_store):
+    store = SegmentedDocumentStore(str(tmp_path), merge_interval=None)
+    use_store(store)
+    cache, calls = ToolResultCache(), []
+    search = counted_search(cache, calls)
+    static = counted_search(cache, calls, depends_on_corpus=False)
+
+    search("revenue")
+    static("static")
+    store.add_document(doc("doc_1", "quarterly revenue"))
+    search("revenue")
+    static("static")
+    assert calls == ["revenue", "static", "revenue"]
+
+    search("revenue")
+    assert calls == ["revenue", "static", "revenue"]
+
+
+def test_results_are_copies_and_expire(tmp_path, use_store):
+    use_store(SegmentedDocumentStore(str(tmp_path), merge_interval=None))
+    cache, calls = ToolResultCache(max_entries=1), []
+    search = counted_search(cache, calls)
+
+    search("revenue")[0]["query"] = "changed"
+    assert search("revenue")[0]["query"] == "revenue"
+
+    # One entry at most, so a second query evicts the first
+    search("growth")
+    search("revenue")
+    assert calls == ["revenue", "growth", "revenue"]
+
+    expiring = counted_search(cache, calls, ttl=0)
+    expiring("margin")
+    expiring("margin")
+    assert calls[-2:] == ["margin", "margin"]
@@ -0,0 +1,66 @@
+import asyncio
+import contextvars
+
+from langchain_core.tools import StructuredTool
+
+from tool_executor import aexecute_tool_calls, execute_tool_calls
+
+request = contextvars.ContextVar("request", default=None)
+
+
+def double(x: int) -> dict:
+    """Double x."""
+    return {"value": x * 2, "request": request.get()}
+
+
+async def triple(x: int) -> dict:
+    """Triple x."""
+    await asyncio.sleep(0.01)
+    return {"value": x * 3, "request": request.get()}
+
+
+def fail(x: int) -> dict:
+    """Always fails."""
+    raise ValueError("boom")
+
+
+TOOLS = {
+    "double": StructuredTool.from_function(double),
+    "triple": StructuredTool.from_function(coroutine=triple, name="triple", description="Triple x."),
+    "fail": StructuredTool.from_function(fail),
+}
+
+CALLS = [
+    {"name": "double", "args": {"x": 1}},
+    {"name": "triple", "args": {"x": 2}},
+    {"name": "missing", "args": {}},
+    {"name": "fail", "args": {"x": 3}},
+    {"name": "triple", "args": {"x": 4}},
+]
+
+
+def values(results):
+    return [r.get("value", r.get("error")) for r in results]
+
+
+EXPECTED = [2, 6, "Unknown tool: missing", "fail failed: boom", 12]
+
+
+def test_results_keep_call_order_and_context():
+    request.set("r1")
+    results = execute_tool_calls(CALLS, TOOLS)
+
+    assert values(results) == EXPECTED
+    assert results[0]["request"] == results[1]["request"] == "r1"
+
+
+def test_sync_path_works_inside_a_running_loop():
+    async def host():
+        # A sync node run directly on the host's event loop
+        return execute_tool_calls(CALLS, TOOLS)
+
+    assert values(asyncio.run(host())) == EXPECTED
+
+
+def test_async_counterpart():
+    assert values(asyncio.run(aexecute_tool_calls(CALLS, TOOLS))) == EXPECTED
@@ -0,0 +1,85 @@
+import asyncio
+import contextlib
+import io
+
+import pytest
+
+from document_store import InMemoryDocumentStore
+from fake_llm import FakeChatModel
+from response_cache import MemoryCacheBackend, ResponseCache
+from schemas import AgentState, UserIntent
+from tool_cache import tool_cache
+from tool_loop import AgentSpec, ToolLoop
+from tools import retrieve_documents, search_specific_document
+
+DOCS = [{"id": "doc_1", "title": "Machine Learning", "content": "Machine learning finds patterns in data."}]
+
+
+@pytest.fixture(autouse=True)
+def corpus(use_store):
+    use_store(InMemoryDocumentStore(DOCS))
+    tool_cache.clear()
+
+
+def make_loop(max_iterations=5):
+    return ToolLoop(AgentSpec(name="qa_agent", prompt_type="qa", tools=(retrieve_documents, search_specific_document),
+                              confidence=0.85, failure_message="Gave up.", max_iterations=max_iterations))
+
+
+def make_state(question="What is machine learning?"):
+    return AgentState(user_input=question, session_id="s1",
+                      intent=UserIntent(intent_type="qa", confidence=0.9, reasoning="test"))
+
+
+def run(loop, state, **configurable):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return loop.run(state, {"configurable": {"llm": FakeChatModel(), **configurable}})
+
+
+def test_answers_from_tool_results():
+    result = run(make_loop(), make_state())
+
+    response = result["current_response"]
+    assert response.answer.startswith("Based on the documents:")
+    assert response.sources == ["doc_1"] and response.confidence == 0.85
+    assert result["tools_used"] == ["retrieve_documents"]
+    assert [t["tool_calls"] for t in result["iteration_timings"]] == [["retrieve_documents"], []]
+    assert result["messages"] == ["What is machine learning?", response.answer]
+    assert result["actions_taken"] == ["qa_agent"]
+
+
+def test_gives_up_after_max_iterations():
+    # The fake model always calls a tool first, so one iteration never finishes
+    result = run(make_loop(max_iterations=1), make_state())
+
+    response = result["current_response"]
+    assert response.answer == "Gave up."
+    assert response.confidence == 0.0 and response.sources == []
+    assert result["tools_used"] == ["retrieve_documents"]
+    assert "messages" not in result
+
+
+def test_reuses_a_cached_answer():
+    cache = ResponseCache(MemoryCacheBackend())
+    first = run(make_loop(), make_state(), response_cache=cache)
+
+    class NoModel(FakeChatModel):
+        def _generate(self, *args, **kwargs):
+            raise AssertionError("the model must not be called on a cache hit")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        again = make_loop().run(make_state(), {"configurable": {"llm": NoModel(), "response_cache": cache}})
+    assert again["current_response"].answer == first["current_response"].answer
+    assert again["tools_used"] == first["tools_used"]
+    assert again["iteration_timings"] == []
+    assert again["actions_taken"] == ["qa_agent"]
+
+    # A conversation with history is never answered from the cache
+    state = make_state().model_copy(update={"messages": ["Hi", "Hello"]})
+    assert run(make_loop(), state, response_cache=cache)["iteration_timings"]
+
+
+def test_async_run_matches_sync():
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = asyncio.run(make_loop().arun(make_state(), {"configurable": {"llm": FakeChatModel()}}))
+    assert result["current_response"].answer == run(make_loop(), make_state())["current_response"].answer
@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+import vector_index
+from segments import SegmentedDocumentStore
+from vector_index import DenseIndex, get_dense_index, get_embedder
+
+TOPICS = ["machine learning models", "quarterly revenue figures", "office relocation plans",
+          "customer support tickets", "security audit findings"]
+
+
+def doc(doc_id, topic):
+    return {"id": doc_id, "title": topic, "source": doc_id, "content": f"A note about {topic}."}
+
+
+def dense_ids(store, query, k=10):
+    vector = get_embedder().embed([query])[0]
+    return [doc_id for score, doc_id in get_dense_index(store).search(vector, k)]
+
+
+def test_segment_vectors_are_reused_and_follow_changes(tmp_path, monkeypatch):
+    store = SegmentedDocumentStore(str(tmp_path), flush_threshold=2, merge_interval=None)
+    for i, topic in enumerate(TOPICS):
+        store.add_document(doc(f"doc_{i}", topic))
+    assert sorted(dense_ids(store, "revenue")) == [f"doc_{i}" for i in range(5)]
+    assert dense_ids(store, "quarterly revenue figures")[0] == "doc_1"
+
+    built = []
+    build = DenseIndex.build.__func__
+
+    def recording_build(cls, docs, embedder, **kwargs):
+        docs = list(docs)
+        built.append([d["id"] for d in docs])
+        return build(cls, docs, embedder, **kwargs)
+
+    monkeypatch.setattr(DenseIndex, "build", classmethod(recording_build))
+    store.delete_document("doc_1")
+    store.add_document(doc("doc_9", "quarterly revenue figures"))
+    assert dense_ids(store, "quarterly revenue figures")[0] == "doc_9"
+    assert "doc_1" not in dense_ids(store, "revenue")
+    # The segment files were embedded once; only the flushed pair is new
+    assert built == [["doc_4", "doc_9"], []]
+
+
+def test_update_writes_vector_sidecars_per_segment(tmp_path, monkeypatch):
+    import ingest
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i, topic in enumerate(TOPICS):
+        (docs / f"{i}.txt").write_text(topic, encoding="utf-8")
+    corpus = tmp_path / "corpus"
+    monkeypatch.setattr("sys.argv", ["ingest.py", str(docs), "-o", str(corpus), "--update", "--embeddings"])
+    ingest.main()
+
+    segments = [p for p in corpus.iterdir() if p.suffix == ".idx"]
+    assert segments and all(DenseIndex.exists(str(p)) for p in segments)
+
+    vector_index._segment_dense.clear()
+    store = SegmentedDocumentStore(str(corpus), merge_interval=None)
+    assert sorted(dense_ids(store, "revenue")) == [f"doc_{i}" for i in range(1, 6)]